@@ -0,0 +1,126 @@
+"""
+Проверка времени запуска CLI: сколько занимает импорт до начала работы
+и не загружаются ли при старте тяжёлые библиотеки.
+
+Для каждой подкоманды cli.py в отдельном процессе выполняется
+python -X importtime src/cli.py <подкоманда> --help — это те же импорты,
+что и при обычном запуске до первого этапа. Замеряется время процесса
+(медиана --repeat запусков), а из отчёта -X importtime берутся самые
+долгие импорты (по пакетам) и список загруженных модулей.
+
+Код возврата 1, если медиана превысила --budget или при старте
+импортирована библиотека из FORBIDDEN (arch, statsmodels, SciPy,
+matplotlib должны загружаться только внутри этапов). Запуск из корня проекта:
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --budget 0.8 --commands rank,report
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+CLI_PATH = PROJECT_ROOT / "src" / "cli.py"
+
+COMMANDS = ("adf", "garch", "whitenoise", "dcc", "rank", "report", "all")
+FORBIDDEN = ("arch", "statsmodels", "scipy", "matplotlib")
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Разбирает вывод -X importtime: модуль -> (собственное, накопленное время, мкс).
+    """
+    times: Dict[str, Tuple[int, int]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # строка заголовка
+        times[name.rstrip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure_startup(command: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """
+    Время одного запуска подкоманды до начала работы и импорты процесса.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", str(CLI_PATH), command, "--help"],
+        capture_output=True,
+        text=True,
+        cwd=PROJECT_ROOT,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"cli.py {command} --help завершился с ошибкой:\n{proc.stderr[-2000:]}")
+    return elapsed, parse_importtime(proc.stderr)
+
+
+def check_command(command: str, repeat: int, budget: float, top: int) -> List[str]:
+    """
+    Замеряет подкоманду, печатает сводку и возвращает найденные нарушения.
+    """
+    timings = []
+    imports: Dict[str, Tuple[int, int]] = {}
+    for _ in range(repeat):
+        elapsed, imports = measure_startup(command)
+        timings.append(elapsed)
+    median = statistics.median(timings)
+
+    # Собственное время импортов, сложенное по пакетам верхнего уровня
+    packages: Dict[str, int] = {}
+    for name, (self_us, _) in imports.items():
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    print(f"{command:12s} {median:6.3f} с (бюджет {budget:.2f} с), модулей: {len(imports)}")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"    {self_us / 1e6:6.3f} с  {package}")
+
+    problems = []
+    if median > budget:
+        problems.append(f"{command}: запуск {median:.3f} с > бюджета {budget:.2f} с")
+    loaded = {name.strip().split(".")[0] for name in imports}
+    for package in FORBIDDEN:
+        if package in loaded:
+            problems.append(f"{command}: при запуске импортирован {package}")
+    return problems
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бюджет времени запуска cli.py")
+    parser.add_argument(
+        "--commands",
+        default=",".join(COMMANDS),
+        help=f"подкоманды через запятую (по умолчанию все: {', '.join(COMMANDS)})",
+    )
+    parser.add_argument(
+        "--budget", type=float, default=1.0, help="предел медианы времени запуска, с (по умолчанию 1.0)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="число замеров (по умолчанию 3)")
+    parser.add_argument("--top", type=int, default=5, help="сколько самых долгих пакетов показать")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    problems: List[str] = []
+    for command in args.commands.split(","):
+        problems += check_command(command, args.repeat, args.budget, args.top)
+    if problems:
+        print("\nБюджет запуска нарушен:")
+        for problem in problems:
+            print(f"  — {problem}")
+        return 1
+    print("\nБюджет запуска соблюдён")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,465 @@
+"""
+Бенчмарки этапов анализа волатильности на синтетических данных.
+
+Для каждого размера (тикеры × наблюдения, например 10x2000) строится таблица
+цен GARCH(1,1) с фиксированным seed (synthetic.py) и сохраняется в CSV.
+Затем каждый этап замеряется отдельно (входные данные этапа готовятся
+заранее и в замер не входят), а этап end_to_end проходит весь конвейер
+подряд, как run_volatility_analysis.py с --no-plots --no-cache:
+загрузка CSV, ADF, лог-доходности, GARCH, тесты белошумности, ранжировка.
+
+Перед замерами каждый этап выполняется один раз без замера (разогрев):
+иначе в первый замер попадают ленивые импорты SciPy, statsmodels и arch.
+Время — --repeat запусков (perf_counter), память — пик выделений Python
+и NumPy в отдельном запуске под tracemalloc (выделения в дочерних
+процессах при --jobs > 1 не учитываются). Результаты пишутся в JSON вместе
+с коммитом и версиями библиотек; --compare сравнивает медианы времени
+с прошлым JSON и возвращает код 1, если этап замедлился сильнее --threshold.
+
+Пакетный движок GARCH (--garch-backend batch, по умолчанию) на одном ядре
+быстрее arch примерно в 4–5 раз при сотнях тикеров (200x2500: 4,8 с против
+1,1 с) — меньше целевого ускорения на порядок; при десятках тикеров выигрыша
+почти нет. Этап garch с обоими --garch-backend показывает разрыв на своих размерах.
+
+Запуск из корня проекта:
+    python benchmarks/run_benchmarks.py --sizes 10x2000,100x5000
+    python benchmarks/run_benchmarks.py --preset medium --compare old.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from adf_analysis import ADF_BACKENDS, run_adf_for_price_series  # noqa: E402
+from garch_analysis import GARCH_BACKENDS, compute_log_returns, fit_garch_and_collect_stats  # noqa: E402
+from garch_backtest import run_backtest  # noqa: E402
+from ingest import read_prices  # noqa: E402
+from utils.price_cache import load_cached_frame  # noqa: E402
+from utils.result_dir import OUTPUT_BASE  # noqa: E402
+from volatility_report import (  # noqa: E402
+    build_volatility_ranking,
+    save_and_print_ranking,
+    write_domain_report,
+)
+from white_noise_analysis import run_white_noise_tests_for_garch_residuals  # noqa: E402
+
+from synthetic import simulate_garch_prices, write_prices_csv  # noqa: E402
+
+warnings.filterwarnings("ignore")
+
+# Формат JSON: при несовместимых изменениях сравнение со старыми файлами запрещается
+RESULT_FORMAT_VERSION = 1
+
+SIZE_PRESETS = {
+    "small": ["10x2000"],
+    "medium": ["10x2000", "100x5000", "500x10000"],
+    "large": ["10x2000", "100x5000", "500x10000", "2000x50000"],
+}
+
+STAGES = (
+    "load",
+    "load_cached",
+    "log_returns",
+    "adf",
+    "garch",
+    "white_noise",
+    "ranking",
+    "backtest",
+    "plots",
+    "end_to_end",
+)
+# backtest и plots долгие и в набор по умолчанию не входят
+DEFAULT_STAGES = tuple(s for s in STAGES if s not in ("backtest", "plots"))
+
+PACKAGES = ("numpy", "pandas", "scipy", "statsmodels", "arch", "matplotlib")
+
+
+@dataclass
+class StageResult:
+    """
+    Замер одного этапа на одном размере данных.
+    """
+
+    size: str
+    n_tickers: int
+    n_obs: int
+    stage: str
+    times_s: List[float]
+    median_s: float
+    min_s: float
+    peak_mb: Optional[float]
+
+
+@dataclass
+class _Context:
+    """
+    Данные одного размера и лениво посчитанные входы этапов.
+    """
+
+    prices: object
+    csv_path: Path
+    work_dir: Path
+    args: argparse.Namespace
+    cache: Dict[str, object] = field(default_factory=dict)
+
+    def get(self, name: str, build: Callable[[], object]) -> object:
+        if name not in self.cache:
+            with _quiet():
+                self.cache[name] = build()
+        return self.cache[name]
+
+    @property
+    def log_returns(self):
+        return self.get("log_returns", lambda: compute_log_returns(self.prices))
+
+    @property
+    def garch(self):
+        return self.get(
+            "garch",
+            lambda: fit_garch_and_collect_stats(
+                self.log_returns,
+                self.stage_dir("prepare"),
+                n_jobs=self.args.n_jobs,
+                backend=self.args.garch_backend,
+            ),
+        )
+
+    def stage_dir(self, stage: str) -> Path:
+        path = self.work_dir / stage
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+
+def parse_size(size: str) -> Tuple[int, int]:
+    """
+    Разбирает размер вида «тикеры x наблюдения», например 100x5000.
+    """
+    try:
+        n_tickers, n_obs = (int(part) for part in size.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Размер задаётся как ТИКЕРЫxНАБЛЮДЕНИЯ, получено: {size!r}")
+    if n_tickers < 1 or n_obs < 3:
+        raise ValueError(f"Слишком маленький размер: {size!r}")
+    return n_tickers, n_obs
+
+
+@contextlib.contextmanager
+def _quiet():
+    # Этапы печатают таблицы результатов — в бенчмарке вывод не нужен
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _measure(fn: Callable[[], object], repeat: int, memory: bool) -> Tuple[List[float], Optional[float]]:
+    # Разогрев: ленивые импорты и первые выделения памяти не входят в замер
+    with _quiet():
+        fn()
+    times = []
+    for _ in range(repeat):
+        with _quiet():
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+
+    peak_mb = None
+    if memory:
+        # Отдельный запуск: tracemalloc заметно замедляет код
+        tracemalloc.start()
+        try:
+            with _quiet():
+                fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peak_mb = peak / 1024**2
+    return times, peak_mb
+
+
+def _stage_load(ctx: _Context) -> Callable[[], object]:
+    return lambda: read_prices(ctx.csv_path, start=None)
+
+
+def _stage_load_cached(ctx: _Context) -> Callable[[], object]:
+    cache_dir = ctx.stage_dir("price_cache")
+    build = lambda: read_prices(ctx.csv_path, start=None)  # noqa: E731
+    # Первый вызов строит кэш — замеряется чтение готового
+    load_cached_frame(ctx.csv_path, build, cache_dir)
+    return lambda: load_cached_frame(ctx.csv_path, build, cache_dir)
+
+
+def _stage_log_returns(ctx: _Context) -> Callable[[], object]:
+    return lambda: compute_log_returns(ctx.prices)
+
+
+def _stage_adf(ctx: _Context) -> Callable[[], object]:
+    out_dir = ctx.stage_dir("adf")
+    return lambda: run_adf_for_price_series(ctx.prices, out_dir, backend=ctx.args.adf_backend)
+
+
+def _stage_garch(ctx: _Context) -> Callable[[], object]:
+    log_returns, out_dir = ctx.log_returns, ctx.stage_dir("garch")
+    return lambda: fit_garch_and_collect_stats(
+        log_returns, out_dir, n_jobs=ctx.args.n_jobs, backend=ctx.args.garch_backend
+    )
+
+
+def _stage_white_noise(ctx: _Context) -> Callable[[], object]:
+    vol_store, out_dir = ctx.garch, ctx.stage_dir("white_noise")
+    return lambda: run_white_noise_tests_for_garch_residuals(vol_store, out_dir, lag=20)
+
+
+def _stage_ranking(ctx: _Context) -> Callable[[], object]:
+    vol_store, out_dir = ctx.garch, ctx.stage_dir("ranking")
+
+    def run():
+        vol_df = build_volatility_ranking(vol_store.mean_volatility())
+        save_and_print_ranking(vol_df, out_dir)
+        write_domain_report(vol_df, out_dir)
+
+    return run
+
+
+def _stage_backtest(ctx: _Context) -> Callable[[], object]:
+    log_returns = ctx.log_returns
+    window = min(500, max(len(log_returns) // 2, 2))
+    return lambda: run_backtest(log_returns, window=window, step=20, n_jobs=ctx.args.n_jobs)
+
+
+def _stage_plots(ctx: _Context) -> Callable[[], object]:
+    from garch_analysis import garch_plot_jobs
+    from render import render_plots
+
+    vol_store, out_dir = ctx.garch, ctx.stage_dir("plots")
+    jobs = garch_plot_jobs(vol_store)
+    return lambda: render_plots(jobs, out_dir, n_jobs=ctx.args.n_jobs)
+
+
+def _stage_end_to_end(ctx: _Context) -> Callable[[], object]:
+    out_dir = ctx.stage_dir("end_to_end")
+    args = ctx.args
+
+    def run():
+        df = read_prices(ctx.csv_path, start=None)
+        run_adf_for_price_series(df, out_dir, backend=args.adf_backend)
+        log_returns = compute_log_returns(df)
+        vol_store = fit_garch_and_collect_stats(
+            log_returns, out_dir, n_jobs=args.n_jobs, backend=args.garch_backend
+        )
+        run_white_noise_tests_for_garch_residuals(vol_store, out_dir, lag=20)
+        vol_df = build_volatility_ranking(vol_store.mean_volatility())
+        save_and_print_ranking(vol_df, out_dir)
+        write_domain_report(vol_df, out_dir)
+
+    return run
+
+
+_STAGE_FUNCS: Dict[str, Callable[[_Context], Callable[[], object]]] = {
+    "load": _stage_load,
+    "load_cached": _stage_load_cached,
+    "log_returns": _stage_log_returns,
+    "adf": _stage_adf,
+    "garch": _stage_garch,
+    "white_noise": _stage_white_noise,
+    "ranking": _stage_ranking,
+    "backtest": _stage_backtest,
+    "plots": _stage_plots,
+    "end_to_end": _stage_end_to_end,
+}
+
+
+def run_size(size: str, stages: List[str], args: argparse.Namespace) -> List[StageResult]:
+    """
+    Замеряет выбранные этапы на синтетических данных одного размера.
+    """
+    n_tickers, n_obs = parse_size(size)
+    prices = simulate_garch_prices(n_tickers, n_obs, seed=args.seed)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        work_dir = Path(tmp)
+        csv_path = write_prices_csv(prices, work_dir / f"prices_{size}.csv")
+        ctx = _Context(prices=prices, csv_path=csv_path, work_dir=work_dir, args=args)
+        for stage in stages:
+            fn = _STAGE_FUNCS[stage](ctx)
+            times, peak_mb = _measure(fn, args.repeat, memory=not args.no_memory)
+            result = StageResult(
+                size=size,
+                n_tickers=n_tickers,
+                n_obs=n_obs,
+                stage=stage,
+                times_s=times,
+                median_s=statistics.median(times),
+                min_s=min(times),
+                peak_mb=peak_mb,
+            )
+            results.append(result)
+            peak = "" if peak_mb is None else f", пик {peak_mb:.1f} МБ"
+            print(f"  {size:>12} {stage:<12} {result.median_s:9.4f} с{peak}")
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _package_versions() -> Dict[str, Optional[str]]:
+    versions = {}
+    for name in PACKAGES:
+        try:
+            versions[name] = version(name)
+        except PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def compare_results(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Сравнивает медианы времени этапов с базовым JSON и печатает таблицу.
+    Возвращает список этапов (размер/этап), замедлившихся больше threshold.
+    """
+    if baseline.get("format_version") != RESULT_FORMAT_VERSION:
+        raise ValueError("Формат базового JSON не совпадает с текущим")
+    base = {(r["size"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nСравнение с {baseline['meta'].get('commit') or 'базовым запуском'}:")
+    for r in current["results"]:
+        old = base.get((r["size"], r["stage"]))
+        if old is None or old["median_s"] <= 0:
+            continue
+        ratio = r["median_s"] / old["median_s"]
+        mark = ""
+        if ratio > 1.0 + threshold:
+            mark = "  ЗАМЕДЛЕНИЕ"
+            regressions.append(f"{r['size']}/{r['stage']}")
+        print(
+            f"  {r['size']:>12} {r['stage']:<12} {old['median_s']:9.4f} → "
+            f"{r['median_s']:9.4f} с  (×{ratio:.2f}){mark}"
+        )
+    return regressions
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарки этапов анализа на синтетических данных")
+    parser.add_argument(
+        "--sizes",
+        default=None,
+        help="размеры через запятую в виде ТИКЕРЫxНАБЛЮДЕНИЯ (например 10x2000,100x5000)",
+    )
+    parser.add_argument(
+        "--preset",
+        choices=sorted(SIZE_PRESETS),
+        default="small",
+        help="готовый набор размеров, если --sizes не задан (по умолчанию small)",
+    )
+    parser.add_argument(
+        "--stages",
+        default=",".join(DEFAULT_STAGES),
+        help=f"этапы через запятую из: {', '.join(STAGES)} (по умолчанию все, кроме backtest и plots)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="число замеров времени (по умолчанию 3)")
+    parser.add_argument("--seed", type=int, default=0, help="seed генератора данных (по умолчанию 0)")
+    parser.add_argument("--jobs", type=int, default=1, help="число процессов для GARCH (0 — по числу ядер)")
+    parser.add_argument("--garch-backend", choices=GARCH_BACKENDS, default="batch")
+    parser.add_argument("--adf-backend", choices=ADF_BACKENDS, default="batch")
+    parser.add_argument("--no-memory", action="store_true", help="не замерять пик памяти (tracemalloc)")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="файл JSON с результатами (по умолчанию output/benchmarks/benchmark_<время>_<коммит>.json)",
+    )
+    parser.add_argument("--compare", type=Path, default=None, help="базовый JSON для сравнения")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="допустимое замедление при --compare (доля, по умолчанию 0.10)",
+    )
+    args = parser.parse_args(argv)
+    args.n_jobs = args.jobs if args.jobs > 0 else None
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    sizes = args.sizes.split(",") if args.sizes else SIZE_PRESETS[args.preset]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise SystemExit(f"Неизвестные этапы: {', '.join(unknown)}")
+    for size in sizes:
+        parse_size(size)
+
+    commit = _git_commit()
+    print(f"Бенчмарки: размеры {', '.join(sizes)}; этапы {', '.join(stages)}")
+    results: List[StageResult] = []
+    for size in sizes:
+        results.extend(run_size(size, stages, args))
+
+    report = {
+        "format_version": RESULT_FORMAT_VERSION,
+        "meta": {
+            "commit": commit,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "packages": _package_versions(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "jobs": args.jobs,
+            "garch_backend": args.garch_backend,
+            "adf_backend": args.adf_backend,
+        },
+        "results": [asdict(r) for r in results],
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = OUTPUT_BASE / "benchmarks" / f"benchmark_{stamp}_{commit or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"  — результаты: {output}")
+
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.threshold)
+        if regressions:
+            print(f"Замедление больше {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Синтетические цены для бенчмарков: GARCH(1,1)-доходности с фиксированным seed.
+
+Для каждого тикера параметры берутся случайно в реалистичных пределах
+(omega > 0, alpha + beta от 0.90 до 0.98), доходности (в процентах)
+моделируются рекурсией GARCH сразу по всем тикерам, цены — экспонента
+накопленной суммы лог-доходностей. Реальные данные не нужны, а при том же
+seed таблица воспроизводится бит в бит.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+def simulate_garch_params(n_tickers: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Параметры GARCH(1,1) по тикерам: матрица N×3 (omega, alpha, beta).
+    """
+    alpha = rng.uniform(0.03, 0.12, n_tickers)
+    persistence = rng.uniform(0.90, 0.98, n_tickers)
+    beta = persistence - alpha
+    # omega подбирается под безусловную дневную волатильность 1–3 %
+    uncond_var = rng.uniform(1.0, 3.0, n_tickers) ** 2
+    omega = uncond_var * (1.0 - persistence)
+    return np.column_stack([omega, alpha, beta])
+
+
+def simulate_garch_prices(
+    n_tickers: int,
+    n_obs: int,
+    seed: int = 0,
+    start_date: str = "2014-09-01",
+    dtype: str = "float64",
+    params: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    """
+    Таблица цен n_obs×n_tickers (индекс — рабочие дни с start_date,
+    столбцы T0000, T0001, ...), порождённая GARCH(1,1) с нормальными шоками.
+
+    params — матрица N×3 (omega, alpha, beta); по умолчанию — случайная
+    из simulate_garch_params с тем же seed.
+    """
+    rng = np.random.default_rng(seed)
+    if params is None:
+        params = simulate_garch_params(n_tickers, rng)
+    omega, alpha, beta = params.T
+
+    # Лог-цены накапливаются сразу в итоговом массиве (без матрицы доходностей)
+    log_prices = np.empty((n_obs, n_tickers), dtype=np.float64)
+    log_prices[0] = np.log(rng.uniform(10.0, 300.0, n_tickers))
+    sigma2 = omega / (1.0 - alpha - beta)
+    resid = np.zeros(n_tickers)
+    for t in range(1, n_obs):
+        sigma2 = omega + alpha * resid**2 + beta * sigma2
+        resid = np.sqrt(sigma2) * rng.standard_normal(n_tickers)
+        log_prices[t] = log_prices[t - 1] + resid / 100.0
+
+    prices = np.exp(log_prices, out=log_prices).astype(dtype, copy=False)
+    return pd.DataFrame(
+        prices,
+        index=pd.bdate_range(start_date, periods=n_obs, name="time"),
+        columns=[f"T{j:04d}" for j in range(n_tickers)],
+        copy=False,
+    )
+
+
+def write_prices_csv(prices: pd.DataFrame, path: Path) -> Path:
+    """
+    Сохраняет таблицу цен в CSV в формате, который читает ingest.read_prices.
+    """
+    prices.to_csv(path, float_format="%.6f")
+    return path
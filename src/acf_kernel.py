@@ -0,0 +1,91 @@
+"""
+Автокорреляции сразу для многих рядов через БПФ и портманто-тесты по ним.
+
+Ряды разной длины выравниваются по началу в одну матрицу, центрируются и
+дополняются нулями до длины не меньше 2T - 1, поэтому циклическая свёртка
+совпадает с обычной: автоковариации всех столбцов до нужного лага
+получаются одним rfft/irfft по матрице. Автокорреляции считаются как
+acf(x, adjusted=False) в statsmodels (нормировка на n), и из них без
+повторного расчёта получаются:
+- статистики Бокса–Пирса и Льюнга–Бокса с p-значениями (хи-квадрат)
+  на любом наборе лагов — как acorr_ljungbox(..., boxpierce=True);
+- доверительная полоса Бартлетта для графика ACF — как в plot_acf.
+
+SciPy импортируется внутри функций, а не при загрузке модуля (см. cli.py).
+"""
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+def acf_fft(columns: Sequence[np.ndarray], max_lag: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Автокорреляции лагов 0..max_lag по каждому ряду из columns (без NaN).
+
+    Возвращает матрицу (max_lag + 1)×N и длины рядов (N). Если ряд короче
+    max_lag + 1, старшие лаги заполняются NaN.
+    """
+    from scipy import fft
+
+    nobs = np.array([len(col) for col in columns], dtype=np.int64)
+    n_max = int(nobs.max()) if len(columns) else 0
+    centered = np.zeros((n_max, len(columns)))
+    for j, col in enumerate(columns):
+        values = np.asarray(col, dtype=np.float64)
+        centered[: values.size, j] = values - values.mean()
+
+    n_fft = fft.next_fast_len(2 * n_max - 1, real=True) if n_max else 1
+    spectrum = fft.rfft(centered, n=n_fft, axis=0)
+    acov = fft.irfft(spectrum.real**2 + spectrum.imag**2, n=n_fft, axis=0)
+    acov = acov[: max_lag + 1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        acf = acov / acov[0]
+    lags = np.arange(max_lag + 1)[:, None]
+    acf[lags >= nobs[None, :]] = np.nan
+    return acf, nobs
+
+
+def portmanteau_tests(
+    acf: np.ndarray, nobs: np.ndarray, lags: Sequence[int], model_df: int = 0
+) -> dict[str, np.ndarray]:
+    """
+    Статистики Бокса–Пирса и Льюнга–Бокса и их p-значения на лагах lags.
+
+    Q_BP(h) = n * sum r_k^2, Q_LB(h) = n (n + 2) * sum r_k^2 / (n - k),
+    k = 1..h; степени свободы h - model_df. Каждый массив результата
+    имеет размер len(lags)×N. Лаги — от 1 до max_lag, иначе ValueError.
+    """
+    from scipy.stats import chi2
+
+    lags = np.asarray(lags, dtype=np.int64)
+    max_lag = acf.shape[0] - 1
+    if lags.size == 0 or lags.min() < 1 or lags.max() > max_lag:
+        raise ValueError(f"Лаги тестов должны быть от 1 до {max_lag}: {lags.tolist()}")
+    k = np.arange(1, acf.shape[0])[:, None]
+    r2 = acf[1:] ** 2
+    n = nobs[None, :].astype(np.float64)
+    bp_stat = (n * np.cumsum(r2, axis=0))[lags - 1]
+    lb_stat = (n * (n + 2) * np.cumsum(r2 / (n - k), axis=0))[lags - 1]
+
+    dof = (lags - model_df).astype(np.float64)[:, None]
+    dof = np.where(dof > 0, dof, np.nan)
+    return {
+        "bp_stat": bp_stat,
+        "bp_pvalue": chi2.sf(bp_stat, dof),
+        "lb_stat": lb_stat,
+        "lb_pvalue": chi2.sf(lb_stat, dof),
+    }
+
+
+def bartlett_band(acf: np.ndarray, nobs: np.ndarray, alpha: float = 0.05) -> np.ndarray:
+    """
+    Полуширина доверительной полосы ACF по формуле Бартлетта (как в plot_acf):
+    var(r_k) = (1 + 2 * sum_{j<k} r_j^2) / n, для лага 0 — ноль.
+    """
+    from scipy.stats import norm
+
+    varacf = np.ones_like(acf) / nobs[None, :]
+    varacf[0] = 0.0
+    varacf[2:] *= 1.0 + 2.0 * np.cumsum(acf[1:-1] ** 2, axis=0)
+    return norm.ppf(1.0 - alpha / 2.0) * np.sqrt(varacf)
@@ -1,25 +1,32 @@
 """
 Функции для проверки сходимости (стационарности) ценовых рядов
-с помощью расширенного теста Дики–Фуллера и их графического отображения.
+с помощью расширенного теста Дики–Фуллера и описания их графиков.
 """
 
 from pathlib import Path
+from typing import List, Optional
 
-import matplotlib.pyplot as plt
 import pandas as pd
-from statsmodels.tsa.stattools import adfuller
+
+from adf_batch import adfuller_batch
+from render import PlotJob, series_line
+from utils.run_store import save_csv
+
+# Способы расчёта: batch — пакетный тест по всем рядам сразу (adf_batch.py),
+# statsmodels — adfuller по каждому ряду
+ADF_BACKENDS = ("batch", "statsmodels")
 
 
 def run_adf_for_price_series(
-    df: pd.DataFrame, run_dir: Path, alpha: float = 0.05
-) -> None:
+    df: pd.DataFrame, run_dir: Path, alpha: float = 0.05, backend: str = "batch"
+) -> Optional[pd.DataFrame]:
     """
     Выполняет расширенный тест Дики–Фуллера (ADF) для КАЖДОГО ценового ряда.
 
     По результатам теста для каждого тикера делается вывод о стационарности
     ценового ряда, формируется таблица и сохраняется в CSV в папку текущего запуска.
-    Дополнительно для КАЖДОГО ценового ряда строится график с подписью
-    параметров ADF-теста (ADF-статистика, p-значение, вывод).
+    Таблица возвращается (None, если непустых рядов нет); графики рядов
+    с подписью параметров теста описывает adf_plot_jobs.
 
     Пояснение по гипотезам теста Дики–Фуллера:
     - Н0: В ряду есть единичный корень (ряд НЕстационарен).
@@ -27,8 +34,15 @@ def run_adf_for_price_series(
 
     Если p-значение < alpha (по умолчанию 0.05), то нулевая гипотеза
     отвергается и ряд можно считать стационарным.
+
+    backend="batch" считает тест сразу по всем рядам (результаты совпадают
+    с adfuller; постоянные и слишком короткие ряды пропускаются),
+    backend="statsmodels" — вызовом adfuller по каждому ряду.
     """
+    if backend not in ADF_BACKENDS:
+        raise ValueError(f"Неизвестный способ расчёта ADF: {backend!r}")
     results: list[dict[str, float | str | int]] = []
+    batch_res = adfuller_batch(df) if backend == "batch" else None
 
     for col in df.columns:
         series = df[col].dropna()
@@ -38,8 +52,19 @@ def run_adf_for_price_series(
             continue
 
         # Используем autolag="AIC", чтобы автоматически подобрать число лагов.
-        adf_res = adfuller(series, autolag="AIC")
-        stat, p_value, used_lag, n_obs, crit_vals, ic_best = adf_res
+        if batch_res is not None:
+            if col not in batch_res.index:
+                continue
+            row = batch_res.loc[col]
+            stat, p_value, ic_best = row["adf_stat"], row["pvalue"], row["ic_best"]
+            used_lag, n_obs = int(row["used_lag"]), int(row["n_obs"])
+            crit_vals = {level: row[f"crit_{level}"] for level in ("1%", "5%", "10%")}
+        else:
+            # statsmodels.tsa загружается секунды — только для этого способа расчёта
+            from statsmodels.tsa.stattools import adfuller
+
+            adf_res = adfuller(series, autolag="AIC")
+            stat, p_value, used_lag, n_obs, crit_vals, ic_best = adf_res
 
         is_stationary = p_value < alpha
         conclusion = (
@@ -48,20 +73,6 @@ def run_adf_for_price_series(
             else "Не стационарен (не отвергаем H0)"
         )
 
-        # Графическое представление сходимости (стационарности) ценового ряда
-        plt.figure(figsize=(10, 3))
-        plt.plot(series.index, series.values)
-        plt.title(
-            f"Ценовой ряд {col}\nADF={stat:.3f}, p-value={p_value:.3g}, {conclusion}"
-        )
-        plt.ylabel("Цена")
-        plt.xlabel("Дата")
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        fig_path = run_dir / f"график_теста_Дики-Фуллера_ценового_ряда_{col}.png"
-        plt.savefig(fig_path)
-        plt.close()
-
         results.append(
             {
                 "Ряд": col,
@@ -79,14 +90,41 @@ def run_adf_for_price_series(
 
     if not results:
         print("Не удалось выполнить ADF-тест: нет непустых ценовых рядов.")
-        return
+        return None
 
     adf_df = pd.DataFrame(results)
 
     adf_csv_path = run_dir / "результаты_теста_Дики-Фуллера_по_ценовым_рядам.csv"
-    adf_df.to_csv(adf_csv_path, encoding="utf-8-sig", index=False)
+    save_csv(adf_df, adf_csv_path, index=False)
 
     # В консоль выводим краткий итог по каждому ряду.
     print("\nРезультаты расширенного теста Дики–Фуллера для ЦЕНОВЫХ рядов:")
     print(adf_df[["Ряд", "ADF статистика", "p-значение", "Вывод"]])
     print(f"\nПолные результаты ADF-теста сохранены в файле: {adf_csv_path.name}")
+    return adf_df
+
+
+def adf_plot_jobs(df: pd.DataFrame, adf_df: Optional[pd.DataFrame]) -> List[PlotJob]:
+    """
+    Описывает графики ценовых рядов с подписью параметров ADF-теста
+    (ADF-статистика, p-значение, вывод) — по одному на каждый ряд из adf_df.
+    """
+    if adf_df is None:
+        return []
+    jobs: List[PlotJob] = []
+    for _, row in adf_df.iterrows():
+        col = row["Ряд"]
+        jobs.append(
+            PlotJob(
+                filename=f"график_теста_Дики-Фуллера_ценового_ряда_{col}.png",
+                title=(
+                    f"Ценовой ряд {col}\nADF={row['ADF статистика']:.3f}, "
+                    f"p-value={row['p-значение']:.3g}, {row['Вывод']}"
+                ),
+                figsize=(10, 3),
+                lines=[series_line(df[col].dropna())],
+                xlabel="Дата",
+                ylabel="Цена",
+            )
+        )
+    return jobs
@@ -0,0 +1,176 @@
+"""
+Пакетный расширенный тест Дики–Фуллера (ADF) сразу по многим рядам.
+
+Повторяет adfuller(x, autolag="AIC", regression="c") из statsmodels:
+- maxlag = min(nobs // 2 - 2, ceil(12 * (nobs / 100) ** 0.25));
+- число лагов выбирается по AIC на общей выборке для всех кандидатов,
+  регрессия dx[t] на константу, уровень x[t-1] и dx[t-1..t-maxlag];
+- итоговая регрессия с выбранным числом лагов оценивается на своей
+  (более длинной) выборке, статистика — t-значение коэффициента при уровне;
+- p-значение и критические значения — по MacKinnon (1994, 2010).
+
+Вместо отдельной OLS-регрессии на каждого кандидата и каждый ряд матрица
+регрессоров строится один раз для максимального лага, и для пачки рядов
+одной длины делается одно пакетное QR-разложение. Наборы регрессоров
+вложены друг в друга, поэтому сумма квадратов остатков для всех лагов
+сразу получается из c = Q'y: SSR(k) = SSR(K) + c[k]^2 + ... + c[K-1]^2.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+ADF_COLUMNS = [
+    "adf_stat",
+    "pvalue",
+    "used_lag",
+    "n_obs",
+    "crit_1%",
+    "crit_5%",
+    "crit_10%",
+    "ic_best",
+]
+
+_LOG_2PI = float(np.log(2.0 * np.pi))
+# Предельный объём матрицы регрессоров одной пачки рядов (байт)
+_MAX_BLOCK_BYTES = 64 * 1024**2
+
+
+def adf_maxlag(nobs: int) -> int:
+    """
+    Максимальный лаг по Schwert (1989) с ограничением для регрессии с константой.
+    """
+    maxlag = int(np.ceil(12.0 * np.power(nobs / 100.0, 1 / 4.0)))
+    return min(nobs // 2 - 2, maxlag)
+
+
+def _lag_design(
+    x: np.ndarray, n_lags: int, n_rows: int, level_last: bool
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Строит пакет регрессий ADF для рядов x (B×T) по последним n_rows разностям.
+
+    Возвращает y (B×n_rows) — разности dx[t] и X (B×n_rows×(n_lags+2)) —
+    константа, уровень x[t] (перед разностью dx[t]) и лаги dx[t-1..t-n_lags].
+    При level_last уровень ставится последним столбцом (удобно для t-статистики).
+    """
+    dx = np.diff(x, axis=1)
+    m = dx.shape[1]
+    start = m - n_rows
+    n_batch = x.shape[0]
+    design = np.empty((n_batch, n_rows, n_lags + 2))
+    design[:, :, 0] = 1.0
+    level_col = n_lags + 1 if level_last else 1
+    lag_start = 1 if level_last else 2
+    design[:, :, level_col] = x[:, start:m]
+    for j in range(1, n_lags + 1):
+        design[:, :, lag_start + j - 1] = dx[:, start - j : m - j]
+    return dx[:, start:], design
+
+
+def _qr_projections(y: np.ndarray, design: np.ndarray):
+    """
+    Пакетное QR: возвращает c = Q'y (B×K), диагональ R (B×K)
+    и сумму квадратов остатков полной регрессии (B).
+    """
+    q, r = np.linalg.qr(design)
+    c = np.einsum("bnk,bn->bk", q, y)
+    resid = y - np.einsum("bnk,bk->bn", q, c)
+    ssr_full = np.einsum("bn,bn->b", resid, resid)
+    return c, np.diagonal(r, axis1=1, axis2=2), ssr_full
+
+
+def _select_lag_aic(x: np.ndarray, maxlag: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Для пачки рядов одной длины выбирает число лагов по AIC (как _autolag
+    в statsmodels: общая выборка, при равенстве — меньший лаг).
+    Возвращает выбранные лаги и значения AIC при них.
+    """
+    n_rows = x.shape[1] - 1 - maxlag
+    y, design = _lag_design(x, maxlag, n_rows, level_last=False)
+    c, _, ssr_full = _qr_projections(y, design)
+
+    # SSR при первых k столбцах (k = 2..K): добавляем вклад отброшенных столбцов
+    tail = np.cumsum((c**2)[:, ::-1], axis=1)[:, ::-1]
+    n_cols = design.shape[2]
+    ssr = ssr_full[:, None] + np.concatenate(
+        [tail[:, 2:], np.zeros((x.shape[0], 1))], axis=1
+    )
+    k = np.arange(2, n_cols + 1)
+    llf = -n_rows / 2.0 * (_LOG_2PI + np.log(ssr / n_rows) + 1.0)
+    aic = -2.0 * llf + 2.0 * k
+    best = np.argmin(aic, axis=1)
+    return best, aic[np.arange(x.shape[0]), best]
+
+
+def _adf_tstat(x: np.ndarray, used_lag: int) -> tuple[np.ndarray, int]:
+    """
+    t-статистика при уровне в регрессии с used_lag лагами для пачки рядов.
+    Уровень — последний столбец, поэтому t = c[-1] * sign(R[-1, -1]) / s.
+    """
+    n_rows = x.shape[1] - 1 - used_lag
+    y, design = _lag_design(x, used_lag, n_rows, level_last=True)
+    c, r_diag, ssr = _qr_projections(y, design)
+    sigma = np.sqrt(ssr / (n_rows - design.shape[2]))
+    return c[:, -1] * np.sign(r_diag[:, -1]) / sigma, n_rows
+
+
+def _batches(indices: List[int], row_bytes: int) -> List[List[int]]:
+    size = max(1, _MAX_BLOCK_BYTES // max(row_bytes, 1))
+    return [indices[i : i + size] for i in range(0, len(indices), size)]
+
+
+def adfuller_batch(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    ADF-тест (autolag="AIC", регрессия с константой) по всем столбцам prices.
+
+    Пропуски в столбце удаляются (как dropna() перед adfuller). Ряды
+    группируются по длине, и каждая группа обрабатывается пачками
+    пакетных QR-разложений. Пустые, постоянные и слишком короткие ряды
+    пропускаются. Возвращает таблицу ряд × ADF_COLUMNS в порядке столбцов.
+    """
+    # Таблицы Маккиннона тянут за собой statsmodels.tsa — импорт при вызове
+    from statsmodels.tsa.adfvalues import mackinnoncrit, mackinnonp
+
+    series: Dict[str, np.ndarray] = {}
+    for col in prices.columns:
+        values = prices[col].dropna().to_numpy(dtype=np.float64)
+        if values.size == 0 or values.max() == values.min():
+            continue
+        if adf_maxlag(values.size) < 0:
+            continue
+        series[col] = values
+
+    by_length: Dict[int, List[str]] = {}
+    for col, values in series.items():
+        by_length.setdefault(values.size, []).append(col)
+
+    rows: Dict[str, dict] = {}
+    for nobs, cols in by_length.items():
+        maxlag = adf_maxlag(nobs)
+        x_all = np.stack([series[col] for col in cols])
+        row_bytes = 8 * nobs * (maxlag + 2)
+        for batch in _batches(list(range(len(cols))), row_bytes):
+            x = x_all[batch]
+            best, ic_best = _select_lag_aic(x, maxlag)
+
+            # Итоговые регрессии: пачки рядов с одинаковым выбранным лагом
+            for used_lag in np.unique(best):
+                members = np.flatnonzero(best == used_lag)
+                stats, n_rows = _adf_tstat(x[members], int(used_lag))
+                crit = mackinnoncrit(N=1, regression="c", nobs=n_rows)
+                for i, stat in zip(members, stats):
+                    rows[cols[batch[i]]] = {
+                        "adf_stat": float(stat),
+                        "pvalue": mackinnonp(float(stat), regression="c", N=1),
+                        "used_lag": int(used_lag),
+                        "n_obs": n_rows,
+                        "crit_1%": crit[0],
+                        "crit_5%": crit[1],
+                        "crit_10%": crit[2],
+                        "ic_best": float(ic_best[i]),
+                    }
+
+    order = [col for col in prices.columns if col in rows]
+    return pd.DataFrame([rows[col] for col in order], index=order, columns=ADF_COLUMNS)
@@ -0,0 +1,185 @@
+"""
+Точка входа с подкомандами по этапам анализа волатильности:
+
+    python src/cli.py adf          # ADF-тест ценовых рядов
+    python src/cli.py garch        # оценка GARCH(1,1)
+    python src/cli.py whitenoise   # тесты белошумности остатков GARCH
+    python src/cli.py dcc          # DCC-GARCH: динамические корреляции
+    python src/cli.py rank         # ранжировка по средней волатильности
+    python src/cli.py report       # ранжировка и комментарий
+    python src/cli.py all          # весь анализ с графиками
+    python src/cli.py export output/result_N.zip   # графики PNG из архива запуска
+
+Подкоманда выполняет свой этап и этапы, от которых он зависит (см.
+Pipeline.select), с теми же параметрами, что run_volatility_analysis.py.
+Тяжёлые библиотеки (arch, statsmodels.tsa, SciPy, matplotlib) импортируются
+внутри функций, которым они нужны, поэтому запуск начинается сразу, а,
+например, rank при оценках GARCH из кэша этапов не загружает ни одну из них.
+rank и report с --from-run строят ранжировку по рядам GARCH прошлого
+запуска (папки result_N или архива result_N.zip), не загружая цены, а с
+--bootstrap N — ещё и оценивают её устойчивость (ranking_bootstrap.py);
+кроме --bootstrap*, --jobs и --run-store параметры запуска с --from-run
+не применяются, и указать их — ошибка.
+export извлекает файлы (по умолчанию графики PNG) из архива запуска,
+сохранённого с --run-store. Время запуска и список импортов проверяет
+benchmarks/import_budget.py.
+"""
+
+import argparse
+from pathlib import Path
+
+from run_volatility_analysis import add_run_arguments, run
+
+# Подкоманда -> целевые этапы конвейера (None — все)
+COMMANDS = {
+    "adf": ("adf", "ADF-тест ценовых рядов"),
+    "garch": ("garch", "оценка GARCH(1,1) и условная волатильность"),
+    "whitenoise": ("white_noise", "тесты белошумности остатков GARCH"),
+    "dcc": ("dcc", "DCC-GARCH(1,1): динамические корреляции между тикерами"),
+    "rank": ("ranking", "ранжировка по средней волатильности"),
+    "report": ("report", "ранжировка и комментарий с точки зрения предметной области"),
+    "all": (None, "весь анализ, включая графики"),
+}
+
+# Параметры, которые учитываются с --from-run (остальные относятся к расчёту рядов)
+FROM_RUN_OPTIONS = (
+    "command",
+    "from_run",
+    "jobs",
+    "run_store",
+    "bootstrap",
+    "bootstrap_method",
+    "bootstrap_mode",
+    "bootstrap_seed",
+    "bootstrap_chunk_mb",
+)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Анализ волатильности акций банков РФ (GARCH) по этапам"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="КОМАНДА")
+    for command, (_, help_text) in COMMANDS.items():
+        sub = subparsers.add_parser(command, help=help_text, description=help_text)
+        add_run_arguments(sub, stages=False)
+        if command in ("rank", "report"):
+            sub.add_argument(
+                "--from-run",
+                type=Path,
+                default=None,
+                help="взять ряды GARCH из прошлого запуска (output/result_N или result_N.zip) без пересчёта",
+            )
+    export = subparsers.add_parser(
+        "export",
+        help="извлечь файлы из архива запуска result_N.zip",
+        description="Извлечь файлы (по умолчанию графики PNG) из архива запуска result_N.zip",
+    )
+    export.add_argument("run_store", type=Path, help="архив запуска (output/result_N.zip)")
+    export.add_argument("--pattern", default="*.png", help="шаблон имён файлов (по умолчанию *.png)")
+    export.add_argument(
+        "--to",
+        type=Path,
+        default=None,
+        help="папка назначения (по умолчанию — output/result_N рядом с архивом)",
+    )
+    return parser
+
+
+def rank_from_run(args: argparse.Namespace) -> None:
+    """
+    Ранжировка (и комментарий для report) по хранилищу рядов GARCH прошлого
+    запуска args.from_run (папка или архив .zip), с --bootstrap N — и её
+    бутстрэп; результаты — в новую папку result_N (или архив с --run-store).
+    """
+    import shutil
+
+    from garch_analysis import VOL_STORE_DIRNAME
+    from utils.result_dir import get_next_result_dir, run_store_path
+    from utils.run_store import RunStore, pack_run_dir
+    from vol_store import VolatilityStore
+    from volatility_report import build_volatility_ranking, save_and_print_ranking, write_domain_report
+
+    source_dir = args.from_run
+    if source_dir.is_file():
+        # Матрицы отображаются в память из файла архива и после закрытия
+        with RunStore.open(source_dir) as run:
+            if f"{VOL_STORE_DIRNAME}/meta.json" not in run.files:
+                raise SystemExit(f"Нет рядов GARCH в {source_dir} (ожидается папка {VOL_STORE_DIRNAME})")
+            store = VolatilityStore.from_run_store(run, VOL_STORE_DIRNAME)
+    else:
+        store_path = source_dir / VOL_STORE_DIRNAME
+        if not store_path.is_dir():
+            raise SystemExit(f"Нет рядов GARCH в {source_dir} (ожидается папка {VOL_STORE_DIRNAME})")
+        store = VolatilityStore.load(store_path)
+    run_dir = get_next_result_dir()
+    vol_df = build_volatility_ranking(store.mean_volatility())
+    save_and_print_ranking(vol_df, run_dir)
+    if args.command == "report":
+        write_domain_report(vol_df, run_dir)
+    if args.bootstrap:
+        from ranking_bootstrap import run_ranking_bootstrap
+
+        run_ranking_bootstrap(
+            store,
+            run_dir,
+            n_sims=args.bootstrap,
+            method=args.bootstrap_method,
+            mode=args.bootstrap_mode,
+            seed=args.bootstrap_seed,
+            n_jobs=args.jobs if args.jobs > 0 else None,
+            chunk_mb=args.bootstrap_chunk_mb,
+        )
+
+    if args.run_store:
+        store_path = pack_run_dir(run_dir, run_store_path(run_dir))
+        shutil.rmtree(run_dir)
+        print(f"  — результаты запуска одним файлом: {store_path.name}")
+
+
+def export_from_run(store_path: Path, out_dir, pattern: str) -> None:
+    """
+    Извлекает из архива запуска файлы по шаблону (графики PNG и т.п.).
+    """
+    from utils.run_store import RunStore
+
+    if not store_path.is_file():
+        raise SystemExit(f"Нет архива запуска {store_path}")
+    out_dir = out_dir or store_path.with_suffix("")
+    with RunStore.open(store_path) as run:
+        written = run.export_files(out_dir, pattern)
+    print(f"  — извлечено файлов: {len(written)} (в {out_dir})")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        export_from_run(args.run_store, args.to, args.pattern)
+        return
+    if getattr(args, "from_run", None) is not None:
+        defaults = vars(parser.parse_args([args.command]))
+        ignored = [
+            "--" + name.replace("_", "-")
+            for name, value in vars(args).items()
+            if name not in FROM_RUN_OPTIONS and value != defaults[name]
+        ]
+        if ignored:
+            parser.error(f"с --from-run не применяются: {', '.join(ignored)}")
+        rank_from_run(args)
+        return
+
+    target = COMMANDS[args.command][0]
+    if target in ("ranking", "report") and args.bootstrap:
+        target += ",ranking_bootstrap"
+    args.stages = target
+    if args.command == "dcc":
+        args.dcc = True
+    if target is not None:
+        # Графики строит только all; arch и другие библиотеки не подтянут matplotlib
+        args.no_plots = True
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,47 @@
 """
-Загрузка ценовых рядов акций из Excel.
+Загрузка ценовых рядов акций из Excel (а также CSV и Parquet — см. ingest.py).
 
 Выделено в отдельный модуль, чтобы переиспользовать загрузку данных
 независимо от анализа волатильности и тестов стационарности.
 """
 
 from pathlib import Path
+from typing import Optional, Sequence
 
 import pandas as pd
 
+from ingest import read_prices, source_format
+from utils.price_cache import load_cached_frame
+
 # Пути и настройки источника данных
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
 EXCEL_FILENAME = "All shares Ekonometrika.xlsx"
 SHEET_NAME = "ALL"
+# Кэш разобранного листа (см. utils/price_cache.py)
+CACHE_DIR = DATA_DIR / ".cache"
 
 # Анализируемый промежуток по заданию: с 01.09.2014 по настоящий момент
 START_DATE = "2014-09-01"
 
 
-def load_prices() -> pd.DataFrame:
+def _read_prices_from_excel(file_path: Path) -> pd.DataFrame:
+    df = pd.read_excel(file_path, sheet_name=SHEET_NAME)
+    df["time"] = pd.to_datetime(df["time"])
+    df.set_index("time", inplace=True)
+
+    # Фильтр по заданию: с 01.09.2014 по настоящий момент
+    df = df[df.index >= START_DATE].sort_index()
+    return df
+
+
+def load_prices(use_cache: bool = True) -> pd.DataFrame:
     """
     Загружает цены из Excel, лист ALL, индекс — время.
 
     Оставляет данные, начиная с 01.09.2014 (по условию задания), сортируя по дате.
+    При use_cache=True разобранный лист берётся из кэша в data/.cache
+    (пересобирается автоматически, если Excel-файл изменился).
     """
     file_path = DATA_DIR / EXCEL_FILENAME
     if not file_path.exists():
@@ -31,10 +49,72 @@ def load_prices() -> pd.DataFrame:
             f"Файл не найден: {file_path}. Положите {EXCEL_FILENAME} в папку data/."
         )
 
-    df = pd.read_excel(file_path, sheet_name=SHEET_NAME)
-    df["time"] = pd.to_datetime(df["time"])
-    df.set_index("time", inplace=True)
+    if not use_cache:
+        return _read_prices_from_excel(file_path)
+    return load_cached_frame(
+        file_path,
+        lambda: _read_prices_from_excel(file_path),
+        CACHE_DIR,
+        variant=f"{SHEET_NAME}|{START_DATE}",
+    )
 
-    # Фильтр по заданию: с 01.09.2014 по настоящий момент
-    df = df[df.index >= START_DATE].sort_index()
-    return df
+
+def load_price_source(
+    path: Optional[Path] = None,
+    tickers: Optional[Sequence[str]] = None,
+    start: Optional[str] = START_DATE,
+    end: Optional[str] = None,
+    dtype: str = "float64",
+    ticker_column: Optional[str] = None,
+    value_column: str = "close",
+    resample: Optional[str] = None,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Загружает цены из произвольного источника (CSV, Parquet, Excel) через
+    ingest.read_prices: только нужные тикеры и даты, по порциям, с типом dtype.
+
+    По умолчанию (path=None) читается лист ALL исходного Excel-файла.
+    Результат кэшируется в data/.cache отдельно для каждого набора параметров.
+    """
+    file_path = DATA_DIR / EXCEL_FILENAME if path is None else Path(path)
+    if not file_path.exists():
+        raise FileNotFoundError(f"Файл не найден: {file_path}")
+    sheet_name = SHEET_NAME if source_format(file_path) == "excel" else 0
+
+    def build() -> pd.DataFrame:
+        return read_prices(
+            file_path,
+            tickers=tickers,
+            start=start,
+            end=end,
+            dtype=dtype,
+            ticker_column=ticker_column,
+            value_column=value_column,
+            resample=resample,
+            sheet_name=sheet_name,
+        )
+
+    if not use_cache:
+        return build()
+    variant = "|".join(
+        str(part)
+        for part in (
+            "ingest", sheet_name, ",".join(tickers or []), start, end,
+            dtype, ticker_column, value_column, resample,
+        )
+    )
+    return load_cached_frame(file_path, build, CACHE_DIR, variant=variant)
+
+
+def price_source_id(path: Optional[Path] = None, **options) -> str:
+    """
+    Идентичность источника цен для сохранённых моделей (garch_state):
+    полный путь файла и параметры, меняющие историю доходностей (начало
+    периода, свёртка баров и т.п.; пустые значения не входят). Конец
+    периода не входит: новые строки — обычное дообновление.
+    """
+    file_path = DATA_DIR / EXCEL_FILENAME if path is None else Path(path)
+    parts = [str(file_path.resolve())]
+    parts += [f"{key}={value}" for key, value in sorted(options.items()) if value]
+    return "|".join(parts)
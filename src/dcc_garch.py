@@ -0,0 +1,337 @@
+"""
+Динамические условные корреляции (DCC-GARCH) между тикерами.
+
+Одномерные модели GARCH(1,1) уже оценены по каждому тикеру; DCC(1,1)
+строится по их стандартизированным остаткам z (из VolatilityStore):
+
+    Q[t] = (1 - a - b) * Qbar + a * z[t-1] z[t-1]' + b * Q[t-1],  Q[0] = Qbar,
+    R[t] = diag(Q[t])^(-1/2) Q[t] diag(Q[t])^(-1/2),
+
+где Qbar — выборочная матрица z'z / T. Параметры (a, b) максимизируют
+корреляционную часть правдоподобия
+    -1/2 * sum_t (log|R[t]| + z[t]' R[t]^(-1) z[t] - z[t]' z[t]).
+
+Рекурсия по Q линейна с постоянным коэффициентом b, поэтому все
+N(N+1)/2 элементов верхнего треугольника Q проходят её сразу — одним
+lfilter по блоку дат (цикл по времени на C), без объектов на каждую дату.
+Определители и квадратичные формы считаются пакетным разложением
+Холецкого по блоку. Блоки дат выбираются так, чтобы их массивы (B×N×N)
+укладывались в chunk_mb, а состояние Q переносится между блоками —
+память не растёт с длиной ряда.
+
+Используются только даты, на которых есть остатки всех тикеров.
+Динамические корреляции сохраняются в папку корреляции_DCC: матрица
+T×N(N-1)/2 (недиагональные элементы верхнего треугольника R[t] по
+строкам, float32, .npy) — читается через np.load(mmap_mode="r")
+(DccCorrelations.load) без загрузки целиком.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.run_store import save_csv
+from vol_store import VolatilityStore
+
+DCC_DIRNAME = "корреляции_DCC"
+# Версия формата папки: при изменении раскладки старые папки не читаются
+DCC_FORMAT_VERSION = 1
+
+# Стартовая точка оптимизации (типичные оценки для дневных данных)
+_START = (0.02, 0.95)
+# Запас до границы стационарности a + b < 1
+_PERSISTENCE_MAX = 0.999
+# Сколько массивов размера B×N×N×8 байт нужно на блок дат
+_ARRAYS_PER_ROW = 6
+_MIN_OBS = 100
+
+_META = "meta.json"
+
+
+@dataclass
+class DccFit:
+    """
+    Оценка DCC(1,1): параметры, правдоподобие и данные, по которым она получена.
+    """
+
+    tickers: List[str]
+    index: pd.DatetimeIndex
+    a: float
+    b: float
+    loglikelihood: float
+    converged: bool
+    func_evals: int
+    elapsed_s: float
+    qbar: np.ndarray = field(repr=False)
+
+
+@dataclass
+class DccCorrelations:
+    """
+    Динамические корреляции: values — T×P (P = N(N-1)/2) в порядке пар
+    np.triu_indices(N, 1), обычно отображённые в память.
+    """
+
+    index: pd.DatetimeIndex
+    tickers: List[str]
+    values: np.ndarray
+    a: float
+    b: float
+
+    def __post_init__(self):
+        rows, cols = np.triu_indices(len(self.tickers), 1)
+        self._rows, self._cols = rows, cols
+        self._pairs = {
+            (self.tickers[i], self.tickers[j]): k for k, (i, j) in enumerate(zip(rows, cols))
+        }
+
+    def pair(self, first: str, second: str) -> pd.Series:
+        """
+        Динамическая корреляция пары тикеров (срез без копирования).
+        """
+        k = self._pairs.get((first, second), self._pairs.get((second, first)))
+        if k is None:
+            raise KeyError(f"Нет пары {first}–{second}")
+        return pd.Series(
+            self.values[:, k], index=self.index, name=f"{first}–{second}", copy=False
+        )
+
+    def matrix(self, position: int = -1) -> pd.DataFrame:
+        """
+        Корреляционная матрица R[t] на дату с номером position.
+        """
+        return self._unpack(np.asarray(self.values[position], dtype=np.float64))
+
+    def mean_matrix(self, block_rows: int = 4096) -> pd.DataFrame:
+        """
+        Средняя по датам корреляционная матрица (читается блоками строк).
+        """
+        total = np.zeros(self.values.shape[1])
+        for start in range(0, self.values.shape[0], block_rows):
+            total += np.asarray(self.values[start : start + block_rows], dtype=np.float64).sum(axis=0)
+        return self._unpack(total / max(self.values.shape[0], 1))
+
+    def _unpack(self, packed: np.ndarray) -> pd.DataFrame:
+        matrix = np.eye(len(self.tickers))
+        matrix[self._rows, self._cols] = packed
+        matrix[self._cols, self._rows] = packed
+        return pd.DataFrame(matrix, index=self.tickers, columns=self.tickers)
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "DccCorrelations":
+        """
+        Читает корреляции из папки path; при mmap=True матрица отображается
+        в память, а не читается целиком.
+        """
+        with open(path / _META, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != DCC_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемый формат корреляций в {path}")
+        return cls(
+            index=pd.DatetimeIndex(np.load(path / "index.npy")),
+            tickers=meta["tickers"],
+            values=np.load(path / "correlations.npy", mmap_mode="r" if mmap else None),
+            a=meta["a"],
+            b=meta["b"],
+        )
+
+
+def joint_residuals(store: VolatilityStore) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    """
+    Даты, на которых есть остатки всех тикеров, и матрица z на них (T×N).
+    """
+    rows = np.flatnonzero(store.valid.all(axis=1))
+    return store.index[rows], np.ascontiguousarray(np.asarray(store.std_resid)[rows])
+
+
+def block_rows_for(n_series: int, chunk_mb: float) -> int:
+    """
+    Сколько дат помещается в блок объёмом chunk_mb.
+    """
+    per_row = n_series * n_series * 8 * _ARRAYS_PER_ROW
+    return max(1, int(chunk_mb * 1024**2 // per_row))
+
+
+def _correlation_blocks(
+    z: np.ndarray, qbar: np.ndarray, a: float, b: float, block_rows: int
+) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """
+    Рекурсия DCC по блокам дат: (начало, конец, R блока в упакованном виде
+    B×N(N+1)/2 — верхний треугольник с диагональю по строкам).
+    """
+    from scipy.signal import lfilter
+
+    n_obs, n_series = z.shape
+    rows, cols = np.triu_indices(n_series)
+    diag = np.flatnonzero(rows == cols)
+    qbar_packed = qbar[rows, cols]
+    prev_q = qbar_packed
+    for start in range(0, n_obs, block_rows):
+        stop = min(start + block_rows, n_obs)
+        # Q[t] зависит от z[t-1]; для t = 0 подставляется Qbar, тогда Q[0] = Qbar
+        lagged = z[max(start - 1, 0) : stop - 1]
+        outer = lagged[:, rows] * lagged[:, cols]
+        if start == 0:
+            outer = np.vstack([qbar_packed, outer])
+        intercept = (1.0 - a - b) * qbar_packed + a * outer
+        q, _ = lfilter([1.0], [1.0, -b], intercept, axis=0, zi=(b * prev_q)[None, :])
+        prev_q = q[-1]
+        scale = np.sqrt(q[:, diag])
+        yield start, stop, q / (scale[:, rows] * scale[:, cols])
+
+
+def _unpack_blocks(packed: np.ndarray, n_series: int) -> np.ndarray:
+    rows, cols = np.triu_indices(n_series)
+    full = np.empty((packed.shape[0], n_series, n_series))
+    full[:, rows, cols] = packed
+    full[:, cols, rows] = packed
+    return full
+
+
+def dcc_loglikelihood(
+    z: np.ndarray, qbar: np.ndarray, a: float, b: float, block_rows: int = 1024
+) -> float:
+    """
+    Корреляционная часть лог-правдоподобия DCC(1,1); -inf, если R[t]
+    не положительно определена.
+    """
+    llf = 0.0
+    for start, stop, packed in _correlation_blocks(z, qbar, a, b, block_rows):
+        zb = z[start:stop]
+        try:
+            chol = np.linalg.cholesky(_unpack_blocks(packed, z.shape[1]))
+        except np.linalg.LinAlgError:
+            return -np.inf
+        logdet = 2.0 * np.log(np.diagonal(chol, axis1=1, axis2=2)).sum(axis=1)
+        w = np.linalg.solve(chol, zb[:, :, None])[:, :, 0]
+        llf -= 0.5 * float(np.sum(logdet + np.sum(w**2, axis=1) - np.sum(zb**2, axis=1)))
+    return llf
+
+
+def fit_dcc(store: VolatilityStore, chunk_mb: float = 64.0) -> DccFit:
+    """
+    Оценивает DCC(1,1) по стандартизированным остаткам всех тикеров store.
+    """
+    from scipy.optimize import minimize
+
+    if len(store) < 2:
+        raise ValueError("Для DCC нужны хотя бы два тикера")
+    index, z = joint_residuals(store)
+    if len(index) < _MIN_OBS:
+        raise ValueError(f"Общих дат у тикеров меньше {_MIN_OBS}: {len(index)}")
+
+    started = time.perf_counter()
+    qbar = z.T @ z / z.shape[0]
+    block_rows = block_rows_for(z.shape[1], chunk_mb)
+
+    def objective(theta: np.ndarray) -> float:
+        llf = dcc_loglikelihood(z, qbar, theta[0], theta[1], block_rows)
+        # Нормировка на T — шаги оптимизатора не зависят от длины ряда
+        return -llf / z.shape[0] if np.isfinite(llf) else 1e10
+
+    result = minimize(
+        objective,
+        np.array(_START),
+        method="SLSQP",
+        bounds=[(0.0, 1.0), (0.0, 1.0)],
+        constraints=[{"type": "ineq", "fun": lambda theta: _PERSISTENCE_MAX - theta[0] - theta[1]}],
+        options={"ftol": 1e-10, "maxiter": 200},
+    )
+    a, b = (float(v) for v in result.x)
+    return DccFit(
+        tickers=list(store.tickers),
+        index=index,
+        a=a,
+        b=b,
+        loglikelihood=-float(result.fun) * z.shape[0],
+        converged=bool(result.success),
+        func_evals=int(result.nfev),
+        elapsed_s=time.perf_counter() - started,
+        qbar=qbar,
+    )
+
+
+def write_dcc_correlations(
+    store: VolatilityStore, fit: DccFit, path: Path, chunk_mb: float = 64.0
+) -> DccCorrelations:
+    """
+    Пишет динамические корреляции в папку path блоками дат (float32, .npy)
+    и возвращает их в виде DccCorrelations, отображённых в память.
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    _, z = joint_residuals(store)
+    n_series = z.shape[1]
+    rows, cols = np.triu_indices(n_series)
+    off_diag = rows != cols
+
+    tmp_path = path / "correlations.tmp.npy"
+    out = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.float32, shape=(z.shape[0], int(off_diag.sum()))
+    )
+    block_rows = block_rows_for(n_series, chunk_mb)
+    for start, stop, packed in _correlation_blocks(z, fit.qbar, fit.a, fit.b, block_rows):
+        out[start:stop] = packed[:, off_diag]
+    out.flush()
+    del out
+    os.replace(tmp_path, path / "correlations.npy")
+
+    np.save(path / "index.npy", fit.index.to_numpy())
+    meta = {
+        "format_version": DCC_FORMAT_VERSION,
+        "tickers": fit.tickers,
+        "a": fit.a,
+        "b": fit.b,
+        "loglikelihood": fit.loglikelihood,
+    }
+    with open(path / _META, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return DccCorrelations.load(path)
+
+
+def run_dcc_garch(store: VolatilityStore, run_dir: Path, chunk_mb: float = 64.0) -> pd.DataFrame:
+    """
+    Оценивает DCC(1,1), сохраняет корреляции (папка корреляции_DCC),
+    параметры и среднюю и последнюю корреляционные матрицы (CSV) и печатает
+    сводку. Возвращает таблицу параметров.
+    """
+    fit = fit_dcc(store, chunk_mb=chunk_mb)
+    correlations = write_dcc_correlations(store, fit, run_dir / DCC_DIRNAME, chunk_mb=chunk_mb)
+
+    params_df = pd.DataFrame(
+        [
+            {
+                "a": fit.a,
+                "b": fit.b,
+                "a + b": fit.a + fit.b,
+                "Лог-правдоподобие (корреляции)": fit.loglikelihood,
+                "Сходимость": fit.converged,
+                "Наблюдений": len(fit.index),
+                "Тикеров": len(fit.tickers),
+            }
+        ]
+    )
+    params_path = run_dir / "DCC_GARCH_параметры.csv"
+    save_csv(params_df, params_path, index=False)
+    mean_path = run_dir / "DCC_GARCH_средние_корреляции.csv"
+    mean_corr = correlations.mean_matrix()
+    save_csv(mean_corr, mean_path)
+    last_path = run_dir / "DCC_GARCH_корреляции_на_последнюю_дату.csv"
+    save_csv(correlations.matrix(-1), last_path)
+
+    print(
+        f"\nDCC-GARCH(1,1): тикеров {len(fit.tickers)}, дат {len(fit.index)} "
+        f"({fit.elapsed_s:.1f} с): a = {fit.a:.4f}, b = {fit.b:.4f}"
+    )
+    print("Средние динамические корреляции:")
+    print(mean_corr.round(3))
+    print(f"  — параметры DCC: {params_path.name}")
+    print(f"  — средние корреляции: {mean_path.name}")
+    print(f"  — корреляции на последнюю дату: {last_path.name}")
+    print(f"  — динамические корреляции (T×пары, float32): {DCC_DIRNAME}")
+    return params_df
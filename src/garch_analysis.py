@@ -1,89 +1,417 @@
 """
 Функции для расчёта лог-доходностей, оценки GARCH(1,1)
-и построения графиков условной волатильности.
+и описания графиков условной волатильности.
 """
 
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from arch import arch_model
+
+from garch_batch import fit_garch_batch
+from render import PlotJob, PlotLine, series_line
+from utils.processes import process_context
+from utils.run_store import save_csv
+from vol_store import VolatilityStore
+
+# Способы оценки: arch — отдельная модель arch на тикер,
+# batch — пакетный NumPy-движок сразу по всем тикерам (garch_batch.py)
+GARCH_BACKENDS = ("arch", "batch")
+
+# Папка с хранилищем рядов GARCH в папке запуска (см. vol_store.py)
+VOL_STORE_DIRNAME = "ряды_GARCH"
+
+# Объём блока цен, который логарифмируется за раз в compute_log_returns
+_RETURNS_BLOCK_BYTES = 8 * 1024**2
 
 
 def compute_log_returns(prices: pd.DataFrame) -> pd.DataFrame:
     """
-    Считает лог-доходности по ценовым рядам и удаляет первые NaN.
+    Считает лог-доходности по ценовым рядам и удаляет первые NaN
+    (строки, где доходность не определена хотя бы по одному тикеру).
+
+    Доходности пишутся сразу в итоговый массив блоками строк
+    (log p[t] - log p[t-1]), а строки с NaN удаляются сдвигом внутри
+    него же, поэтому кроме цен и результата память нужна только на блок.
+    Тип значений (например, float32) сохраняется.
     """
-    return np.log(prices / prices.shift(1)).dropna()
+    values = prices.to_numpy()
+    if not np.issubdtype(values.dtype, np.floating):
+        values = values.astype(np.float64)
+    n_rows = max(values.shape[0] - 1, 0)
+    out = np.empty((n_rows, values.shape[1]), dtype=values.dtype)
+    keep = np.empty(n_rows, dtype=bool)
 
+    block_rows = max(1, _RETURNS_BLOCK_BYTES // max(values[:1].nbytes, 1))
+    n_kept = 0
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_block = np.log(values[start : stop + 1])
+        block = out[start:stop]
+        np.subtract(log_block[1:], log_block[:-1], out=block)
+        block_keep = ~np.isnan(block).any(axis=1)
+        keep[start:stop] = block_keep
+        # Сдвигаем строки без NaN к началу (назначение не правее источника)
+        n_block = int(block_keep.sum())
+        out[n_kept : n_kept + n_block] = block[block_keep]
+        n_kept += n_block
 
-def fit_garch_and_collect_stats(
-    log_returns: pd.DataFrame, run_dir: Path
-) -> Tuple[Dict[str, float], Dict[str, pd.Series], Dict[str, pd.Series]]:
+    return pd.DataFrame(
+        out[:n_kept],
+        index=prices.index[1:][keep],
+        columns=prices.columns,
+        copy=False,
+    )
+
+
+@dataclass
+class GarchFit:
+    """
+    Результат оценки GARCH(1,1) по одному тикеру.
+    """
+
+    ticker: str
+    params: Dict[str, float]
+    cond_vol: pd.Series
+    std_resid: pd.Series
+    loglikelihood: float
+    # Сведения об оптимизаторе: 0 — успешная сходимость
+    convergence_flag: int
+    iterations: int
+    func_evals: int
+    # Время оценки, с (для пакетного движка — доля времени пакета)
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+
+
+@dataclass
+class GarchFitError:
+    """
+    Ошибка оценки GARCH(1,1) по одному тикеру (вместо падения всего запуска).
     """
-    Оценивает GARCH(1,1) по каждому ряду лог-доходностей.
 
-    Возвращает:
-    - словарь средних волатильностей по тикерам;
-    - словарь рядов условной волатильности;
-    - словарь стандартизированных остатков для тестов белошумности.
+    ticker: str
+    error_type: str
+    message: str
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
 
-    По каждому тикеру строится и сохраняется график условной волатильности.
+
+def fit_single_garch(
+    ticker: str, log_ret: pd.Series, starting_values: Optional[np.ndarray] = None
+) -> Union[GarchFit, GarchFitError]:
     """
-    tickers = log_returns.columns
-    volatility_results: Dict[str, float] = {}
-    cond_vol_series: Dict[str, pd.Series] = {}
-    std_resid_series: Dict[str, pd.Series] = {}
+    Оценивает GARCH(1,1) по одному ряду лог-доходностей.
 
-    for ticker in tickers:
-        returns = log_returns[ticker].dropna() * 100  # в процентах
+    starting_values — необязательные стартовые параметры
+    (mu, omega, alpha[1], beta[1]), например, из прошлой оценки.
+    """
+    # arch импортирует matplotlib при загрузке, поэтому импортируем его
+    # только при оценке (режим --no-plots запрещает импорт matplotlib)
+    from arch import arch_model
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        returns = log_ret.dropna() * 100  # в процентах
 
         model = arch_model(returns, vol="Garch", p=1, q=1, dist="normal", rescale=False)
-        result = model.fit(disp="off")
+        result = model.fit(disp="off", starting_values=starting_values)
 
-        # Условная волатильность и среднее значение волатильности
+        # Условная волатильность — с датами, для графика сопоставления
         cond_vol = result.conditional_volatility
-        cond_vol.index = returns.index  # для графика сопоставления по датам
-        mean_vol = cond_vol.mean()
-        volatility_results[ticker] = mean_vol
-        cond_vol_series[ticker] = cond_vol
-
+        cond_vol.index = returns.index
         # Стандартизированные остатки GARCH: нужны для проверки на белошумность
-        std_resid = pd.Series(result.std_resid, index=returns.index)
-        std_resid_series[ticker] = std_resid
-
-        # График волатильности по каждому банку — сохраняем в output/
-        plt.figure(figsize=(10, 4))
-        plt.plot(cond_vol)
-        plt.title(f"GARCH(1,1) Волатильность: {ticker}")
-        plt.ylabel("Волатильность (%)")
-        plt.grid(True)
-        plt.tight_layout()
-        out_path = run_dir / f"волатильность_GARCH_{ticker}.png"
-        plt.savefig(out_path)
-        plt.close()
-
-    return volatility_results, cond_vol_series, std_resid_series
-
-
-def plot_volatility_comparison(
-    cond_vol_series: Dict[str, pd.Series], run_dir: Path
-) -> None:
-    """
-    Строит общий график для сравнения условной волатильности по всем банкам.
-    """
-    vol_compare = pd.DataFrame(cond_vol_series)
-    plt.figure(figsize=(12, 5))
-    for col in vol_compare.columns:
-        plt.plot(vol_compare.index, vol_compare[col], label=col, alpha=0.8)
-    plt.title("Сопоставление условной волатильности (GARCH) по банкам")
-    plt.ylabel("Волатильность (%)")
-    plt.xlabel("Дата")
-    plt.legend(loc="best", fontsize=9)
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(run_dir / "сравнение_волатильности_GARCH.png")
-    plt.close()
-    print("  — сопоставление: сравнение_волатильности_GARCH.png")
+        std_resid = pd.Series(np.asarray(result.std_resid), index=returns.index)
+
+        opt = result.optimization_result
+        return GarchFit(
+            ticker=ticker,
+            params={name: float(value) for name, value in result.params.items()},
+            cond_vol=cond_vol,
+            std_resid=std_resid,
+            loglikelihood=float(result.loglikelihood),
+            convergence_flag=int(result.convergence_flag),
+            iterations=int(getattr(opt, "nit", 0)),
+            func_evals=int(getattr(opt, "nfev", 0)),
+            wall_time=time.perf_counter() - wall_start,
+            cpu_time=time.process_time() - cpu_start,
+        )
+    except Exception as exc:  # noqa: BLE001 — ошибка одного тикера не должна ронять запуск
+        return GarchFitError(
+            ticker=ticker,
+            error_type=type(exc).__name__,
+            message=str(exc),
+            wall_time=time.perf_counter() - wall_start,
+            cpu_time=time.process_time() - cpu_start,
+        )
+
+
+def _fit_single_garch(item: tuple) -> Union[GarchFit, GarchFitError]:
+    # Обёртка верхнего уровня, чтобы функцию можно было передавать в пул процессов
+    return fit_single_garch(*item)
+
+
+def _fit_garch_batch_chunk(
+    item: Tuple[pd.DataFrame, Optional[np.ndarray]],
+) -> list[Union[GarchFit, GarchFitError]]:
+    """
+    Оценивает GARCH(1,1) пакетным движком по группе тикеров.
+
+    Тикеры, для которых не хватает наблюдений, возвращаются как ошибки;
+    остальные оцениваются одним вызовом fit_garch_batch.
+    """
+    log_returns, theta0 = item
+    outcomes: Dict[str, Union[GarchFit, GarchFitError]] = {}
+    counts = log_returns.notna().sum()
+    usable = [ticker for ticker in log_returns.columns if counts[ticker] >= 2]
+    if theta0 is not None:
+        theta0 = theta0[[log_returns.columns.get_loc(ticker) for ticker in usable]]
+    for ticker in log_returns.columns:
+        if ticker not in usable:
+            outcomes[ticker] = GarchFitError(
+                ticker=ticker,
+                error_type="ValueError",
+                message="Недостаточно наблюдений для GARCH(1,1)",
+            )
+
+    if usable:
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            # в процентах
+            result = fit_garch_batch(log_returns[usable] * 100, theta0=theta0)
+        except Exception as exc:  # noqa: BLE001 — ошибка пакета не должна ронять запуск
+            for ticker in usable:
+                outcomes[ticker] = GarchFitError(
+                    ticker=ticker, error_type=type(exc).__name__, message=str(exc)
+                )
+        else:
+            # Время пакета делится между тикерами поровну
+            wall_share = (time.perf_counter() - wall_start) / len(usable)
+            cpu_share = (time.process_time() - cpu_start) / len(usable)
+            for ticker in usable:
+                cond_vol = result.cond_vol[ticker].dropna().rename("cond_vol")
+                outcomes[ticker] = GarchFit(
+                    ticker=ticker,
+                    params=result.params.loc[ticker].to_dict(),
+                    cond_vol=cond_vol,
+                    std_resid=result.std_resid[ticker].dropna().rename(None),
+                    loglikelihood=float(result.loglikelihood[ticker]),
+                    convergence_flag=0 if result.converged[ticker] else 1,
+                    iterations=int(result.iterations[ticker]),
+                    func_evals=int(result.func_evals[ticker]),
+                    wall_time=wall_share,
+                    cpu_time=cpu_share,
+                )
+    return [outcomes[ticker] for ticker in log_returns.columns]
+
+
+def fit_garch_models(
+    log_returns: pd.DataFrame,
+    n_jobs: Optional[int] = 1,
+    chunksize: Optional[int] = None,
+    backend: str = "arch",
+    starting_values: Optional[Dict[str, np.ndarray]] = None,
+) -> Tuple[Dict[str, GarchFit], Dict[str, GarchFitError]]:
+    """
+    Оценивает GARCH(1,1) по всем тикерам, при n_jobs > 1 — в пуле процессов.
+
+    n_jobs=None — по числу ядер. chunksize — сколько тикеров отдаётся
+    процессу за раз (по умолчанию для arch подбирается так, чтобы на процесс
+    приходилось около четырёх порций, для batch — поровну на процесс).
+    backend — "arch" (модель arch на каждый тикер) или "batch" (пакетный
+    NumPy-движок, см. garch_batch.py; оценки совпадают с arch в пределах
+    точности оптимизатора). starting_values — стартовые параметры по
+    тикерам для «тёплого» старта (пакетный движок использует их, только
+    если они заданы для всех тикеров порции).
+
+    Возвращает словарь успешных оценок и словарь ошибок по тикерам;
+    порядок ключей совпадает с порядком столбцов log_returns.
+    """
+    if backend not in GARCH_BACKENDS:
+        raise ValueError(f"Неизвестный способ оценки GARCH: {backend!r}")
+
+    tickers = list(log_returns.columns)
+    starting_values = starting_values or {}
+    workers = (os.cpu_count() or 1) if n_jobs is None else max(1, n_jobs)
+    workers = max(1, min(workers, len(tickers)))
+
+    if backend == "batch":
+        if chunksize is None:
+            chunksize = -(-len(tickers) // workers) if tickers else 1
+        chunks = []
+        for i in range(0, len(tickers), chunksize):
+            chunk_tickers = tickers[i : i + chunksize]
+            theta0 = None
+            if all(ticker in starting_values for ticker in chunk_tickers):
+                theta0 = np.array([starting_values[t] for t in chunk_tickers])
+            chunks.append((log_returns[chunk_tickers], theta0))
+        if workers == 1:
+            outcomes = [o for chunk in chunks for o in _fit_garch_batch_chunk(chunk)]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=process_context()
+            ) as executor:
+                outcomes = [
+                    o
+                    for chunk_outcomes in executor.map(_fit_garch_batch_chunk, chunks)
+                    for o in chunk_outcomes
+                ]
+    else:
+        items = [
+            (ticker, log_returns[ticker], starting_values.get(ticker)) for ticker in tickers
+        ]
+        if workers == 1:
+            outcomes = [_fit_single_garch(item) for item in items]
+        else:
+            if chunksize is None:
+                chunksize = max(1, len(items) // (workers * 4))
+            # executor.map сохраняет порядок входов — результат детерминирован
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=process_context()
+            ) as executor:
+                outcomes = list(
+                    executor.map(_fit_single_garch, items, chunksize=chunksize)
+                )
+
+    fits: Dict[str, GarchFit] = {}
+    errors: Dict[str, GarchFitError] = {}
+    for outcome in outcomes:
+        if isinstance(outcome, GarchFitError):
+            errors[outcome.ticker] = outcome
+        else:
+            fits[outcome.ticker] = outcome
+    return fits, errors
+
+
+def garch_fit_diagnostics(
+    fits: Dict[str, GarchFit], errors: Dict[str, GarchFitError]
+) -> List[dict]:
+    """
+    Сведения об оценке по тикерам для профиля запуска: время, итерации
+    и вызовы функции правдоподобия, флаг сходимости (у ошибок — тип ошибки).
+    """
+    rows = []
+    for ticker, fit in fits.items():
+        rows.append(
+            {
+                "ticker": ticker,
+                "status": "ok",
+                "wall_s": fit.wall_time,
+                "cpu_s": fit.cpu_time,
+                "iterations": fit.iterations,
+                "func_evals": fit.func_evals,
+                "convergence_flag": fit.convergence_flag,
+                "loglikelihood": fit.loglikelihood,
+            }
+        )
+    for ticker, error in errors.items():
+        rows.append(
+            {
+                "ticker": ticker,
+                "status": error.error_type,
+                "wall_s": error.wall_time,
+                "cpu_s": error.cpu_time,
+            }
+        )
+    return rows
+
+
+def save_garch_errors(errors: Dict[str, GarchFitError], run_dir: Path) -> None:
+    """
+    Печатает ошибки оценки GARCH по тикерам и сохраняет их в CSV.
+    """
+    if not errors:
+        return
+    errors_df = pd.DataFrame(
+        [
+            {"Тикер": e.ticker, "Тип ошибки": e.error_type, "Сообщение": e.message}
+            for e in errors.values()
+        ]
+    )
+    csv_path = run_dir / "ошибки_оценки_GARCH.csv"
+    save_csv(errors_df, csv_path, index=False)
+    print(f"\nGARCH(1,1) не удалось оценить для {len(errors)} тикеров:")
+    print(errors_df)
+    print(f"  — ошибки: {csv_path.name}")
+
+
+def fit_garch_and_collect_stats(
+    log_returns: pd.DataFrame,
+    run_dir: Path,
+    n_jobs: Optional[int] = 1,
+    chunksize: Optional[int] = None,
+    backend: str = "arch",
+) -> VolatilityStore:
+    """
+    Оценивает GARCH(1,1) по каждому ряду лог-доходностей.
+
+    Возвращает хранилище VolatilityStore: условная волатильность
+    и стандартизированные остатки (для тестов белошумности) матрицами T×N
+    с общим индексом дат, параметры моделей; средние волатильности —
+    store.mean_volatility().
+
+    При n_jobs > 1 модели оцениваются параллельно, backend выбирает способ
+    оценки (см. fit_garch_models); тикеры, по которым оценка не удалась,
+    пропускаются и сохраняются в ошибки_оценки_GARCH.csv.
+    """
+    fits, errors = fit_garch_models(
+        log_returns, n_jobs=n_jobs, chunksize=chunksize, backend=backend
+    )
+    return collect_garch_stats(fits, errors, run_dir)
+
+
+def collect_garch_stats(
+    fits: Dict[str, GarchFit], errors: Dict[str, GarchFitError], run_dir: Path
+) -> VolatilityStore:
+    """
+    Собирает оценки GARCH в хранилище для дальнейших этапов, сохраняет
+    его в папку запуска (ряды_GARCH, файлы .npy) и сохраняет ошибки.
+    """
+    save_garch_errors(errors, run_dir)
+
+    store = VolatilityStore.from_fits(fits)
+    store_path = store.save(run_dir / VOL_STORE_DIRNAME)
+    print(f"  — ряды GARCH (волатильность, остатки, параметры): {store_path.name}")
+    return store
+
+
+def garch_plot_jobs(store: VolatilityStore) -> List[PlotJob]:
+    """
+    Описывает графики условной волатильности по каждому банку.
+    """
+    return [
+        PlotJob(
+            filename=f"волатильность_GARCH_{ticker}.png",
+            title=f"GARCH(1,1) Волатильность: {ticker}",
+            figsize=(10, 4),
+            lines=[series_line(store.series(ticker))],
+            ylabel="Волатильность (%)",
+            grid_alpha=None,
+        )
+        for ticker in store.tickers
+    ]
+
+
+def volatility_comparison_plot_job(store: VolatilityStore) -> PlotJob:
+    """
+    Описывает общий график для сравнения условной волатильности по всем банкам.
+    """
+    # Столбцы общей матрицы (с NaN там, где ряд ещё не начался)
+    return PlotJob(
+        filename="сравнение_волатильности_GARCH.png",
+        title="Сопоставление условной волатильности (GARCH) по банкам",
+        figsize=(12, 5),
+        lines=[
+            PlotLine(x=store.index.to_numpy(), y=store.cond_vol[:, j], label=ticker, alpha=0.8)
+            for j, ticker in enumerate(store.tickers)
+        ],
+        xlabel="Дата",
+        ylabel="Волатильность (%)",
+        legend=True,
+    )
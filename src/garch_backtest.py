@@ -0,0 +1,229 @@
+"""
+Бэктест GARCH(1,1): переоценка на скользящем или расширяющемся окне
+и прогнозы волатильности на один шаг вперёд.
+
+Точки переоценки идут через каждые step дней начиная с window. В точке p
+модель оценивается по доходностям [p - window, p) (скользящее окно) или
+[0, p) (расширяющееся), а прогнозы условной дисперсии на дни p..p+step-1
+получаются рекурсией GARCH с этими параметрами по уже известным
+доходностям (прогноз на день t использует данные только до t-1).
+
+Задачи для пула процессов — пары (тикер, отрезок точек переоценки).
+Внутри отрезка каждая оценка стартует от параметров предыдущего окна
+(«тёплый» старт), поэтому оптимизатору хватает нескольких итераций.
+Прогнозы всех тикеров складываются в одну матрицу T×N.
+
+Качество прогнозов сравнивается с реализованной дисперсией r_t^2:
+QLIKE = mean(log h_t + r_t^2 / h_t) и MSE = mean((r_t^2 - h_t)^2).
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from garch_analysis import GarchFit, fit_single_garch
+from garch_batch import PARAM_NAMES
+from garch_state import filter_garch
+from utils.processes import process_context
+from utils.run_store import save_csv
+
+BACKTEST_SCHEMES = ("rolling", "expanding")
+
+
+@dataclass
+class BacktestResult:
+    """
+    Результат бэктеста.
+
+    sigma2 — матрица T×N прогнозов условной дисперсии (доходности в %)
+    на каждый день по данным до предыдущего дня; NaN, где прогноза нет.
+    skipped — тикеры, у которых наблюдений не больше window (ни одной
+    точки переоценки): по ним прогнозов нет.
+    """
+
+    sigma2: np.ndarray
+    index: pd.DatetimeIndex
+    tickers: List[str]
+    n_fits: Dict[str, int]
+    n_failed: Dict[str, int]
+    skipped: List[str] = field(default_factory=list)
+
+
+def refit_points(n_obs: int, window: int, step: int) -> np.ndarray:
+    """
+    Позиции переоценки: window, window + step, ... (меньше n_obs).
+    """
+    return np.arange(window, n_obs, step)
+
+
+def _run_segment(item: tuple) -> tuple:
+    """
+    Оценивает модели в точках points одного тикера с тёплым стартом
+    и считает прогнозы на отрезке от первой точки до конца последнего шага.
+    """
+    ticker, log_ret, points, window, scheme, step = item
+    values = log_ret.to_numpy(dtype=np.float64) * 100  # в процентах
+    n_obs = values.shape[0]
+    start, end = int(points[0]), min(int(points[-1]) + step, n_obs)
+    sigma2_out = np.full(end - start, np.nan)
+
+    params: Optional[Dict[str, float]] = None
+    last_sigma2 = last_resid = 0.0
+    n_fits = n_failed = 0
+    for p in points:
+        lo = p - window if scheme == "rolling" else 0
+        warm = None if params is None else np.array([params[k] for k in PARAM_NAMES])
+        fit = fit_single_garch(ticker, log_ret.iloc[lo:p], starting_values=warm)
+        if isinstance(fit, GarchFit):
+            n_fits += 1
+            params = fit.params
+            cond_vol = fit.cond_vol.to_numpy()
+            last_sigma2 = float(cond_vol[-1] ** 2)
+            last_resid = float(fit.std_resid.to_numpy()[-1] * cond_vol[-1])
+        else:
+            # Неудачная оценка: продолжаем с прежними параметрами (если они есть)
+            n_failed += 1
+        if params is None:
+            continue
+
+        block_end = min(p + step, n_obs)
+        sigma2, resid = filter_garch(params, last_sigma2, last_resid, values[p:block_end])
+        sigma2_out[p - start : block_end - start] = sigma2
+        last_sigma2, last_resid = float(sigma2[-1]), float(resid[-1])
+
+    return ticker, log_ret.index[start:end], sigma2_out, n_fits, n_failed
+
+
+def run_backtest(
+    log_returns: pd.DataFrame,
+    scheme: str = "rolling",
+    window: int = 500,
+    step: int = 5,
+    n_jobs: Optional[int] = 1,
+    segments: Optional[int] = None,
+) -> BacktestResult:
+    """
+    Бэктест GARCH(1,1) по всем тикерам: оценка в каждой точке переоценки
+    (через step дней, на окне window или расширяющемся) и прогнозы на шаг вперёд.
+
+    Точки каждого тикера делятся на segments отрезков (по умолчанию — чтобы
+    задач было не меньше, чем процессов); отрезки оцениваются параллельно,
+    внутри отрезка — последовательно с тёплым стартом. Тикеры короче окна
+    (например, недавно размещённые) пропускаются и перечисляются в skipped.
+    """
+    if scheme not in BACKTEST_SCHEMES:
+        raise ValueError(f"Неизвестная схема бэктеста: {scheme!r}")
+    if window < 2 or step < 1:
+        raise ValueError("Нужны window >= 2 и step >= 1")
+
+    tickers = list(log_returns.columns)
+    workers = (os.cpu_count() or 1) if n_jobs is None else max(1, n_jobs)
+    if segments is None:
+        segments = max(1, math.ceil(workers / max(len(tickers), 1)))
+
+    items = []
+    skipped = []
+    for ticker in tickers:
+        log_ret = log_returns[ticker].dropna()
+        points = refit_points(len(log_ret), window, step)
+        if points.size == 0:
+            skipped.append(ticker)
+            continue
+        for chunk in np.array_split(points, min(segments, len(points))):
+            items.append((ticker, log_ret, chunk, window, scheme, step))
+
+    if workers == 1 or len(items) <= 1:
+        outcomes = [_run_segment(item) for item in items]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(items)), mp_context=process_context()
+        ) as executor:
+            outcomes = list(executor.map(_run_segment, items))
+
+    sigma2 = np.full((len(log_returns), len(tickers)), np.nan)
+    n_fits = dict.fromkeys(tickers, 0)
+    n_failed = dict.fromkeys(tickers, 0)
+    columns = {ticker: j for j, ticker in enumerate(tickers)}
+    for ticker, index, values, fits, failed in outcomes:
+        rows = log_returns.index.get_indexer(index)
+        sigma2[rows, columns[ticker]] = values
+        n_fits[ticker] += fits
+        n_failed[ticker] += failed
+
+    return BacktestResult(
+        sigma2=sigma2,
+        index=log_returns.index,
+        tickers=tickers,
+        n_fits=n_fits,
+        n_failed=n_failed,
+        skipped=skipped,
+    )
+
+
+def backtest_metrics(result: BacktestResult, log_returns: pd.DataFrame) -> pd.DataFrame:
+    """
+    Потери прогнозов по тикерам относительно реализованной дисперсии r_t^2:
+    QLIKE = mean(log h + r^2 / h), MSE = mean((r^2 - h)^2).
+    """
+    realized = (log_returns[result.tickers].to_numpy(dtype=np.float64) * 100) ** 2
+    h = result.sigma2
+    mask = np.isfinite(h) & np.isfinite(realized) & (h > 0)
+    n = mask.sum(axis=0)
+    safe_h = np.where(mask, h, 1.0)
+    qlike = np.where(mask, np.log(safe_h) + realized / safe_h, 0.0).sum(axis=0)
+    mse = np.where(mask, (realized - safe_h) ** 2, 0.0).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame(
+            {
+                "Прогнозов": n,
+                "Оценок модели": [result.n_fits[t] for t in result.tickers],
+                "Неудачных оценок": [result.n_failed[t] for t in result.tickers],
+                "QLIKE": qlike / n,
+                "MSE": mse / n,
+            },
+            index=pd.Index(result.tickers, name="Тикер"),
+        )
+
+
+def run_garch_backtest(
+    log_returns: pd.DataFrame,
+    run_dir: Path,
+    scheme: str = "rolling",
+    window: int = 500,
+    step: int = 5,
+    n_jobs: Optional[int] = 1,
+) -> pd.DataFrame:
+    """
+    Выполняет бэктест, сохраняет матрицу прогнозов (NPZ: прогнозы, даты,
+    тикеры) и метрики (CSV) в папку запуска и печатает метрики.
+    """
+    result = run_backtest(log_returns, scheme=scheme, window=window, step=step, n_jobs=n_jobs)
+    metrics = backtest_metrics(result, log_returns)
+
+    forecast_path = run_dir / "бэктест_GARCH_прогнозы_дисперсии.npz"
+    np.savez_compressed(
+        forecast_path,
+        sigma2=result.sigma2,
+        index=result.index.to_numpy(),
+        tickers=np.array(result.tickers),
+    )
+    metrics_path = run_dir / "бэктест_GARCH_метрики.csv"
+    save_csv(metrics, metrics_path)
+
+    scheme_name = "скользящее" if scheme == "rolling" else "расширяющееся"
+    print(
+        f"\nБэктест GARCH(1,1): {scheme_name} окно {window}, переоценка каждые {step} дн.,"
+        " прогноз на 1 день вперёд:"
+    )
+    print(metrics)
+    if result.skipped:
+        print(f"  — без прогнозов (наблюдений не больше окна {window}): {', '.join(result.skipped)}")
+    print(f"  — прогнозы: {forecast_path.name}")
+    print(f"  — метрики: {metrics_path.name}")
+    return metrics
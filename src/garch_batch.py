@@ -0,0 +1,558 @@
+"""
+Пакетная оценка GARCH(1,1) сразу по всем тикерам средствами NumPy.
+
+Вместо отдельной модели arch на каждый столбец рекурсия дисперсии
+    sigma2[t] = omega + alpha * e[t-1]^2 + beta * sigma2[t-1],  e[t] = r[t] - mu
+и гауссово лог-правдоподобие считаются за один проход по времени для всей
+матрицы доходностей T×N. Слагаемые omega + alpha * e[t-1]^2 от sigma2
+не зависят, поэтому строятся векторно сразу для блока строк, а в цикле
+по времени остаётся одно умножение со сложением над вектором из N тикеров.
+
+Градиент по (mu, omega, alpha, beta) аналитический: обратный (сопряжённый)
+проход lambda[t] = q[t] + beta * lambda[t+1] и векторные суммы по T×N.
+Параметры всех тикеров оптимизируются вместе пакетным квазиньютоновским
+методом (стартовый гессиан — конечные разности градиента, далее BFGS
+по каждому тикеру), шаг выбирается поиском по Армихо отдельно для
+каждого тикера.
+
+Начало рекурсии (backcast) и стартовые значения повторяют arch, поэтому
+оценки совпадают с arch_model(..., vol="Garch", p=1, q=1, dist="normal")
+в пределах точности оптимизатора.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+PARAM_NAMES = ["mu", "omega", "alpha[1]", "beta[1]"]
+
+_LOG_2PI = float(np.log(2.0 * np.pi))
+# Размер блока строк: промежуточные массивы блока должны помещаться в кэш
+_TIME_BLOCK = 128
+# При небольшом числе столбцов линейная рекурсия считается по столбцам
+# через lfilter (цикл на C), иначе — циклом по строкам над всеми столбцами
+_LFILTER_MAX_SERIES = 32
+# Запас до границы стационарности alpha + beta < 1
+_PERSISTENCE_MAX = 1.0 - 1e-6
+# Стартовая сетка (как в arch): alpha × (alpha + beta)
+_START_ALPHAS = (0.01, 0.05, 0.1, 0.2)
+_START_PERSISTENCE = (0.5, 0.7, 0.9, 0.98)
+# Переход к координатам (mu, omega, alpha, alpha + beta): в них ограничение
+# стационарности — обычная граница, и её можно учесть в активном множестве
+_TO_PERSISTENCE = np.array(
+    [
+        [1.0, 0.0, 0.0, 0.0],
+        [0.0, 1.0, 0.0, 0.0],
+        [0.0, 0.0, 1.0, 0.0],
+        [0.0, 0.0, -1.0, 1.0],
+    ]
+)
+
+
+@dataclass
+class BatchGarchResult:
+    """
+    Результат пакетной оценки GARCH(1,1).
+
+    params — таблица тикер × (mu, omega, alpha[1], beta[1]);
+    cond_vol и std_resid — матрицы T×N с NaN там, где у тикера нет данных.
+    """
+
+    params: pd.DataFrame
+    loglikelihood: pd.Series
+    converged: pd.Series
+    iterations: pd.Series
+    # Число проходов рекурсии, в которых участвовал тикер
+    func_evals: pd.Series
+    cond_vol: pd.DataFrame
+    std_resid: pd.DataFrame
+
+
+def garch_backcast(y: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    Начальное значение дисперсии по первым 75 остаткам каждого столбца
+    (экспоненциальные веса 0.94^k, как GARCH.backcast в arch).
+    Остатки берутся относительно выборочного среднего — стартового mu.
+    """
+    n_valid = valid.sum(axis=0)
+    means = np.where(valid, y, 0.0).sum(axis=0) / np.maximum(n_valid, 1)
+    backcast = np.empty(y.shape[1])
+    for j in range(y.shape[1]):
+        resid = y[valid[:, j], j] - means[j]
+        tau = min(75, resid.shape[0])
+        w = 0.94 ** np.arange(tau)
+        backcast[j] = np.sum(resid[:tau] ** 2 * w) / w.sum()
+    return backcast
+
+
+def _block_inputs(
+    y_blk: np.ndarray,
+    valid_blk: Optional[np.ndarray],
+    theta: np.ndarray,
+    carry: tuple[np.ndarray, np.ndarray],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, tuple]:
+    """
+    Входы рекурсии для блока строк: остатки e, последний остаток до t
+    (e_prev и e_prev^2; до первого наблюдения — 0 и backcast), свободный
+    член omega + alpha * e_prev^2 и коэффициент при sigma2[t-1].
+
+    carry — (последний остаток, его квадрат) на входе в блок; возвращается
+    обновлённое значение для следующего блока. valid_blk=None означает,
+    что в блоке нет пропусков.
+    """
+    mu, omega, alpha, beta = theta.T
+    last_e, last_e2 = carry
+    e = y_blk - mu
+    e_prev = np.empty_like(e)
+    e2_prev = np.empty_like(e)
+
+    if valid_blk is None:
+        e_prev[0] = last_e
+        e_prev[1:] = e[:-1]
+        np.multiply(e_prev, e_prev, out=e2_prev)
+        e2_prev[0] = last_e2
+        new_carry = (e[-1], e[-1] * e[-1])
+        intercept = alpha * e2_prev
+        intercept += omega
+        return e, e_prev, e2_prev, intercept, beta, new_carry
+
+    # В пропусках состояние переносится: intercept = 0, coef = 1
+    e = np.where(valid_blk, e, 0.0)
+    rows = np.where(valid_blk, np.arange(e.shape[0])[:, None], -1)
+    last = np.maximum.accumulate(rows, axis=0)
+    prev = np.empty_like(last)
+    prev[0] = -1
+    prev[1:] = last[:-1]
+    inside = prev >= 0
+    e_local = np.take_along_axis(e, np.maximum(prev, 0), axis=0)
+    e_prev = np.where(inside, e_local, last_e)
+    e2_prev = np.where(inside, e_local * e_local, last_e2)
+
+    seen = last[-1] >= 0
+    e_last = np.take_along_axis(e, np.maximum(last[-1], 0)[None, :], axis=0)[0]
+    new_carry = (
+        np.where(seen, e_last, last_e),
+        np.where(seen, e_last * e_last, last_e2),
+    )
+    intercept = np.where(valid_blk, omega + alpha * e2_prev, 0.0)
+    coef = np.where(valid_blk, beta, 1.0)
+    return e, e_prev, e2_prev, intercept, coef, new_carry
+
+
+def _linear_recursion(
+    out: np.ndarray, intercept: np.ndarray, coef: np.ndarray, first: np.ndarray
+) -> None:
+    """
+    Заполняет out[0] = intercept[0] + first и
+    out[t] = intercept[t] + coef[t] * out[t-1] для t >= 1.
+
+    coef — вектор (N,), если коэффициент постоянен в блоке, иначе матрица.
+    """
+    n_rows, n_series = out.shape
+    if coef.ndim == 1 and n_series <= _LFILTER_MAX_SERIES:
+        from scipy.signal import lfilter
+
+        for j in range(n_series):
+            out[:, j], _ = lfilter([1.0], [1.0, -coef[j]], intercept[:, j], zi=[first[j]])
+        return
+    out[0] = intercept[0] + first
+    for t in range(1, n_rows):
+        row = out[t]
+        np.multiply(out[t - 1], coef if coef.ndim == 1 else coef[t], out=row)
+        row += intercept[t]
+
+
+def garch_recursion(
+    y: np.ndarray,
+    valid: np.ndarray,
+    theta: np.ndarray,
+    backcast: np.ndarray,
+    need_grad: bool = False,
+    store: bool = False,
+) -> tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Рекурсия GARCH(1,1) по матрице y (T×N) сразу для всех столбцов.
+
+    theta — параметры (N×4) в порядке mu, omega, alpha, beta.
+    Пропуски (valid=False) пропускаются с сохранением состояния, что
+    эквивалентно dropna() по каждому столбцу отдельно.
+
+    Матрица обрабатывается блоками по _TIME_BLOCK строк, чтобы
+    промежуточные массивы помещались в кэш процессора.
+
+    Возвращает лог-правдоподобие по столбцам (N,), при need_grad — его
+    градиент (N×4), при store — матрицу условных дисперсий (T×N, NaN
+    в пропусках).
+    """
+    n_obs, n_series = y.shape
+    alpha = theta[:, 2]
+    row_valid = valid.all(axis=1)
+    starts = range(0, n_obs, _TIME_BLOCK)
+
+    def block_valid(a: int, b: int) -> Optional[np.ndarray]:
+        return None if row_valid[a:b].all() else valid[a:b]
+
+    sigma2 = np.empty((n_obs, n_series))
+    llf = np.zeros(n_series)
+    carry = (np.zeros(n_series), backcast.copy())
+    carries = []
+    for a in starts:
+        b = min(a + _TIME_BLOCK, n_obs)
+        v_blk = block_valid(a, b)
+        carries.append(carry)
+        e, _, _, intercept, coef, carry = _block_inputs(y[a:b], v_blk, theta, carry)
+        s_blk = sigma2[a:b]
+        previous = sigma2[a - 1] if a > 0 else backcast
+        _linear_recursion(
+            s_blk, intercept, coef, previous * (coef if v_blk is None else coef[0])
+        )
+        contrib = np.log(s_blk)
+        contrib += e * e / s_blk
+        if v_blk is not None:
+            contrib = np.where(v_blk, contrib, 0.0)
+        llf -= 0.5 * contrib.sum(axis=0)
+    llf -= 0.5 * _LOG_2PI * valid.sum(axis=0)
+
+    grad = None
+    if need_grad:
+        # Обратный проход: lambda[t] = q[t] + coef[t+1] * lambda[t+1],
+        # q[t] = d l[t] / d sigma2[t]; градиент — суммы lambda на входы рекурсии
+        grad = np.zeros((n_series, 4))
+        lam_next = np.zeros(n_series)
+        coef_next = np.zeros(n_series)
+        for a, carry in zip(reversed(starts), reversed(carries)):
+            b = min(a + _TIME_BLOCK, n_obs)
+            v_blk = block_valid(a, b)
+            e, e_prev, e2_prev, _, coef, _ = _block_inputs(y[a:b], v_blk, theta, carry)
+            s_blk = sigma2[a:b]
+            inv_s = 1.0 / s_blk
+            q = e * e * inv_s
+            q -= 1.0
+            q *= 0.5 * inv_s
+            if v_blk is not None:
+                q = np.where(v_blk, q, 0.0)
+                inv_s = np.where(v_blk, inv_s, 0.0)
+
+            # Та же линейная рекурсия, но в обратном времени: коэффициент при
+            # lambda[t+1] — coef[t+1], поэтому он сдвигается на строку
+            lam = np.empty_like(q)
+            if v_blk is None:
+                _linear_recursion(lam[::-1], q[::-1], coef, lam_next * coef_next)
+            else:
+                shifted = np.empty_like(coef)
+                shifted[-1] = coef_next
+                shifted[:-1] = coef[1:]
+                _linear_recursion(lam[::-1], q[::-1], shifted[::-1], lam_next * coef_next)
+            lam_next = lam[0]
+            coef_next = coef if v_blk is None else coef[0]
+            if v_blk is not None:
+                lam = np.where(v_blk, lam, 0.0)
+
+            s_prev = np.empty_like(s_blk)
+            s_prev[0] = sigma2[a - 1] if a > 0 else backcast
+            s_prev[1:] = s_blk[:-1]
+            grad[:, 0] += (e * inv_s).sum(axis=0) - 2.0 * alpha * (lam * e_prev).sum(
+                axis=0
+            )
+            grad[:, 1] += lam.sum(axis=0)
+            grad[:, 2] += (lam * e2_prev).sum(axis=0)
+            grad[:, 3] += (lam * s_prev).sum(axis=0)
+
+    if store and not row_valid.all():
+        sigma2 = np.where(valid, sigma2, np.nan)
+    return llf, grad, (sigma2 if store else None)
+
+
+def _bounds(y: np.ndarray, valid: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Нижние и верхние границы параметров по столбцам (как в arch).
+    """
+    masked = np.where(valid, y, np.nan)
+    var = np.nanvar(masked, axis=0)
+    abs_max = np.nanmax(np.abs(masked), axis=0)
+    lower = np.column_stack(
+        [-10.0 * abs_max, 1e-8 * var, np.zeros_like(var), np.zeros_like(var)]
+    )
+    upper = np.column_stack(
+        [10.0 * abs_max, 10.0 * var, np.ones_like(var), np.ones_like(var)]
+    )
+    return lower, upper
+
+
+def _project(theta: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    theta = np.clip(theta, lower, upper)
+    persistence = theta[:, 2] + theta[:, 3]
+    over = persistence > _PERSISTENCE_MAX
+    if over.any():
+        scale = _PERSISTENCE_MAX / persistence[over]
+        theta[over, 2] *= scale
+        theta[over, 3] *= scale
+    return theta
+
+
+def garch_starting_values(
+    y: np.ndarray, valid: np.ndarray, backcast: np.ndarray
+) -> tuple[np.ndarray, int]:
+    """
+    Стартовые значения: выборочное среднее и лучшая по правдоподобию точка
+    сетки alpha × persistence (omega подбирается под выборочную дисперсию).
+
+    Возвращает параметры (N×4) и число проходов рекурсии.
+    """
+    n_series = y.shape[1]
+    masked = np.where(valid, y, np.nan)
+    mu = np.nanmean(masked, axis=0)
+    var = np.nanvar(masked, axis=0)
+
+    best = np.zeros((n_series, 4))
+    best_llf = np.full(n_series, -np.inf)
+    evals = 0
+    for alpha in _START_ALPHAS:
+        for persistence in _START_PERSISTENCE:
+            if alpha >= persistence:
+                continue
+            theta = np.column_stack(
+                [
+                    mu,
+                    var * (1.0 - persistence),
+                    np.full(n_series, alpha),
+                    np.full(n_series, persistence - alpha),
+                ]
+            )
+            llf, _, _ = garch_recursion(y, valid, theta, backcast)
+            evals += 1
+            better = llf > best_llf
+            best[better] = theta[better]
+            best_llf[better] = llf[better]
+    return best, evals
+
+
+def _fd_hessian(
+    y: np.ndarray,
+    valid: np.ndarray,
+    theta: np.ndarray,
+    backcast: np.ndarray,
+    grad: np.ndarray,
+    upper: np.ndarray,
+) -> np.ndarray:
+    """
+    Гессиан лог-правдоподобия как конечные разности аналитического
+    градиента (один проход на параметр для всех тикеров сразу).
+    """
+    hess = np.empty((theta.shape[0], 4, 4))
+    for j in range(4):
+        step = 1e-6 * np.maximum(np.abs(theta[:, j]), 1e-4 * upper[:, 1] ** 0.5)
+        # Шаг внутрь допустимой области, чтобы не выйти за верхнюю границу
+        step = np.where(theta[:, j] + step > upper[:, j], -step, step)
+        shifted = theta.copy()
+        shifted[:, j] += step
+        _, grad_j, _ = garch_recursion(y, valid, shifted, backcast, need_grad=True)
+        hess[:, :, j] = (grad_j - grad) / step[:, None]
+    return 0.5 * (hess + hess.transpose(0, 2, 1))
+
+
+def _bfgs_update(
+    hess: np.ndarray, step: np.ndarray, grad_change: np.ndarray
+) -> np.ndarray:
+    """
+    BFGS-обновление приближения гессиана лог-правдоподобия по каждому тикеру.
+    Обновление пропускается, если нарушено условие кривизны.
+    """
+    neg_h = -hess
+    y_vec = -grad_change
+    sy = np.einsum("nk,nk->n", step, y_vec)
+    h_s = np.einsum("nij,nj->ni", neg_h, step)
+    s_h_s = np.einsum("nk,nk->n", step, h_s)
+    ok = (sy > 1e-12 * np.maximum(s_h_s, 1e-300)) & (s_h_s > 0)
+    sy_safe = np.where(ok, sy, 1.0)
+    shs_safe = np.where(ok, s_h_s, 1.0)
+    correction = (
+        y_vec[:, :, None] * y_vec[:, None, :] / sy_safe[:, None, None]
+        - h_s[:, :, None] * h_s[:, None, :] / shs_safe[:, None, None]
+    )
+    return -(neg_h + np.where(ok[:, None, None], correction, 0.0))
+
+
+def _newton_direction(
+    grad: np.ndarray, hess: np.ndarray, free: np.ndarray
+) -> np.ndarray:
+    """
+    Направление Ньютона для максимизации по свободным (не упёртым в границу)
+    параметрам. Если -H не положительно определена, добавляется сдвиг
+    по диагонали (Левенберг–Марквардт).
+    """
+    k = grad.shape[1]
+    eye = np.eye(k)
+    fixed = ~free
+    # Закреплённые параметры исключаем из системы
+    neg_h = np.where(fixed[:, :, None] | fixed[:, None, :], 0.0, -hess)
+    neg_h = neg_h + eye * fixed[:, :, None]
+    g = np.where(free, grad, 0.0)
+
+    eig_min = np.linalg.eigvalsh(neg_h)[:, 0]
+    scale = np.abs(np.einsum("nii->n", neg_h)) / k + 1e-12
+    shift = np.where(eig_min < 1e-8 * scale, 1e-6 * scale - eig_min, 0.0)
+    neg_h = neg_h + shift[:, None, None] * eye
+    return np.linalg.solve(neg_h, g[:, :, None])[:, :, 0]
+
+
+def optimize_garch(
+    y: np.ndarray,
+    valid: np.ndarray,
+    backcast: np.ndarray,
+    theta0: Optional[np.ndarray] = None,
+    max_iter: int = 100,
+    tol: float = 1e-9,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Пакетная максимизация правдоподобия GARCH(1,1) по всем столбцам y.
+
+    theta0 — стартовые параметры (N×4); если не заданы, берутся по сетке
+    garch_starting_values. Тикер выбывает из оптимизации, как только
+    декремент g' (-H)^-1 g становится меньше tol, или если поиск шага не
+    нашёл улучшения (тогда он не сошёлся, если декремент не меньше sqrt(tol)).
+
+    Возвращает параметры, лог-правдоподобие, признак сходимости, число
+    итераций и число проходов рекурсии по тикерам (тикер, выбывший из
+    оптимизации, в следующих проходах не участвует).
+    """
+    n_series = y.shape[1]
+    lower, upper = _bounds(y, valid)
+    evals = np.zeros(n_series, dtype=int)
+    if theta0 is None:
+        theta, n_start = garch_starting_values(y, valid, backcast)
+        evals += n_start
+    else:
+        theta = np.array(theta0, dtype=np.float64)
+    theta = _project(theta, lower, upper)
+
+    # Гессиан считается конечными разностями один раз, дальше — BFGS
+    llf, grad, _ = garch_recursion(y, valid, theta, backcast, need_grad=True)
+    hess = _fd_hessian(y, valid, theta, backcast, grad, upper)
+    evals += 5
+    converged = np.zeros(n_series, dtype=bool)
+    iterations = np.zeros(n_series, dtype=int)
+    active = np.arange(n_series)
+    # Тикеры, у которых BFGS-приближение стало плохим (шаг пришлось дробить)
+    refresh = np.zeros(n_series, dtype=bool)
+
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        ya, va, bc = y[:, active], valid[:, active], backcast[active]
+        lo, hi = lower[active], upper[active]
+        th, g = theta[active], grad[active]
+        iterations[active] += 1
+
+        stale = np.flatnonzero(refresh[active])
+        if stale.size:
+            hess[active[stale]] = _fd_hessian(
+                ya[:, stale], va[:, stale], th[stale], bc[stale], g[stale], hi[stale]
+            )
+            refresh[active[stale]] = False
+            evals[active[stale]] += 4
+
+        # Шаг ищем в координатах (mu, omega, alpha, alpha + beta).
+        # Параметр закреплён, если он на границе и градиент тянет наружу.
+        grad_p = g @ _TO_PERSISTENCE
+        hess_p = _TO_PERSISTENCE.T @ hess[active] @ _TO_PERSISTENCE
+        persistence = th[:, 2] + th[:, 3]
+        fixed = np.zeros_like(th, dtype=bool)
+        fixed[:, 0] = ((th[:, 0] <= lo[:, 0]) & (grad_p[:, 0] < 0)) | (
+            (th[:, 0] >= hi[:, 0]) & (grad_p[:, 0] > 0)
+        )
+        fixed[:, 1] = (th[:, 1] <= lo[:, 1] * (1 + 1e-9)) & (grad_p[:, 1] < 0)
+        fixed[:, 2] = (th[:, 2] <= 1e-12) & (grad_p[:, 2] < 0)
+        fixed[:, 3] = (persistence >= _PERSISTENCE_MAX - 1e-12) & (grad_p[:, 3] > 0)
+        direction = _newton_direction(grad_p, hess_p, ~fixed) @ _TO_PERSISTENCE.T
+        decrement = np.einsum("nk,nk->n", g, direction)
+
+        done = decrement < tol
+        converged[active[done]] = True
+
+        # Поиск шага по Армихо отдельно для каждого тикера; проход по
+        # кандидату сразу даёт и градиент для следующей итерации
+        todo = np.flatnonzero(~done)
+        step = np.ones(todo.size)
+        accepted = np.zeros(todo.size, dtype=bool)
+        for _ in range(30):
+            pending = np.flatnonzero(~accepted)
+            if pending.size == 0:
+                break
+            idx = todo[pending]
+            candidate = _project(
+                th[idx] + step[pending, None] * direction[idx], lo[idx], hi[idx]
+            )
+            llf_c, grad_c, _ = garch_recursion(
+                ya[:, idx], va[:, idx], candidate, bc[idx], need_grad=True
+            )
+            evals[active[idx]] += 1
+            improved = np.isfinite(llf_c) & (
+                llf_c >= llf[active[idx]] + 1e-4 * step[pending] * decrement[idx]
+            )
+            hit = pending[improved]
+            rows = active[todo[hit]]
+            hess[rows] = _bfgs_update(
+                hess[rows], candidate[improved] - theta[rows], grad_c[improved] - grad[rows]
+            )
+            theta[rows] = candidate[improved]
+            llf[rows] = llf_c[improved]
+            grad[rows] = grad_c[improved]
+            refresh[rows] = step[hit] < 1.0
+            accepted[hit] = True
+            step[pending[~improved]] *= 0.5
+
+        # Шаг найти не удалось: тикер выбывает, но сошедшимся считается, только
+        # если декремент (квадрат нормы градиента в метрике (-H)^-1) уже мал —
+        # остаток прироста правдоподобия меньше sqrt(tol)
+        stalled = todo[~accepted]
+        converged[active[stalled]] = decrement[stalled] < np.sqrt(tol)
+        active = active[todo[accepted]]
+
+    return theta, llf, converged, iterations, evals
+
+
+def fit_garch_batch(
+    returns: pd.DataFrame,
+    max_iter: int = 100,
+    tol: float = 1e-9,
+    theta0: Optional[np.ndarray] = None,
+) -> BatchGarchResult:
+    """
+    Оценивает GARCH(1,1) с постоянным средним и нормальными инновациями
+    одновременно по всем столбцам returns (доходности, как правило, в %).
+
+    Пропуски внутри столбца исключаются из рекурсии, как при dropna().
+    theta0 — необязательные стартовые параметры (N×4), например, оценки
+    прошлого запуска; tol — порог декремента g' (-H)^-1 g (в единицах
+    лог-правдоподобия), ниже которого оценка считается сошедшейся.
+    """
+    y = np.ascontiguousarray(returns.to_numpy(dtype=np.float64))
+    valid = np.isfinite(y)
+    y = np.where(valid, y, 0.0)
+    n_valid = valid.sum(axis=0)
+    if (n_valid < 2).any():
+        empty = [str(c) for c, n in zip(returns.columns, n_valid) if n < 2]
+        raise ValueError(f"Недостаточно наблюдений для GARCH(1,1): {', '.join(empty)}")
+
+    backcast = garch_backcast(y, valid)
+    theta, _, converged, iterations, evals = optimize_garch(
+        y, valid, backcast, theta0=theta0, max_iter=max_iter, tol=tol
+    )
+    llf, _, sigma2 = garch_recursion(y, valid, theta, backcast, store=True)
+    evals += 1
+
+    cond_vol = np.sqrt(sigma2)
+    std_resid = np.where(valid, (y - theta[:, 0]) / cond_vol, np.nan)
+    tickers = returns.columns
+    return BatchGarchResult(
+        params=pd.DataFrame(theta, index=tickers, columns=PARAM_NAMES),
+        loglikelihood=pd.Series(llf, index=tickers),
+        converged=pd.Series(converged, index=tickers),
+        iterations=pd.Series(iterations, index=tickers),
+        func_evals=pd.Series(evals, index=tickers),
+        cond_vol=pd.DataFrame(cond_vol, index=returns.index, columns=tickers),
+        std_resid=pd.DataFrame(std_resid, index=returns.index, columns=tickers),
+    )
@@ -0,0 +1,459 @@
+"""
+Выбор спецификации GARCH по тикерам: перебор GARCH / GJR-GARCH / EGARCH
+разных порядков с нормальным, t- и скошенным t-распределением по BIC.
+
+Кандидаты образуют дерево вложенных моделей: корни — GARCH(1,1) и
+EGARCH(1,0,1) с нормальным распределением; потомок добавляет к родителю
+параметры (порядок p или q, асимметрию gamma, хвосты nu, скошенность
+lambda) и оценивается с «тёплого» старта — параметров родителя, где новые
+параметры взяты нейтральными (т.е. в точке, близкой к родительской модели).
+
+Перебор идёт уровнями дерева: все кандидаты уровня по всем тикерам
+оцениваются в пуле процессов, которому доходности (уже очищенные и
+в процентах) передаются один раз при запуске. Отсечение по BIC:
+- потомки по порядку и асимметрии раскрываются, только если BIC
+  родителя не хуже лучшего BIC тикера с тем же распределением более чем
+  на prune_margin;
+- кандидат сначала оценивается за screen_iter итераций; если он не
+  сошёлся и его BIC по частичной оценке хуже лучшего больше чем на
+  prune_margin, дооценка не выполняется.
+Решения принимаются по итогам предыдущих уровней, поэтому результат не
+зависит от порядка завершения задач. time_budget ограничивает время
+перебора: после него новые кандидаты не запускаются.
+
+Для каждой оценённой модели считаются p-значения теста Льюнга–Бокса
+(лаг 20) для стандартизированных остатков и их квадратов.
+"""
+
+import math
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from acf_kernel import acf_fft, portmanteau_tests
+from utils.processes import process_context
+from utils.run_store import save_csv
+
+SELECTION_VOLS = ("GARCH", "GJR", "EGARCH")
+SELECTION_DISTS = ("normal", "t", "skewt")
+
+# Лаг теста Льюнга–Бокса для остатков кандидатов
+_LB_LAG = 20
+
+_DIST_PARAMS = {"normal": [], "t": ["nu"], "skewt": ["eta", "lambda"]}
+_DIST_NAMES = {"normal": "N", "t": "t", "skewt": "skew-t"}
+# Нейтральные стартовые значения новых параметров
+_NEUTRAL = {"alpha": 0.0, "gamma": 0.0, "beta": 0.0, "nu": 8.0, "eta": 8.0, "lambda": 0.0}
+
+# Доходности по тикерам в процессе-исполнителе (передаются один раз при запуске)
+_RETURNS: Dict[str, np.ndarray] = {}
+
+
+@dataclass(frozen=True)
+class GarchSpec:
+    """
+    Спецификация модели: тип волатильности (GARCH, GJR, EGARCH),
+    порядки p (ARCH), o (асимметрия), q (GARCH) и распределение.
+    """
+
+    vol: str
+    p: int
+    o: int
+    q: int
+    dist: str
+
+    @property
+    def name(self) -> str:
+        if self.vol == "GARCH":
+            orders = f"{self.p},{self.q}"
+        else:
+            orders = f"{self.p},{self.o},{self.q}"
+        vol = "GJR-GARCH" if self.vol == "GJR" else self.vol
+        return f"{vol}({orders})-{_DIST_NAMES[self.dist]}"
+
+    @property
+    def param_names(self) -> List[str]:
+        # Порядок параметров как в arch: среднее, волатильность, распределение
+        return (
+            ["mu", "omega"]
+            + [f"alpha[{i}]" for i in range(1, self.p + 1)]
+            + [f"gamma[{i}]" for i in range(1, self.o + 1)]
+            + [f"beta[{i}]" for i in range(1, self.q + 1)]
+            + _DIST_PARAMS[self.dist]
+        )
+
+    def parent(self) -> Optional["GarchSpec"]:
+        """
+        Ближайшая вложенная (более простая) модель или None для корня.
+        """
+        if self.dist != "normal":
+            simpler = SELECTION_DISTS[SELECTION_DISTS.index(self.dist) - 1]
+            return GarchSpec(self.vol, self.p, self.o, self.q, simpler)
+        if self.vol == "GJR":
+            return GarchSpec("GARCH", self.p, 0, self.q, "normal")
+        if self.vol == "EGARCH" and self.o > 0:
+            return GarchSpec("EGARCH", self.p, 0, self.q, "normal")
+        if self.q > 1:
+            return GarchSpec(self.vol, self.p, self.o, self.q - 1, "normal")
+        if self.p > 1:
+            return GarchSpec(self.vol, self.p - 1, self.o, self.q, "normal")
+        return None
+
+
+def model_grid(
+    vols: Sequence[str] = SELECTION_VOLS,
+    max_p: int = 2,
+    max_q: int = 2,
+    dists: Sequence[str] = SELECTION_DISTS,
+) -> List[GarchSpec]:
+    """
+    Сетка кандидатов: все порядки p <= max_p, q <= max_q для каждого типа
+    (у GJR o = 1, у EGARCH o = 0 и 1) и каждого распределения. Вложенные
+    модели, нужные для тёплого старта, добавляются в сетку автоматически.
+    """
+    specs = []
+    for vol in vols:
+        orders = {"GARCH": (0,), "GJR": (1,), "EGARCH": (0, 1)}[vol]
+        for p in range(1, max_p + 1):
+            for o in orders:
+                for q in range(1, max_q + 1):
+                    for dist in dists:
+                        specs.append(GarchSpec(vol, p, o, q, dist))
+
+    grid: List[GarchSpec] = []
+    for spec in specs:
+        chain = []
+        while spec is not None and spec not in grid and spec not in chain:
+            chain.append(spec)
+            spec = spec.parent()
+        grid.extend(reversed(chain))
+    return grid
+
+
+def warm_start(spec: GarchSpec, parent_params: Dict[str, float]) -> np.ndarray:
+    """
+    Стартовые параметры из оценки родителя: общие параметры переносятся,
+    новые берутся нейтральными (nu родителя становится eta скошенного t).
+    """
+    values = []
+    for name in spec.param_names:
+        if name in parent_params:
+            values.append(parent_params[name])
+        elif name == "eta" and "nu" in parent_params:
+            values.append(parent_params["nu"])
+        else:
+            values.append(_NEUTRAL[name.split("[")[0]])
+    return np.array(values, dtype=np.float64)
+
+
+def _init_worker(returns: Dict[str, np.ndarray]) -> None:
+    global _RETURNS
+    _RETURNS = returns
+    warnings.simplefilter("ignore")
+
+
+def _fit_candidate(task: tuple) -> dict:
+    """
+    Оценивает кандидата по доходностям тикера: сначала за screen_iter
+    итераций, затем (если не отсечён по частичному BIC) до сходимости.
+    """
+    ticker, spec, start, screen_iter, abandon_bic = task
+    # arch импортирует matplotlib при загрузке — импортируем только при оценке
+    from arch import arch_model
+
+    y = _RETURNS[ticker]
+    started = time.perf_counter()
+    outcome = {"ticker": ticker, "spec": spec}
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model = arch_model(
+                y, mean="Constant", vol="GARCH" if spec.vol == "GJR" else spec.vol,
+                p=spec.p, o=spec.o, q=spec.q, dist=spec.dist, rescale=False,
+            )
+            screen = {"maxiter": screen_iter} if abandon_bic is not None else None
+            try:
+                result = model.fit(
+                    disp="off", starting_values=start, options=screen, show_warning=False
+                )
+            except ValueError:
+                # Тёплый старт вне допустимой области — стартуем по умолчанию arch
+                result = model.fit(disp="off", options=screen, show_warning=False)
+            iterations = int(getattr(result.optimization_result, "nit", 0))
+            if abandon_bic is not None and result.convergence_flag != 0:
+                if result.bic > abandon_bic:
+                    outcome.update(
+                        status="partial_bic",
+                        bic=float(result.bic),
+                        iterations=iterations,
+                        wall_s=time.perf_counter() - started,
+                    )
+                    return outcome
+                result = model.fit(
+                    disp="off", starting_values=result.params.to_numpy(), show_warning=False
+                )
+                iterations += int(getattr(result.optimization_result, "nit", 0))
+    except Exception as exc:  # noqa: BLE001 — ошибка кандидата не должна ронять перебор
+        outcome.update(
+            status="error", message=f"{type(exc).__name__}: {exc}",
+            wall_s=time.perf_counter() - started,
+        )
+        return outcome
+
+    std_resid = np.asarray(result.std_resid, dtype=np.float64)
+    std_resid = std_resid[np.isfinite(std_resid)]
+    acf, nobs = acf_fft([std_resid, std_resid**2], _LB_LAG)
+    lb = portmanteau_tests(acf, nobs, [_LB_LAG])["lb_pvalue"][0]
+    outcome.update(
+        status="ok",
+        params={name: float(v) for name, v in result.params.items()},
+        loglikelihood=float(result.loglikelihood),
+        aic=float(result.aic),
+        bic=float(result.bic),
+        converged=int(result.convergence_flag) == 0,
+        iterations=iterations,
+        lb_pvalue=float(lb[0]),
+        lb_pvalue_squared=float(lb[1]),
+        wall_s=time.perf_counter() - started,
+    )
+    return outcome
+
+
+class _TaskRunner:
+    """
+    Выполняет задачи уровня в пуле процессов (или в текущем процессе)
+    с общим сроком: задачи, не начатые к сроку, отменяются (None).
+    """
+
+    def __init__(self, returns: Dict[str, np.ndarray], n_jobs: Optional[int], n_tasks: int):
+        workers = (os.cpu_count() or 1) if n_jobs is None else max(1, n_jobs)
+        self.workers = max(1, min(workers, n_tasks))
+        self.executor = None
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=process_context(),
+                initializer=_init_worker,
+                initargs=(returns,),
+            )
+        else:
+            _init_worker(returns)
+
+    def run(self, tasks: List[tuple], deadline: float) -> List[Optional[dict]]:
+        if self.executor is None:
+            outcomes: List[Optional[dict]] = []
+            for task in tasks:
+                outcomes.append(_fit_candidate(task) if time.monotonic() < deadline else None)
+            return outcomes
+
+        futures = [self.executor.submit(_fit_candidate, task) for task in tasks]
+        timeout = None if math.isinf(deadline) else max(0.0, deadline - time.monotonic())
+        _, not_done = wait(futures, timeout=timeout)
+        for future in not_done:
+            future.cancel()
+        # Уже начатые задачи дорабатывают (одна оценка — доли секунды)
+        return [None if future.cancelled() else future.result() for future in futures]
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+
+@dataclass
+class SelectionResult:
+    """
+    Результат выбора моделей: таблица всех кандидатов по тикерам
+    и лучшая модель тикера (по BIC).
+    """
+
+    table: pd.DataFrame
+    best: pd.DataFrame
+    elapsed_s: float
+
+
+_STATUS_TEXT = {
+    "ok": "оценена",
+    "partial_bic": "отсечена по частичному BIC",
+    "pruned": "отсечена по BIC родителя",
+    "budget": "не оценена (лимит времени)",
+    "error": "ошибка оценки",
+}
+
+
+def select_garch_models(
+    log_returns: pd.DataFrame,
+    grid: Optional[Iterable[GarchSpec]] = None,
+    n_jobs: Optional[int] = 1,
+    prune_margin: float = 10.0,
+    screen_iter: int = 25,
+    time_budget: Optional[float] = None,
+) -> SelectionResult:
+    """
+    Перебирает спецификации grid (по умолчанию model_grid()) по всем
+    тикерам и выбирает лучшую по BIC (см. описание модуля).
+
+    prune_margin — допуск по BIC для раскрытия потомков и частичной
+    оценки (math.inf — без отсечения); time_budget — предел времени, с.
+    """
+    grid = list(grid) if grid is not None else model_grid()
+    in_grid = set(grid)
+    children: Dict[Optional[GarchSpec], List[GarchSpec]] = {}
+    for spec in grid:
+        parent = spec.parent()
+        children.setdefault(parent if parent in in_grid else None, []).append(spec)
+
+    # Доходности готовятся один раз и передаются в процессы при запуске пула
+    returns = {
+        ticker: log_returns[ticker].dropna().to_numpy(dtype=np.float64) * 100
+        for ticker in log_returns.columns
+    }
+    tickers = [ticker for ticker, values in returns.items() if values.size > 10]
+
+    started = time.monotonic()
+    deadline = math.inf if time_budget is None else started + time_budget
+    outcomes: Dict[Tuple[str, GarchSpec], dict] = {}
+    best_bic: Dict[Tuple[str, str], float] = {}
+
+    def mark_subtree(ticker: str, spec: GarchSpec, status: str) -> None:
+        for child in children.get(spec, []):
+            outcomes[(ticker, child)] = {"ticker": ticker, "spec": child, "status": status}
+            mark_subtree(ticker, child, status)
+
+    level = [(ticker, spec, None) for ticker in tickers for spec in children.get(None, [])]
+    runner = _TaskRunner(returns, n_jobs, len(tickers) * len(grid))
+    try:
+        while level:
+            tasks = []
+            for ticker, spec, start in level:
+                abandon = None
+                if not math.isinf(prune_margin):
+                    abandon = best_bic.get((ticker, spec.dist), math.inf) + prune_margin
+                    abandon = None if math.isinf(abandon) else abandon
+                tasks.append((ticker, spec, start, screen_iter, abandon))
+            results = runner.run(tasks, deadline)
+
+            for (ticker, spec, _), outcome in zip(level, results):
+                if outcome is None:
+                    outcome = {"ticker": ticker, "spec": spec, "status": "budget"}
+                outcomes[(ticker, spec)] = outcome
+                if outcome["status"] == "ok":
+                    key = (ticker, spec.dist)
+                    best_bic[key] = min(best_bic.get(key, math.inf), outcome["bic"])
+
+            next_level = []
+            for ticker, spec, _ in level:
+                outcome = outcomes[(ticker, spec)]
+                if outcome["status"] != "ok":
+                    status = "budget" if outcome["status"] == "budget" else "pruned"
+                    mark_subtree(ticker, spec, status)
+                    continue
+                # Смена распределения раскрывается всегда, усложнение волатильности —
+                # если модель близка к лучшей с тем же распределением
+                close_to_best = outcome["bic"] <= best_bic[(ticker, spec.dist)] + prune_margin
+                for child in children.get(spec, []):
+                    if child.dist != spec.dist or close_to_best:
+                        next_level.append((ticker, child, warm_start(child, outcome["params"])))
+                    else:
+                        outcomes[(ticker, child)] = {"ticker": ticker, "spec": child, "status": "pruned"}
+                        mark_subtree(ticker, child, "pruned")
+            level = next_level
+    finally:
+        runner.close()
+
+    table = _comparison_table(outcomes, tickers, grid)
+    return SelectionResult(
+        table=table, best=_best_table(table), elapsed_s=time.monotonic() - started
+    )
+
+
+def _comparison_table(
+    outcomes: Dict[Tuple[str, GarchSpec], dict], tickers: List[str], grid: List[GarchSpec]
+) -> pd.DataFrame:
+    rows = []
+    for ticker in tickers:
+        for spec in grid:
+            outcome = outcomes.get((ticker, spec), {"status": "pruned"})
+            parent = spec.parent()
+            rows.append(
+                {
+                    "Тикер": ticker,
+                    "Модель": spec.name,
+                    "Волатильность": spec.vol,
+                    "p": spec.p,
+                    "o": spec.o,
+                    "q": spec.q,
+                    "Распределение": spec.dist,
+                    "Параметров": len(spec.param_names),
+                    "Статус": _STATUS_TEXT[outcome["status"]],
+                    "Лог-правдоподобие": outcome.get("loglikelihood", np.nan),
+                    "AIC": outcome.get("aic", np.nan),
+                    "BIC": outcome.get("bic", np.nan),
+                    "Сошлась": outcome.get("converged", np.nan),
+                    "Итераций": outcome.get("iterations", np.nan),
+                    "Время, с": outcome.get("wall_s", np.nan),
+                    "Тёплый старт от": parent.name if parent is not None else "",
+                    "Box-Ljung p (остатки)": outcome.get("lb_pvalue", np.nan),
+                    "Box-Ljung p (квадраты остатков)": outcome.get("lb_pvalue_squared", np.nan),
+                    "Ошибка": outcome.get("message", ""),
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def _best_table(table: pd.DataFrame) -> pd.DataFrame:
+    fitted = table[table["Статус"] == _STATUS_TEXT["ok"]]
+    if fitted.empty:
+        return pd.DataFrame(columns=["Тикер", "Модель", "BIC"])
+    best = fitted.loc[fitted.groupby("Тикер", sort=False)["BIC"].idxmin()]
+    # Выигрыш по BIC относительно базовой модели запуска — GARCH(1,1) с нормальным распределением
+    base = fitted[fitted["Модель"] == GarchSpec("GARCH", 1, 0, 1, "normal").name]
+    base_bic = base.set_index("Тикер")["BIC"]
+    best = best.assign(**{"ΔBIC к GARCH(1,1)-N": best["BIC"] - best["Тикер"].map(base_bic)})
+    columns = [
+        "Тикер", "Модель", "BIC", "ΔBIC к GARCH(1,1)-N", "Лог-правдоподобие",
+        "Box-Ljung p (остатки)", "Box-Ljung p (квадраты остатков)",
+    ]
+    return best[columns].reset_index(drop=True)
+
+
+def run_garch_model_selection(
+    log_returns: pd.DataFrame,
+    run_dir: Path,
+    n_jobs: Optional[int] = 1,
+    max_order: int = 2,
+    prune_margin: float = 10.0,
+    time_budget: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    Выполняет выбор моделей, сохраняет полную таблицу сравнения и лучшие
+    модели по тикерам (CSV) в папку запуска и печатает лучшие модели.
+    """
+    result = select_garch_models(
+        log_returns,
+        grid=model_grid(max_p=max_order, max_q=max_order),
+        n_jobs=n_jobs,
+        prune_margin=prune_margin,
+        time_budget=time_budget,
+    )
+
+    table_path = run_dir / "выбор_модели_GARCH_сравнение.csv"
+    save_csv(result.table, table_path, index=False)
+    best_path = run_dir / "выбор_модели_GARCH_лучшие.csv"
+    save_csv(result.best, best_path, index=False)
+
+    counts = result.table["Статус"].value_counts()
+    print(
+        f"\nВыбор модели волатильности по BIC ({len(result.table)} кандидатов, "
+        f"оценено {counts.get(_STATUS_TEXT['ok'], 0)}, {result.elapsed_s:.1f} с):"
+    )
+    print(result.best[["Тикер", "Модель", "ΔBIC к GARCH(1,1)-N", "Box-Ljung p (остатки)"]])
+    print(f"  — сравнение моделей: {table_path.name}")
+    print(f"  — лучшие модели: {best_path.name}")
+    return result.best
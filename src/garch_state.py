@@ -0,0 +1,376 @@
+"""
+Хранимое состояние GARCH(1,1) по тикерам и инкрементальное обновление.
+
+Для каждого тикера в output/garch_state сохраняются:
+- <тикер>.json — параметры модели, последняя условная дисперсия и остаток,
+  отметка последней обработанной даты (watermark), сведения о переоценке
+  и данные, по которым оценена модель (источник, первая дата, число строк);
+- <тикер>.index.bin, <тикер>.cond_vol.f8, <тикер>.std_resid.f8 — даты,
+  условная волатильность и стандартизированные остатки в виде «сырых»
+  бинарных файлов, которые только дописываются в конец.
+
+При появлении новых дневных баров новые доходности пропускаются через
+рекурсию GARCH с сохранёнными параметрами, и ряды дописываются — это стоит
+O(число новых строк): новые строки находятся двоичным поиском watermark
+по индексу дат (он отсортирован по возрастанию); сверка данных — только
+векторный подсчёт строк до watermark. Полная переоценка (с «тёплым» стартом от прошлых
+параметров) выполняется по расписанию (каждые refit_every новых строк)
+или если новые остатки не согласуются с моделью (проверка дрейфа).
+
+Состояние общее для всех запусков (и сервиса volatility_service), поэтому
+модель дообновляется, только если данные те же: другой файл цен или
+начало периода, другая первая дата или число строк до watermark —
+полная оценка заново.
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from garch_analysis import GarchFit, GarchFitError, fit_garch_models
+from garch_batch import PARAM_NAMES
+from utils.result_dir import OUTPUT_BASE
+from utils.run_store import save_csv
+
+STATE_DIR = OUTPUT_BASE / "garch_state"
+
+# Действия по тикеру при обновлении
+ACTION_FULL_FIT = "полная оценка"
+ACTION_REFIT = "переоценка"
+ACTION_INCREMENTAL = "дообновление"
+ACTION_UNCHANGED = "без изменений"
+
+
+@dataclass
+class GarchState:
+    """
+    Сохранённое состояние модели GARCH(1,1) по одному тикеру.
+    """
+
+    ticker: str
+    params: Dict[str, float]
+    # Последние условная дисперсия и остаток (доходности в %)
+    last_sigma2: float
+    last_resid: float
+    # Последняя обработанная дата и доходность в эту дату (для сверки истории)
+    watermark: str
+    last_return: float
+    n_obs: int
+    # Данные, по которым оценена модель: источник (price_source_id) и первая дата
+    source: str
+    first_date: str
+    # Сколько строк добавлено инкрементально с последней полной оценки
+    rows_since_refit: int
+    loglikelihood: float
+    convergence_flag: int
+    index_dtype: str
+
+
+def _paths(ticker: str, state_dir: Path) -> Dict[str, Path]:
+    return {
+        "meta": state_dir / f"{ticker}.json",
+        "index": state_dir / f"{ticker}.index.bin",
+        "cond_vol": state_dir / f"{ticker}.cond_vol.f8",
+        "std_resid": state_dir / f"{ticker}.std_resid.f8",
+    }
+
+
+def _series_itemsizes(state: GarchState) -> Dict[str, int]:
+    # Размер элемента каждого бинарного файла рядов
+    return {
+        "index": np.dtype(state.index_dtype).itemsize,
+        "cond_vol": np.dtype(np.float64).itemsize,
+        "std_resid": np.dtype(np.float64).itemsize,
+    }
+
+
+def _write_meta(path: Path, state: GarchState) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(asdict(state), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_garch_state(ticker: str, state_dir: Path = STATE_DIR) -> Optional[GarchState]:
+    """
+    Загружает состояние тикера или возвращает None, если его нет
+    или файлы рядов короче, чем записано в meta (тогда нужна полная оценка).
+
+    Файлы длиннее n_obs допустимы: дозапись рядов прервалась до подмены
+    meta, лишний хвост не читается и обрезается при следующей дозаписи.
+    """
+    paths = _paths(ticker, state_dir)
+    if not all(path.exists() for path in paths.values()):
+        return None
+    try:
+        with open(paths["meta"], encoding="utf-8") as f:
+            state = GarchState(**json.load(f))
+        sizes = _series_itemsizes(state)
+        if any(paths[name].stat().st_size < state.n_obs * size for name, size in sizes.items()):
+            return None
+        return state
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def save_garch_state(
+    fit: GarchFit, log_ret: pd.Series, state_dir: Path = STATE_DIR, source: str = ""
+) -> GarchState:
+    """
+    Сохраняет состояние по результату полной оценки (файлы перезаписываются).
+    """
+    state_dir.mkdir(parents=True, exist_ok=True)
+    paths = _paths(fit.ticker, state_dir)
+    index = fit.cond_vol.index
+    cond_vol = fit.cond_vol.to_numpy(dtype=np.float64)
+    std_resid = fit.std_resid.to_numpy(dtype=np.float64)
+
+    index.to_numpy().tofile(paths["index"])
+    cond_vol.tofile(paths["cond_vol"])
+    std_resid.tofile(paths["std_resid"])
+
+    state = GarchState(
+        ticker=fit.ticker,
+        params={name: float(fit.params[name]) for name in PARAM_NAMES},
+        last_sigma2=float(cond_vol[-1] ** 2),
+        last_resid=float(std_resid[-1] * cond_vol[-1]),
+        watermark=index[-1].isoformat(),
+        last_return=float(log_ret.loc[index[-1]] * 100),
+        n_obs=len(index),
+        source=source,
+        first_date=index[0].isoformat(),
+        rows_since_refit=0,
+        loglikelihood=fit.loglikelihood,
+        convergence_flag=fit.convergence_flag,
+        index_dtype=str(index.dtype),
+    )
+    _write_meta(paths["meta"], state)
+    return state
+
+
+def filter_garch(
+    params: Dict[str, float], last_sigma2: float, last_resid: float, returns: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Пропускает новые доходности (в %) через рекурсию GARCH(1,1) с заданными
+    параметрами, продолжая её с последних дисперсии и остатка.
+
+    Возвращает условные дисперсии и остатки для новых точек.
+    """
+    mu, omega, alpha, beta = (params[name] for name in PARAM_NAMES)
+    resid = returns - mu
+    sigma2 = np.empty_like(resid)
+    prev_sigma2, prev_resid = last_sigma2, last_resid
+    for t in range(resid.shape[0]):
+        prev_sigma2 = omega + alpha * prev_resid**2 + beta * prev_sigma2
+        sigma2[t] = prev_sigma2
+        prev_resid = resid[t]
+    return sigma2, resid
+
+
+def drift_pvalue(std_resid: np.ndarray) -> float:
+    """
+    Проверка согласия новых остатков с моделью: при верной модели сумма
+    квадратов стандартизированных остатков имеет распределение хи-квадрат
+    с n степенями свободы. Возвращает двустороннее p-значение.
+    """
+    from scipy.stats import chi2
+
+    n = std_resid.shape[0]
+    stat = float(np.sum(std_resid**2))
+    return float(min(1.0, 2.0 * min(chi2.sf(stat, n), chi2.cdf(stat, n))))
+
+
+def _append_state(
+    state: GarchState,
+    new_index: pd.DatetimeIndex,
+    sigma2: np.ndarray,
+    resid: np.ndarray,
+    new_returns: np.ndarray,
+    state_dir: Path,
+) -> GarchState:
+    paths = _paths(state.ticker, state_dir)
+    cond_vol = np.sqrt(sigma2)
+    values = {
+        "index": new_index.to_numpy().astype(state.index_dtype),
+        "cond_vol": cond_vol,
+        "std_resid": resid / cond_vol,
+    }
+    for name, size in _series_itemsizes(state).items():
+        with open(paths[name], "r+b") as f:
+            # Хвост от прерванной дозаписи (meta не успела обновиться) отбрасывается
+            f.truncate(state.n_obs * size)
+            f.seek(0, os.SEEK_END)
+            values[name].tofile(f)
+
+    state.last_sigma2 = float(sigma2[-1])
+    state.last_resid = float(resid[-1])
+    state.watermark = new_index[-1].isoformat()
+    state.last_return = float(new_returns[-1])
+    state.n_obs += len(new_index)
+    state.rows_since_refit += len(new_index)
+    _write_meta(paths["meta"], state)
+    return state
+
+
+def state_to_fit(state: GarchState, state_dir: Path = STATE_DIR) -> GarchFit:
+    """
+    Собирает GarchFit из сохранённого состояния; ряды отображаются
+    в память (np.memmap) без чтения файлов целиком. Читаются ровно
+    state.n_obs элементов, поэтому недописанный хвост файлов не попадает в ряды.
+    """
+    paths = _paths(state.ticker, state_dir)
+    shape = (state.n_obs,)
+    index = pd.DatetimeIndex(
+        np.memmap(paths["index"], dtype=state.index_dtype, mode="r", shape=shape), name="time"
+    )
+    cond_vol = np.memmap(paths["cond_vol"], dtype=np.float64, mode="r", shape=shape)
+    std_resid = np.memmap(paths["std_resid"], dtype=np.float64, mode="r", shape=shape)
+    return GarchFit(
+        ticker=state.ticker,
+        params=dict(state.params),
+        cond_vol=pd.Series(cond_vol, index=index, name="cond_vol", copy=False),
+        std_resid=pd.Series(std_resid, index=index, copy=False),
+        loglikelihood=state.loglikelihood,
+        convergence_flag=state.convergence_flag,
+        iterations=0,
+        func_evals=0,
+    )
+
+
+def _same_data(state: GarchState, log_ret: pd.Series, pos: int, source: str) -> bool:
+    """
+    Проверяет, что модель оценена по тем же данным: тот же источник, та же
+    первая дата и столько же наблюдений до watermark (строки до позиции pos).
+    Иначе (другой файл цен, --start и т.п.) состояние к данным не относится.
+    """
+    first = log_ret.first_valid_index()
+    return (
+        state.source == source
+        and first is not None
+        and first == pd.Timestamp(state.first_date)
+        and int(log_ret.iloc[:pos].count()) == state.n_obs
+    )
+
+
+def _history_matches(state: GarchState, log_ret: pd.Series, pos: int) -> bool:
+    """
+    Проверяет, что история до watermark не поменялась: дата есть в данных
+    (строка pos - 1, где pos — позиция после watermark) и доходность в эту
+    дату совпадает с сохранённой.
+    """
+    if pos == 0 or log_ret.index[pos - 1] != pd.Timestamp(state.watermark):
+        return False
+    value = float(log_ret.iloc[pos - 1]) * 100  # в процентах
+    return abs(value - state.last_return) <= 1e-9 * max(1.0, abs(value))
+
+
+def update_garch_models(
+    log_returns: pd.DataFrame,
+    state_dir: Path = STATE_DIR,
+    refit_every: int = 20,
+    drift_alpha: float = 0.01,
+    n_jobs: Optional[int] = 1,
+    chunksize: Optional[int] = None,
+    backend: str = "arch",
+    source: str = "",
+) -> Tuple[Dict[str, GarchFit], Dict[str, GarchFitError], Dict[str, str]]:
+    """
+    Обновляет модели GARCH(1,1) по тикерам с учётом сохранённого состояния.
+
+    source — идентичность источника данных (data_loader.price_source_id).
+
+    - Нет состояния или оно оценено по другим данным (источник, первая дата,
+      число строк до watermark) — полная оценка с нуля.
+    - История до watermark изменилась — переоценка.
+    - Есть новые строки — они фильтруются рекурсией с прежними параметрами;
+      если с последней полной оценки набралось refit_every строк или
+      проверка дрейфа дала p-значение < drift_alpha, выполняется переоценка.
+
+    Переоценка стартует от прошлых параметров. Индекс log_returns должен
+    быть отсортирован по возрастанию: строки после watermark находятся
+    двоичным поиском, и для дообновления читаются только они.
+    Возвращает оценки, ошибки и выполненное действие по каждому тикеру
+    (в порядке столбцов log_returns).
+    """
+    fits: Dict[str, GarchFit] = {}
+    actions: Dict[str, str] = {}
+    to_fit: list[str] = []
+    warm_start: Dict[str, np.ndarray] = {}
+
+    for ticker in log_returns.columns:
+        state = load_garch_state(ticker, state_dir)
+        if state is None:
+            actions[ticker] = ACTION_FULL_FIT
+            to_fit.append(ticker)
+            continue
+
+        log_ret = log_returns[ticker]
+        pos = int(log_ret.index.searchsorted(pd.Timestamp(state.watermark), side="right"))
+        if not _same_data(state, log_ret, pos, source):
+            actions[ticker] = ACTION_FULL_FIT
+            to_fit.append(ticker)
+            continue
+        params = np.array([state.params[name] for name in PARAM_NAMES])
+        if not _history_matches(state, log_ret, pos):
+            actions[ticker] = ACTION_REFIT
+            warm_start[ticker] = params
+            to_fit.append(ticker)
+            continue
+
+        new = log_ret.iloc[pos:].dropna() * 100  # в процентах
+        if new.empty:
+            actions[ticker] = ACTION_UNCHANGED
+            fits[ticker] = state_to_fit(state, state_dir)
+            continue
+
+        new_values = new.to_numpy(dtype=np.float64)
+        sigma2, resid = filter_garch(
+            state.params, state.last_sigma2, state.last_resid, new_values
+        )
+        due = state.rows_since_refit + len(new) >= refit_every
+        drifted = drift_pvalue(resid / np.sqrt(sigma2)) < drift_alpha
+        if due or drifted:
+            actions[ticker] = ACTION_REFIT
+            warm_start[ticker] = params
+            to_fit.append(ticker)
+            continue
+
+        state = _append_state(state, new.index, sigma2, resid, new_values, state_dir)
+        actions[ticker] = ACTION_INCREMENTAL
+        fits[ticker] = state_to_fit(state, state_dir)
+
+    errors: Dict[str, GarchFitError] = {}
+    if to_fit:
+        new_fits, errors = fit_garch_models(
+            log_returns[to_fit],
+            n_jobs=n_jobs,
+            chunksize=chunksize,
+            backend=backend,
+            starting_values=warm_start,
+        )
+        for ticker, fit in new_fits.items():
+            save_garch_state(fit, log_returns[ticker].dropna(), state_dir, source=source)
+            fits[ticker] = fit
+
+    ordered = {t: fits[t] for t in log_returns.columns if t in fits}
+    return ordered, errors, actions
+
+
+def save_update_actions(actions: Dict[str, str], run_dir: Path) -> None:
+    """
+    Печатает и сохраняет в CSV, какое действие выполнено по каждому тикеру.
+    """
+    actions_df = pd.DataFrame(
+        {"Тикер": list(actions), "Действие": list(actions.values())}
+    )
+    csv_path = run_dir / "обновление_моделей_GARCH.csv"
+    save_csv(actions_df, csv_path, index=False)
+    print("\nОбновление моделей GARCH(1,1):")
+    print(actions_df)
+    print(f"  — действия: {csv_path.name}")
@@ -0,0 +1,268 @@
+"""
+Загрузка цен из CSV, Parquet и Excel для больших наборов тикеров
+и внутридневных баров.
+
+Источник читается порциями строк (CSV, Parquet), и каждая порция сразу
+сокращается до нужного: читаются только запрошенные столбцы, строки вне
+диапазона дат отбрасываются, значения приводятся к выбранному типу
+(float32 вдвое экономит память). Сокращённые порции копируются в заранее
+выделенный итоговый массив и сразу освобождаются, поэтому пик памяти —
+не больше двух объёмов результата (порции + итог) и от размера файла
+не зависит. Если порции идут не по возрастанию времени (файл не
+отсортирован), они склеиваются общим путём pd.concat с сортировкой,
+которому нужно ещё около объёма результата.
+
+Поддерживаются два вида таблиц:
+- «широкая» — столбец времени и по столбцу цен на тикер (как лист ALL);
+- «длинная» — строки (время, тикер, цена), например, минутные бары;
+  задаётся параметром ticker_column и разворачивается в широкую.
+
+resample (например, "1D") сворачивает внутридневные бары до последней
+цены в интервале — тоже по порциям.
+
+Parquet читается через pyarrow (необязательная зависимость).
+"""
+
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+SOURCE_FORMATS = ("csv", "parquet", "excel")
+
+# Число строк в порции при чтении CSV/Parquet
+CHUNK_ROWS = 500_000
+
+_SUFFIXES = {
+    ".csv": "csv",
+    ".txt": "csv",
+    ".gz": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".xlsx": "excel",
+    ".xls": "excel",
+}
+
+
+def source_format(path: Path) -> str:
+    """
+    Определяет формат источника по расширению файла.
+    """
+    fmt = _SUFFIXES.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise ValueError(
+            f"Неизвестный формат файла {Path(path).name}: ожидается CSV, Parquet или Excel"
+        )
+    return fmt
+
+
+def _header(path: Path, fmt: str, sheet_name) -> List[str]:
+    if fmt == "csv":
+        return list(pd.read_csv(path, nrows=0).columns)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_excel(path, sheet_name=sheet_name, nrows=0).columns)
+
+
+def _iter_chunks(
+    path: Path,
+    fmt: str,
+    usecols: List[str],
+    dtypes: dict,
+    chunksize: int,
+    sheet_name,
+) -> Iterator[pd.DataFrame]:
+    if fmt == "csv":
+        yield from pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize)
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError(
+                "Для чтения Parquet нужен pyarrow: pip install pyarrow"
+            ) from exc
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=usecols):
+            yield batch.to_pandas()
+    else:
+        # Excel нельзя читать порциями — читаем только нужные столбцы
+        yield pd.read_excel(path, sheet_name=sheet_name, usecols=usecols, dtype=dtypes)
+
+
+def _prepare_chunk(
+    chunk: pd.DataFrame,
+    time_column: str,
+    ticker_column: Optional[str],
+    value_column: str,
+    tickers: Optional[Sequence[str]],
+    start: Optional[pd.Timestamp],
+    end: Optional[pd.Timestamp],
+    dtype,
+    resample: Optional[str],
+) -> pd.DataFrame:
+    """
+    Сокращает порцию: фильтр по датам (и тикерам), тип значений,
+    широкая таблица с индексом времени, при необходимости — свёртка баров.
+    """
+    times = pd.to_datetime(chunk[time_column])
+    mask = np.ones(len(chunk), dtype=bool)
+    if start is not None:
+        mask &= (times >= start).to_numpy()
+    if end is not None:
+        mask &= (times <= end).to_numpy()
+    if ticker_column is not None and tickers is not None:
+        mask &= chunk[ticker_column].isin(tickers).to_numpy()
+    if not mask.all():
+        chunk, times = chunk[mask], times[mask]
+
+    if ticker_column is None:
+        wide = chunk.drop(columns=time_column).astype(dtype, copy=False)
+        wide.index = pd.DatetimeIndex(times, name="time")
+    else:
+        long = pd.DataFrame(
+            {
+                "time": times.to_numpy(),
+                "ticker": chunk[ticker_column].to_numpy(),
+                "value": chunk[value_column].to_numpy(dtype=dtype),
+            }
+        )
+        # Повтор (время, тикер) внутри порции — берём последнее значение
+        long = long.drop_duplicates(["time", "ticker"], keep="last")
+        wide = long.pivot(index="time", columns="ticker", values="value")
+        wide = wide.astype(dtype, copy=False)
+        wide.columns.name = None
+
+    if resample is not None:
+        wide = wide.resample(resample).last().dropna(how="all")
+    return wide
+
+
+def _assemble(parts: List[pd.DataFrame], dedupe: bool, dtype) -> pd.DataFrame:
+    """
+    Склеивает сокращённые порции в одну таблицу, отсортированную по времени.
+
+    Порядок и дубли проверяются по порциям: если порции идут по возрастанию
+    времени, значения копируются в заранее выделенный массив, а каждая
+    порция освобождается сразу после копирования. При dedupe первая строка
+    порции с тем же временем, что и последняя записанная (интервал на
+    границе порций), склеивается с ней: по каждому тикеру берётся последнее
+    непустое значение, как в groupby(level=0).last().
+    """
+    for i, part in enumerate(parts):
+        if dedupe and part.index.has_duplicates:
+            part = part.groupby(level=0).last()
+        if not part.index.is_monotonic_increasing:
+            part = part.sort_index()
+        parts[i] = part
+    if len(parts) == 1:
+        return parts.pop()
+
+    ordered = all(prev.index[-1] <= part.index[0] for prev, part in zip(parts, parts[1:]))
+    if not ordered:
+        # Порции перекрываются по времени — общий путь с копиями всей таблицы
+        df = pd.concat(parts)
+        if dedupe and df.index.has_duplicates:
+            df = df.groupby(level=0).last()
+        return df.sort_index()
+
+    columns = list(dict.fromkeys(col for part in parts for col in part.columns))
+    positions = {col: j for j, col in enumerate(columns)}
+    n_rows = sum(len(part) for part in parts)
+    if dedupe:
+        n_rows -= sum(prev.index[-1] == part.index[0] for prev, part in zip(parts, parts[1:]))
+    values = np.full((n_rows, len(columns)), np.nan, dtype=dtype)
+    index = np.empty(n_rows, dtype=parts[0].index.dtype)
+
+    pos = 0
+    while parts:
+        part = parts.pop(0)
+        block = part.to_numpy(dtype=dtype)
+        times = part.index.to_numpy()
+        cols = np.array([positions[col] for col in part.columns])
+        del part
+        if dedupe and pos > 0 and times[0] == index[pos - 1]:
+            seen = ~np.isnan(block[0])
+            values[pos - 1, cols[seen]] = block[0, seen]
+            block, times = block[1:], times[1:]
+        stop = pos + len(times)
+        if len(cols) == len(columns) and (cols == np.arange(len(columns))).all():
+            values[pos:stop] = block
+        else:
+            values[pos:stop, cols] = block
+        index[pos:stop] = times
+        pos = stop
+        del block
+    return pd.DataFrame(
+        values, index=pd.DatetimeIndex(index, name="time"), columns=columns, copy=False
+    )
+
+
+def read_prices(
+    path: Path,
+    tickers: Optional[Sequence[str]] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    dtype: str = "float64",
+    time_column: str = "time",
+    ticker_column: Optional[str] = None,
+    value_column: str = "close",
+    resample: Optional[str] = None,
+    chunksize: int = CHUNK_ROWS,
+    sheet_name=0,
+) -> pd.DataFrame:
+    """
+    Читает цены из CSV, Parquet или Excel в широкую таблицу: индекс — время
+    (по возрастанию), столбцы — тикеры, значения — тип dtype.
+
+    tickers — какие тикеры читать (по умолчанию все), start/end — границы
+    дат включительно. Для длинной таблицы задайте ticker_column (и, при
+    необходимости, value_column). resample — правило pandas для свёртки
+    внутридневных баров до последней цены интервала (например, "1D").
+
+    Пик памяти — около двух объёмов результата (см. описание модуля).
+    """
+    path = Path(path)
+    fmt = source_format(path)
+    start_ts = pd.Timestamp(start) if start is not None else None
+    end_ts = pd.Timestamp(end) if end is not None else None
+
+    header = _header(path, fmt, sheet_name)
+    if time_column not in header:
+        raise ValueError(f"В {path.name} нет столбца времени {time_column!r}")
+    if ticker_column is None:
+        value_cols = [col for col in header if col != time_column]
+        if tickers is not None:
+            missing = [t for t in tickers if t not in value_cols]
+            if missing:
+                raise ValueError(f"В {path.name} нет столбцов: {', '.join(missing)}")
+            value_cols = list(tickers)
+        usecols = [time_column] + value_cols
+        dtypes = {col: dtype for col in value_cols}
+    else:
+        usecols = [time_column, ticker_column, value_column]
+        dtypes = {value_column: dtype}
+
+    parts = [
+        _prepare_chunk(
+            chunk, time_column, ticker_column, value_column,
+            tickers, start_ts, end_ts, dtype, resample,
+        )
+        for chunk in _iter_chunks(path, fmt, usecols, dtypes, chunksize, sheet_name)
+    ]
+    parts = [part for part in parts if len(part)]
+    if not parts:
+        columns = value_cols if ticker_column is None else list(tickers or [])
+        return pd.DataFrame(
+            columns=columns, index=pd.DatetimeIndex([], name="time"), dtype=dtype
+        )
+
+    # Интервал или момент времени мог попасть на границу порций:
+    # для длинной таблицы и свёртки баров дубли времени склеиваются
+    df = _assemble(parts, dedupe=ticker_column is not None or resample is not None, dtype=dtype)
+    if ticker_column is not None and tickers is not None:
+        order = [t for t in tickers if t in df.columns]
+        if order != list(df.columns):
+            df = df[order]
+    return df
@@ -0,0 +1,236 @@
+"""
+Конвейер анализа как граф этапов (DAG) и планировщик, выполняющий
+независимые этапы параллельно.
+
+Этап объявляет имена входов и выходов; входы — выходы других этапов
+(или начальные значения). Этап запускается, как только готовы все его
+входы, поэтому, например, ADF-тест цен идёт одновременно с оценкой GARCH,
+а общее время ограничено самым длинным путём по графу, а не суммой этапов.
+
+Этапы выполняются в пуле потоков: тяжёлые расчёты (NumPy, SciPy, пулы
+процессов внутри этапов) при этом идут параллельно. Консольный вывод
+каждого этапа собирается отдельно и печатается целиком в порядке
+объявления этапов — так же, как при последовательном запуске.
+
+Этап, который запускает процессы (пул --jobs), объявляется exclusive
+и выполняется один, когда другие этапы не идут. Процесс, порождённый
+fork из многопоточного процесса, наследует блокировки, удерживаемые
+другими потоками в момент fork (например, блокировку импорта, пока
+соседний этап лениво импортирует SciPy), и зависает навсегда. К тому же
+такой этап и так занимает все выделенные ему ядра.
+
+Можно выполнить только часть конвейера: select(цели) оставляет цели
+и этапы, от которых они зависят.
+"""
+
+import contextlib
+import io
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, ContextManager, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.console import redirect_stdout, thread_local_stdout
+
+# Обёртка вокруг выполнения этапа (например, StageProfiler.stage): имя -> контекст
+StageWrapper = Callable[[str], ContextManager]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    Этап конвейера.
+
+    func вызывается с входами как именованными аргументами и возвращает
+    значение выхода (один выход), кортеж значений (несколько) или ничего.
+    exclusive=True — этап запускает процессы и при параллельном выполнении
+    идёт без других этапов (см. описание модуля).
+    """
+
+    name: str
+    func: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    exclusive: bool = False
+
+
+def _store_outputs(stage: Stage, result: Any, artifacts: Dict[str, Any]) -> None:
+    if len(stage.outputs) == 1:
+        artifacts[stage.outputs[0]] = result
+    elif stage.outputs:
+        if not isinstance(result, tuple) or len(result) != len(stage.outputs):
+            raise ValueError(
+                f"Этап {stage.name} должен вернуть {len(stage.outputs)} значений"
+            )
+        artifacts.update(zip(stage.outputs, result))
+
+
+class Pipeline:
+    """
+    Граф этапов: проверяет, что у каждого входа один источник и нет циклов.
+
+    initial — имена значений, которые передаются в run() готовыми.
+    """
+
+    def __init__(self, stages: Sequence[Stage], initial: Iterable[str] = ()):
+        self.stages: List[Stage] = list(stages)
+        self._by_name: Dict[str, Stage] = {}
+        self._producer: Dict[str, str] = {}
+        initial = set(initial)
+        for stage in self.stages:
+            if stage.name in self._by_name:
+                raise ValueError(f"Этап {stage.name} объявлен дважды")
+            self._by_name[stage.name] = stage
+            for output in stage.outputs:
+                if output in self._producer or output in initial:
+                    raise ValueError(f"У значения {output} несколько источников")
+                self._producer[output] = stage.name
+        for stage in self.stages:
+            for name in stage.inputs:
+                if name not in self._producer and name not in initial:
+                    raise ValueError(f"Вход {name} этапа {stage.name} ничем не создаётся")
+        self._check_acyclic()
+
+    @property
+    def names(self) -> List[str]:
+        return [stage.name for stage in self.stages]
+
+    def dependencies(self, name: str) -> List[str]:
+        """
+        Этапы, выходы которых нужны этапу name (непосредственные зависимости).
+        """
+        stage = self._by_name[name]
+        return sorted(
+            {self._producer[i] for i in stage.inputs if i in self._producer},
+            key=self.names.index,
+        )
+
+    def _check_acyclic(self) -> None:
+        state: Dict[str, int] = {}  # 1 — в обходе, 2 — проверен
+
+        def visit(name: str, path: List[str]) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Цикл в графе этапов: {' -> '.join(path + [name])}")
+            state[name] = 1
+            for dep in self.dependencies(name):
+                visit(dep, path + [name])
+            state[name] = 2
+
+        for name in self.names:
+            visit(name, [])
+
+    def select(self, targets: Optional[Iterable[str]] = None) -> List[Stage]:
+        """
+        Этапы targets и все их зависимости в порядке объявления
+        (targets=None — все этапы).
+        """
+        if targets is None:
+            return list(self.stages)
+        needed: set = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self._by_name:
+                raise ValueError(
+                    f"Неизвестный этап {name!r}; доступны: {', '.join(self.names)}"
+                )
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.dependencies(name))
+        return [stage for stage in self.stages if stage.name in needed]
+
+    def run(
+        self,
+        targets: Optional[Iterable[str]] = None,
+        max_workers: int = 1,
+        initial: Optional[Dict[str, Any]] = None,
+        wrap: Optional[StageWrapper] = None,
+    ) -> Dict[str, Any]:
+        """
+        Выполняет выбранные этапы и возвращает словарь всех значений.
+
+        max_workers — сколько этапов может идти одновременно (1 — по очереди
+        в текущем потоке); этапы с exclusive=True всегда идут по одному.
+        wrap(имя) — контекст вокруг каждого этапа.
+        При ошибке этапа новые этапы не запускаются, уже запущенные
+        дорабатывают, после чего исключение пробрасывается.
+        """
+        selected = self.select(targets)
+        artifacts: Dict[str, Any] = dict(initial or {})
+        wrap = wrap or (lambda name: contextlib.nullcontext())
+
+        if max_workers <= 1:
+            for stage in selected:
+                with wrap(stage.name):
+                    result = stage.func(**{name: artifacts[name] for name in stage.inputs})
+                _store_outputs(stage, result, artifacts)
+            return artifacts
+
+        with thread_local_stdout() as stdout:
+            self._run_concurrent(selected, artifacts, max_workers, wrap, stdout.default)
+        return artifacts
+
+    def _run_concurrent(
+        self,
+        selected: List[Stage],
+        artifacts: Dict[str, Any],
+        max_workers: int,
+        wrap: StageWrapper,
+        console,
+    ) -> None:
+        def run_stage(stage: Stage, inputs: Dict[str, Any]):
+            buffer = io.StringIO()
+            try:
+                with redirect_stdout(buffer), wrap(stage.name):
+                    result = stage.func(**inputs)
+            except BaseException as exc:  # noqa: BLE001 — пробрасывается в основном потоке
+                return buffer.getvalue(), None, exc
+            return buffer.getvalue(), result, None
+
+        order = [stage.name for stage in selected]
+        texts: Dict[str, str] = {}
+        printed = 0
+        pending = list(selected)
+        running: Dict[Any, Stage] = {}
+        error: Optional[BaseException] = None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                if error is None:
+                    for stage in [s for s in pending if all(i in artifacts for i in s.inputs)]:
+                        # Этап с процессами — только в одиночку (fork при живых этапах-потоках)
+                        if any(other.exclusive for other in running.values()):
+                            break
+                        if stage.exclusive and running:
+                            break
+                        pending.remove(stage)
+                        inputs = {name: artifacts[name] for name in stage.inputs}
+                        running[executor.submit(run_stage, stage, inputs)] = stage
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    text, result, exc = future.result()
+                    texts[stage.name] = text
+                    if exc is not None:
+                        error = error or exc
+                        continue
+                    try:
+                        _store_outputs(stage, result, artifacts)
+                    except ValueError as store_exc:
+                        error = error or store_exc
+
+                # Вывод печатается в порядке объявления этапов
+                while printed < len(order) and order[printed] in texts:
+                    console.write(texts.pop(order[printed]))
+                    printed += 1
+
+        # После ошибки часть этапов не запускалась — печатаем то, что успело выполниться
+        for name in order[printed:]:
+            if name in texts:
+                console.write(texts[name])
+        console.flush()
+        if error is not None:
+            raise error
@@ -0,0 +1,314 @@
+"""
+Бутстрэп устойчивости ранжировки по волатильности.
+
+build_volatility_ranking раскладывает тикеры по категориям по точечным
+оценкам средней условной волатильности. Здесь по оценённым моделям
+GARCH(1,1) симулируются тысячи траекторий доходностей сразу для всех
+тикеров и по каждой траектории заново считается средняя волатильность,
+а из неё — ранги и категории (по тому же правилу квантилей 0.33 / 0.66).
+Итог — вероятности рангов (тикер × ранг), вероятности категорий
+и 95%-интервалы средней волатильности и ранга.
+
+Инновации траекторий:
+- fhs (filtered historical simulation) — стандартизированные остатки
+  модели, выбранные с возвращением целыми строками (даты), поэтому
+  сохраняется корреляция между тикерами;
+- parametric — нормальные инновации с корреляцией остатков. При
+  тяжёлых хвостах остатков средняя волатильность таких траекторий
+  систематически выше наблюдаемой, поэтому по умолчанию используется fhs.
+
+Режимы пересчёта:
+- refit — параметры GARCH оцениваются по каждой траектории заново пакетным
+  движком (garch_batch.optimize_garch, все траектории порции — столбцы
+  одной матрицы T×(S·N), старт от исходных оценок); учитывает
+  неопределённость оценок параметров;
+- filter — средняя берётся по симулированной волатильности при исходных
+  параметрах (быстро, без переоценки).
+
+Траектории обрабатываются порциями: число траекторий в порции выбирается
+так, чтобы массивы порции (S×T×N) укладывались в chunk_mb; порции
+считаются в пуле процессов. Генератор случайных чисел свой у каждой
+траектории (SeedSequence(seed).spawn), поэтому результат не зависит ни
+от размера порций, ни от числа процессов.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from garch_batch import PARAM_NAMES, garch_backcast, garch_recursion, optimize_garch
+from utils.processes import process_context
+from utils.run_store import save_csv
+from vol_store import VolatilityStore
+from volatility_report import build_volatility_ranking
+
+BOOTSTRAP_METHODS = ("fhs", "parametric")
+BOOTSTRAP_MODES = ("refit", "filter")
+CATEGORY_LABELS = ("Низкая", "Средняя", "Высокая")
+
+# Сколько массивов размера T×N×8 байт приходится на одну траекторию порции
+# (симуляция, маска, рекурсия и копии внутри оптимизатора)
+_ARRAYS_PER_SIM = {"refit": 12, "filter": 4}
+# Меньше общих дат — инновации тикеров выбираются независимо
+_MIN_JOINT_ROWS = 30
+
+# Данные моделей в процессе-исполнителе (см. _init_worker)
+_MODEL: Dict[str, np.ndarray] = {}
+
+
+@dataclass
+class BootstrapResult:
+    """
+    Результат бутстрэпа ранжировки.
+
+    summary — по тикеру (в порядке ранжировки): точечные оценки,
+    интервалы и вероятности категорий; rank_probs — вероятности рангов
+    (тикер × ранг); stats — средние волатильности траекторий (S×N).
+    """
+
+    summary: pd.DataFrame
+    rank_probs: pd.DataFrame
+    stats: np.ndarray
+    elapsed_s: float
+
+
+def _model_arrays(store: VolatilityStore, method: str) -> Dict[str, np.ndarray]:
+    """
+    Всё, что нужно для симуляции: параметры (N×4), маска наблюдений,
+    стартовая дисперсия и источник инноваций.
+    """
+    theta = np.column_stack([store.params[name] for name in PARAM_NAMES])
+    valid = np.ascontiguousarray(store.valid)
+    first = store.cond_vol[store.starts, np.arange(len(store))]
+    model = {"theta": theta, "valid": valid, "sigma2_0": np.asarray(first) ** 2}
+
+    std_resid = np.asarray(store.std_resid)
+    joint = np.flatnonzero(valid.all(axis=1))
+    if method == "fhs":
+        model["joint_rows"] = joint
+        model["std_resid"] = np.ascontiguousarray(std_resid)
+    elif method == "parametric":
+        corr = np.eye(len(store))
+        if joint.size >= _MIN_JOINT_ROWS and len(store) > 1:
+            corr = np.corrcoef(std_resid[joint], rowvar=False)
+        model["chol"] = np.linalg.cholesky(corr + 1e-12 * np.eye(len(store)))
+    else:
+        raise ValueError(f"Неизвестный способ бутстрэпа: {method!r}")
+    return model
+
+
+def _innovations(rng: np.random.Generator, model: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Инновации одной траектории (T×N).
+    """
+    valid = model["valid"]
+    n_obs, n_series = valid.shape
+    if "chol" in model:
+        return rng.standard_normal((n_obs, n_series)) @ model["chol"].T
+
+    std_resid, joint = model["std_resid"], model["joint_rows"]
+    if joint.size >= _MIN_JOINT_ROWS:
+        return std_resid[rng.choice(joint, size=n_obs)]
+    z = np.empty((n_obs, n_series))
+    for j in range(n_series):
+        rows = np.flatnonzero(valid[:, j])
+        z[:, j] = std_resid[rng.choice(rows, size=n_obs), j]
+    return z
+
+
+def _init_worker(model: Dict[str, np.ndarray]) -> None:
+    global _MODEL
+    _MODEL = model
+
+
+def _simulate_chunk(task: tuple) -> np.ndarray:
+    """
+    Симулирует порцию траекторий и возвращает их средние волатильности (S×N).
+    """
+    seeds, mode = task
+    theta, valid = _MODEL["theta"], _MODEL["valid"]
+    n_obs, n_series = valid.shape
+    n_sims = len(seeds)
+
+    # Инновации порции: T × S × N, столбец s·N + j — тикер j траектории s
+    z = np.empty((n_obs, n_sims, n_series))
+    for s, seed in enumerate(seeds):
+        z[:, s] = _innovations(np.random.default_rng(seed), _MODEL)
+    z = z.reshape(n_obs, n_sims * n_series)
+
+    mu, omega, alpha, beta = (np.tile(theta[:, k], n_sims) for k in range(4))
+    sigma2 = np.empty_like(z)
+    prev_sigma2 = np.tile(_MODEL["sigma2_0"], n_sims)
+    prev_e2 = np.zeros_like(prev_sigma2)
+    # Рекурсия нелинейна по z (остаток зависит от дисперсии) — цикл по времени
+    # над всеми траекториями и тикерами сразу
+    for t in range(n_obs):
+        prev_sigma2 = omega + alpha * prev_e2 + beta * prev_sigma2
+        sigma2[t] = prev_sigma2
+        prev_e2 = prev_sigma2 * z[t] ** 2
+
+    mask = np.tile(valid, (1, n_sims))
+    if mode == "refit":
+        y = np.where(mask, mu + np.sqrt(sigma2) * z, 0.0)
+        del z
+        backcast = garch_backcast(y, mask)
+        theta_sim, *_ = optimize_garch(
+            y, mask, backcast, theta0=np.tile(theta, (n_sims, 1))
+        )
+        _, _, sigma2 = garch_recursion(y, mask, theta_sim, backcast, store=True)
+
+    vol = np.where(mask, np.sqrt(sigma2), 0.0)
+    means = vol.sum(axis=0) / np.maximum(mask.sum(axis=0), 1)
+    return means.reshape(n_sims, n_series)
+
+
+def sims_per_chunk(n_obs: int, n_series: int, mode: str, chunk_mb: float) -> int:
+    """
+    Сколько траекторий помещается в порцию объёмом chunk_mb.
+    """
+    per_sim = n_obs * n_series * 8 * _ARRAYS_PER_SIM[mode]
+    return max(1, int(chunk_mb * 1024**2 // max(per_sim, 1)))
+
+
+def _ranks(stats: np.ndarray) -> np.ndarray:
+    """
+    Ранги тикеров в каждой траектории (1 — самая высокая волатильность).
+    """
+    return np.argsort(np.argsort(-stats, axis=1), axis=1) + 1
+
+
+def _categories(stats: np.ndarray) -> np.ndarray:
+    """
+    Категории 0/1/2 (низкая/средняя/высокая) по квантилям 0.33 и 0.66
+    каждой траектории — как pd.cut в build_volatility_ranking.
+    """
+    q33, q66 = np.quantile(stats, [0.33, 0.66], axis=1)
+    return (stats > q33[:, None]).astype(np.int8) + (stats > q66[:, None])
+
+
+def bootstrap_ranking(
+    store: VolatilityStore,
+    n_sims: int = 1000,
+    method: str = "fhs",
+    mode: str = "refit",
+    seed: int = 0,
+    n_jobs: Optional[int] = 1,
+    chunk_mb: float = 256.0,
+    level: float = 0.95,
+) -> BootstrapResult:
+    """
+    Бутстрэп ранжировки по моделям из store: n_sims траекторий способом
+    method ("fhs" или "parametric"), пересчёт mode ("refit" или "filter").
+
+    n_jobs — процессы для порций (None — по числу ядер), chunk_mb —
+    предельный объём массивов одной порции, level — уровень интервалов.
+    """
+    if mode not in BOOTSTRAP_MODES:
+        raise ValueError(f"Неизвестный режим бутстрэпа: {mode!r}")
+    if len(store) < 2 or n_sims < 1:
+        raise ValueError("Для бутстрэпа ранжировки нужны хотя бы два тикера и одна траектория")
+
+    started = time.perf_counter()
+    model = _model_arrays(store, method)
+    n_obs, n_series = store.valid.shape
+    per_chunk = sims_per_chunk(n_obs, n_series, mode, chunk_mb)
+    seeds = np.random.SeedSequence(seed).spawn(n_sims)
+    tasks = [(seeds[i : i + per_chunk], mode) for i in range(0, n_sims, per_chunk)]
+
+    workers = (os.cpu_count() or 1) if n_jobs is None else max(1, n_jobs)
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        _init_worker(model)
+        chunks: List[np.ndarray] = [_simulate_chunk(task) for task in tasks]
+    else:
+        # executor.map сохраняет порядок порций — результат детерминирован
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=process_context(),
+            initializer=_init_worker,
+            initargs=(model,),
+        ) as executor:
+            chunks = list(executor.map(_simulate_chunk, tasks))
+    stats = np.concatenate(chunks)
+
+    tickers = list(store.tickers)
+    ranks = _ranks(stats)
+    categories = _categories(stats)
+    rank_probs = pd.DataFrame(
+        np.stack([(ranks == k).mean(axis=0) for k in range(1, n_series + 1)], axis=1),
+        index=pd.Index(tickers, name="Тикер"),
+        columns=[f"Ранг {k}" for k in range(1, n_series + 1)],
+    )
+
+    tail = (1.0 - level) / 2.0
+    vol_low, vol_high = np.quantile(stats, [tail, 1.0 - tail], axis=0)
+    rank_low, rank_high = np.quantile(ranks, [tail, 1.0 - tail], axis=0, method="nearest")
+    point = build_volatility_ranking(store.mean_volatility())
+    category_probs = np.stack([(categories == c).mean(axis=0) for c in range(3)], axis=1)
+    percent = f"{level:.0%}"
+    summary = pd.DataFrame(
+        {
+            "Средняя волатильность (%)": point["Средняя волатильность (%)"],
+            "Категория": point["Категория"],
+            f"ДИ {percent}: нижняя": pd.Series(vol_low, index=tickers),
+            f"ДИ {percent}: верхняя": pd.Series(vol_high, index=tickers),
+            "Ранг": pd.Series(np.arange(1, n_series + 1), index=point.index),
+            f"Ранг: ДИ {percent}": pd.Series(
+                [f"{lo}–{hi}" for lo, hi in zip(rank_low, rank_high)], index=tickers
+            ),
+        },
+        index=point.index,
+    )
+    for c, label in enumerate(CATEGORY_LABELS):
+        summary[f"P({label})"] = pd.Series(category_probs[:, c], index=tickers)
+    # Вероятность, что тикер попадает в ту же категорию, что и по точечной оценке
+    summary["P(та же категория)"] = [
+        summary.at[ticker, f"P({summary.at[ticker, 'Категория']})"] for ticker in summary.index
+    ]
+    summary.index.name = "Тикер"
+
+    return BootstrapResult(
+        summary=summary,
+        rank_probs=rank_probs.loc[point.index],
+        stats=stats,
+        elapsed_s=time.perf_counter() - started,
+    )
+
+
+def run_ranking_bootstrap(
+    store: VolatilityStore,
+    run_dir: Path,
+    n_sims: int = 1000,
+    method: str = "fhs",
+    mode: str = "refit",
+    seed: int = 0,
+    n_jobs: Optional[int] = 1,
+    chunk_mb: float = 256.0,
+) -> pd.DataFrame:
+    """
+    Выполняет бутстрэп, сохраняет сводку и вероятности рангов (CSV)
+    в папку запуска и печатает сводку.
+    """
+    result = bootstrap_ranking(
+        store, n_sims=n_sims, method=method, mode=mode, seed=seed, n_jobs=n_jobs, chunk_mb=chunk_mb
+    )
+
+    summary_path = run_dir / "ранжирование_бутстрэп_GARCH.csv"
+    save_csv(result.summary, summary_path)
+    probs_path = run_dir / "вероятности_рангов_GARCH.csv"
+    save_csv(result.rank_probs, probs_path)
+
+    print(
+        f"\nУстойчивость ранжировки: бутстрэп {method}, {mode}, "
+        f"{n_sims} траекторий ({result.elapsed_s:.1f} с):"
+    )
+    print(result.summary[["Категория", "Ранг: ДИ 95%", "P(та же категория)"]])
+    print(f"  — сводка бутстрэпа: {summary_path.name}")
+    print(f"  — вероятности рангов: {probs_path.name}")
+    return result.summary
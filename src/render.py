@@ -0,0 +1,207 @@
+"""
+Отдельный этап отрисовки графиков.
+
+Расчётные модули не рисуют сами, а описывают графики заданиями PlotJob
+(готовые массивы дат и значений, подписи, размер фигуры). Этот модуль
+рендерит задания в PNG: matplotlib импортируется только здесь и только
+при отрисовке, бэкенд принудительно Agg (без pyplot и окон), а фигуры и оси
+одного размера переиспользуются между графиками вместо создания заново.
+При n_jobs > 1 задания распределяются по пулу процессов.
+"""
+
+import contextlib
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utils.processes import process_context
+
+# Виды графиков: line — одна или несколько линий по датам,
+# acf — готовая автокорреляционная функция с доверительной полосой
+PLOT_KINDS = ("line", "acf")
+
+
+@dataclass
+class PlotLine:
+    """
+    Одна линия графика: даты, значения и оформление.
+    """
+
+    x: np.ndarray
+    y: np.ndarray
+    label: Optional[str] = None
+    linewidth: Optional[float] = None
+    alpha: Optional[float] = None
+
+
+@dataclass
+class PlotJob:
+    """
+    Описание одного графика, которое можно передать в другой процесс.
+    """
+
+    filename: str
+    title: str
+    figsize: Tuple[float, float]
+    lines: List[PlotLine]
+    kind: str = "line"
+    xlabel: Optional[str] = None
+    ylabel: Optional[str] = None
+    # Сетка и её прозрачность (None — сетка по умолчанию matplotlib)
+    grid: bool = True
+    grid_alpha: Optional[float] = 0.3
+    # Горизонтальная линия (например, нулевой уровень)
+    hline: Optional[float] = None
+    legend: bool = False
+    # Для kind="acf": полуширина доверительной полосы по лагам
+    # (лаги и значения ACF — в lines[0])
+    acf_band: Optional[np.ndarray] = None
+
+
+def series_line(series, **kwargs) -> PlotLine:
+    """
+    Готовит линию графика из pd.Series: индекс дат и значения как массивы NumPy.
+    """
+    return PlotLine(
+        x=np.asarray(series.index.to_numpy()),
+        y=np.asarray(series.to_numpy(dtype=np.float64)),
+        **kwargs,
+    )
+
+
+@contextlib.contextmanager
+def plotting_disabled() -> Iterator[None]:
+    """
+    На время блока запрещает импорт matplotlib (запуск без графиков).
+
+    Библиотеки, импортирующие matplotlib необязательно (например, arch),
+    получают ImportError и работают без него. После блока matplotlib снова
+    импортируется как обычно; если он уже загружен, блок ничего не меняет.
+    """
+    if "matplotlib" in sys.modules:
+        yield
+        return
+    sys.modules["matplotlib"] = None
+    try:
+        yield
+    finally:
+        if "matplotlib" in sys.modules and sys.modules["matplotlib"] is None:
+            del sys.modules["matplotlib"]
+
+
+# Кэш фигур в процессе: размер фигуры -> (фигура, оси)
+_FIGURES: Dict[Tuple[float, float], tuple] = {}
+
+
+def _get_axes(figsize: Tuple[float, float]):
+    """
+    Возвращает переиспользуемые фигуру и оси нужного размера (очищенные).
+    """
+    cached = _FIGURES.get(figsize)
+    if cached is None:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        cached = _FIGURES[figsize] = (fig, ax)
+    fig, ax = cached
+    ax.clear()
+    return fig, ax
+
+
+def _draw_acf(ax, job: PlotJob) -> None:
+    """
+    Рисует ACF в оформлении plot_acf из statsmodels: столбики со значениями,
+    нулевая линия и закрашенная полоса (без лага 0).
+    """
+    lags = np.asarray(job.lines[0].x)
+    acf = np.asarray(job.lines[0].y)
+    ax.vlines(lags, [0], acf)
+    ax.axhline()
+    ax.margins(0.05)
+    ax.plot(lags, acf, marker="o", markersize=5, linestyle="None")
+    ax.set_ylim(-1, 1)
+    if job.acf_band is not None:
+        band_lags = lags[1:].astype(float)
+        band_lags[0] -= 0.5
+        band_lags[-1] += 0.5
+        band = np.asarray(job.acf_band)[1:]
+        ax.fill_between(band_lags, -band, band, alpha=0.25)
+
+
+def render_job(job: PlotJob, run_dir: Path) -> Path:
+    """
+    Рисует один график и сохраняет его в PNG в папку run_dir.
+    """
+    if job.kind not in PLOT_KINDS:
+        raise ValueError(f"Неизвестный вид графика: {job.kind}")
+    fig, ax = _get_axes(tuple(job.figsize))
+
+    if job.kind == "acf":
+        _draw_acf(ax, job)
+    else:
+        for line in job.lines:
+            ax.plot(
+                line.x,
+                line.y,
+                label=line.label,
+                linewidth=line.linewidth,
+                alpha=line.alpha,
+            )
+    if job.hline is not None:
+        ax.axhline(job.hline, color="black", linewidth=1)
+
+    ax.set_title(job.title)
+    if job.xlabel:
+        ax.set_xlabel(job.xlabel)
+    if job.ylabel:
+        ax.set_ylabel(job.ylabel)
+    if job.legend:
+        ax.legend(loc="best", fontsize=9)
+    if job.grid:
+        ax.grid(True, alpha=job.grid_alpha)
+    fig.tight_layout()
+
+    out_path = run_dir / job.filename
+    fig.savefig(out_path)
+    return out_path
+
+
+def _render_job(item: tuple) -> Path:
+    # Обёртка для пула процессов (распаковка кортежа аргументов)
+    return render_job(*item)
+
+
+def render_plots(
+    jobs: List[PlotJob], run_dir: Path, n_jobs: Optional[int] = 1
+) -> List[Path]:
+    """
+    Рендерит все задания в PNG в папку run_dir и возвращает пути к файлам.
+
+    При n_jobs > 1 (None — по числу ядер) задания раздаются пулу процессов
+    пачками; каждый процесс переиспользует свои фигуры между заданиями.
+    Порядок файлов совпадает с порядком заданий.
+    """
+    if not jobs:
+        return []
+    workers = (os.cpu_count() or 1) if n_jobs is None else n_jobs
+    workers = max(1, min(workers, len(jobs)))
+    items = [(job, run_dir) for job in jobs]
+
+    if workers == 1:
+        return [_render_job(item) for item in items]
+
+    chunksize = max(1, math.ceil(len(items) / (workers * 2)))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=process_context()) as executor:
+        return list(executor.map(_render_job, items, chunksize=chunksize))
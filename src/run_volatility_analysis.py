@@ -4,52 +4,582 @@
 (наиболее / средне / наименее волатильные) и комментарий с точки зрения
 предметной области.
 Период: с 01.09.2014 по текущую дату (по заданию).
-Данные: data/All shares Ekonometrika.xlsx, лист "ALL".
-Результаты: при каждом запуске создаётся output/result_N (графики, CSV, отчёт).
+Данные: data/All shares Ekonometrika.xlsx, лист "ALL" (или файл --prices).
+Результаты: при каждом запуске создаётся output/result_N (графики, CSV, отчёт),
+а с --run-store — один архив output/result_N.zip (utils/run_store.py).
+Отдельные этапы удобнее запускать подкомандами cli.py (adf, garch, rank, ...).
 """
+import argparse
+import contextlib
+import shutil
 import warnings
+from importlib.metadata import version
+from pathlib import Path
 
-from adf_analysis import run_adf_for_price_series
-from data_loader import load_prices
-from garch_analysis import compute_log_returns, fit_garch_and_collect_stats, plot_volatility_comparison
-from utils.result_dir import get_next_result_dir
+from adf_analysis import ADF_BACKENDS, adf_plot_jobs, run_adf_for_price_series
+from data_loader import START_DATE, load_price_source, price_source_id
+from dcc_garch import run_dcc_garch
+from garch_analysis import (
+    GARCH_BACKENDS,
+    collect_garch_stats,
+    compute_log_returns,
+    fit_garch_models,
+    garch_fit_diagnostics,
+    garch_plot_jobs,
+    volatility_comparison_plot_job,
+)
+from garch_backtest import BACKTEST_SCHEMES, run_garch_backtest
+from garch_selection import run_garch_model_selection
+from garch_state import save_update_actions, update_garch_models
+from pipeline import Pipeline, Stage
+from ranking_bootstrap import BOOTSTRAP_METHODS, BOOTSTRAP_MODES, run_ranking_bootstrap
+from render import plotting_disabled, render_plots
+from utils.profiling import StageProfiler, load_hook
+from utils.result_dir import get_next_result_dir, run_store_path
+from utils.run_store import pack_run_dir
+from utils.stage_cache import DEFAULT_MAX_MB, StageCache
 from volatility_report import build_volatility_ranking, save_and_print_ranking, write_domain_report
-from white_noise_analysis import plot_white_noise_diagnostics, run_white_noise_tests_for_garch_residuals
+from white_noise_analysis import run_white_noise_tests_for_garch_residuals, white_noise_plot_jobs
 
 warnings.filterwarnings("ignore")
 
+# Этапы запуска (имена для --stages, --profile-stage и в profile.json)
+PIPELINE_STAGES = (
+    "load",
+    "adf",
+    "log_returns",
+    "garch",
+    "white_noise",
+    "dcc",
+    "backtest",
+    "model_selection",
+    "ranking",
+    "ranking_bootstrap",
+    "report",
+    "plots",
+)
 
 
+def add_run_arguments(parser: argparse.ArgumentParser, stages: bool = True) -> None:
+    """
+    Параметры запуска анализа (общие для этого скрипта и подкоманд cli.py).
+    stages=False — без --stages (подкоманда сама задаёт этапы).
+    """
+    parser.add_argument(
+        "--prices",
+        type=Path,
+        default=None,
+        help="файл цен CSV, Parquet или Excel (по умолчанию — лист ALL из data/)",
+    )
+    parser.add_argument(
+        "--tickers",
+        default=None,
+        help="тикеры через запятую (по умолчанию — все столбцы источника)",
+    )
+    parser.add_argument(
+        "--start",
+        default=START_DATE,
+        help=f"начальная дата периода (по умолчанию {START_DATE})",
+    )
+    parser.add_argument(
+        "--end",
+        default=None,
+        help="конечная дата периода включительно (по умолчанию — до конца данных)",
+    )
+    parser.add_argument(
+        "--float32",
+        action="store_true",
+        help="хранить цены и доходности в float32 (вдвое меньше памяти)",
+    )
+    parser.add_argument(
+        "--ticker-column",
+        default=None,
+        help="для «длинной» таблицы (время, тикер, цена): имя столбца тикера",
+    )
+    parser.add_argument(
+        "--value-column",
+        default="close",
+        help="для «длинной» таблицы: имя столбца цены (по умолчанию close)",
+    )
+    parser.add_argument(
+        "--resample",
+        default=None,
+        help="свернуть внутридневные бары до последней цены интервала, например 1D",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="число процессов для оценки GARCH и отрисовки графиков (0 — по числу ядер, по умолчанию 1)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="сколько тикеров отдавать процессу за раз (по умолчанию — автоматически)",
+    )
+    parser.add_argument(
+        "--garch-backend",
+        choices=GARCH_BACKENDS,
+        default="arch",
+        help="способ оценки GARCH: arch (по тикеру) или batch (пакетный NumPy-движок)",
+    )
+    parser.add_argument(
+        "--adf-backend",
+        choices=ADF_BACKENDS,
+        default="batch",
+        help="способ расчёта ADF-теста: batch (все ряды сразу) или statsmodels (по ряду)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="дообновлять сохранённые модели GARCH новыми строками вместо полной оценки",
+    )
+    parser.add_argument(
+        "--refit-every",
+        type=int,
+        default=20,
+        help="в режиме --incremental: полная переоценка каждые N новых строк (по умолчанию 20)",
+    )
+    parser.add_argument(
+        "--drift-alpha",
+        type=float,
+        default=0.01,
+        help="в режиме --incremental: уровень проверки дрейфа для переоценки (по умолчанию 0.01)",
+    )
+    parser.add_argument(
+        "--dcc",
+        action="store_true",
+        help="оценить DCC-GARCH(1,1) и динамические корреляции между тикерами",
+    )
+    parser.add_argument(
+        "--backtest",
+        choices=BACKTEST_SCHEMES,
+        default=None,
+        help="бэктест GARCH с прогнозом на 1 день: rolling (скользящее окно) или expanding (расширяющееся)",
+    )
+    parser.add_argument(
+        "--backtest-window",
+        type=int,
+        default=500,
+        help="в режиме --backtest: длина (начального) окна оценки в днях (по умолчанию 500)",
+    )
+    parser.add_argument(
+        "--backtest-step",
+        type=int,
+        default=5,
+        help="в режиме --backtest: переоценка модели каждые N дней (по умолчанию 5)",
+    )
+    parser.add_argument(
+        "--select-models",
+        action="store_true",
+        help="выбрать модель по BIC для каждого тикера: GARCH, GJR-GARCH, EGARCH; распределения N, t, skew-t",
+    )
+    parser.add_argument(
+        "--select-max-order",
+        type=int,
+        default=2,
+        help="в режиме --select-models: наибольший порядок p и q (по умолчанию 2)",
+    )
+    parser.add_argument(
+        "--select-prune-margin",
+        type=float,
+        default=10.0,
+        help="в режиме --select-models: допуск по BIC при отсечении кандидатов (inf — полный перебор, по умолчанию 10)",
+    )
+    parser.add_argument(
+        "--select-time-budget",
+        type=float,
+        default=None,
+        help="в режиме --select-models: предел времени перебора в секундах (по умолчанию без предела)",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=0,
+        help="оценить устойчивость ранжировки бутстрэпом из N траекторий GARCH (по умолчанию выключено)",
+    )
+    parser.add_argument(
+        "--bootstrap-method",
+        choices=BOOTSTRAP_METHODS,
+        default="fhs",
+        help="в режиме --bootstrap: инновации — остатки модели (fhs) или нормальные (parametric)",
+    )
+    parser.add_argument(
+        "--bootstrap-mode",
+        choices=BOOTSTRAP_MODES,
+        default="refit",
+        help="в режиме --bootstrap: переоценивать GARCH по траекториям (refit) или нет (filter)",
+    )
+    parser.add_argument(
+        "--bootstrap-seed",
+        type=int,
+        default=0,
+        help="в режиме --bootstrap: seed генератора (по умолчанию 0)",
+    )
+    parser.add_argument(
+        "--bootstrap-chunk-mb",
+        type=float,
+        default=256.0,
+        help="в режиме --bootstrap: предельный объём массивов одной порции траекторий в МБ (по умолчанию 256)",
+    )
+    parser.add_argument(
+        "--squared-resid-tests",
+        action="store_true",
+        help="дополнительно проверить квадраты остатков GARCH (тест Маклеода–Ли)",
+    )
+    parser.add_argument(
+        "--no-plots",
+        action="store_true",
+        help="только расчёты: не строить графики и не импортировать matplotlib",
+    )
+    parser.add_argument(
+        "--run-store",
+        action="store_true",
+        help="сохранить результаты запуска одним архивом output/result_N.zip вместо папки файлов",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="пересчитывать все этапы, не используя кэш результатов output/stage_cache",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_MB,
+        help=f"предельный размер кэша этапов в МБ (по умолчанию {DEFAULT_MAX_MB})",
+    )
+    if stages:
+        parser.add_argument(
+            "--stages",
+            default=None,
+            help=(
+                "выполнить только эти этапы (через запятую) и те, от которых они зависят, "
+                f"например ranking; этапы: {', '.join(PIPELINE_STAGES)}"
+            ),
+        )
+    parser.add_argument(
+        "--stage-workers",
+        type=int,
+        default=4,
+        help="сколько независимых этапов выполнять одновременно (1 — по очереди, по умолчанию 4)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="сохранить в папку запуска profile.json: время, CPU и память по этапам и тикерам",
+    )
+    parser.add_argument(
+        "--profile-stage",
+        choices=PIPELINE_STAGES,
+        default=None,
+        help="подключить профилировщик к одному этапу (по умолчанию cProfile)",
+    )
+    parser.add_argument(
+        "--profile-hook",
+        default="cprofile",
+        help="профилировщик для --profile-stage: cprofile или модуль:функция (фабрика хука)",
+    )
 
-def main():
-    # Каждый запуск — новая папка result_N в output/
-    run_dir = get_next_result_dir()
 
-    # === Загрузка данных и ADF-тест для ЦЕНОВЫХ рядов ===
-    df = load_prices()
-    run_adf_for_price_series(df, run_dir)
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Анализ волатильности акций банков РФ (GARCH)")
+    add_run_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def build_pipeline(
+    args: argparse.Namespace, run_dir: Path, cache: StageCache, profiler: StageProfiler
+) -> Pipeline:
+    """
+    Описывает запуск как граф этапов: каждый этап объявляет, какие
+    значения он берёт и какие создаёт (см. pipeline.py).
+
+    load -> adf, log_returns; log_returns -> garch, backtest, model_selection;
+    garch -> white_noise, dcc, ranking, ranking_bootstrap; ranking -> report;
+    plots — после всех расчётов.
+    """
+    n_jobs = args.jobs if args.jobs > 0 else None
+    # С --jobs этапы ниже запускают пулы процессов и идут без других этапов
+    with_processes = n_jobs != 1
 
-    # === Расчёт лог-доходностей ===
-    log_returns = compute_log_returns(df)
+    # === Загрузка данных ===
+    def load():
+        return load_price_source(
+            args.prices,
+            tickers=args.tickers.split(",") if args.tickers else None,
+            start=args.start,
+            end=args.end,
+            dtype="float32" if args.float32 else "float64",
+            ticker_column=args.ticker_column,
+            value_column=args.value_column,
+            resample=args.resample,
+        )
+
+    # === ADF-тест для ЦЕНОВЫХ рядов ===
+    def adf(prices):
+        return cache.run(
+            "adf",
+            run_dir,
+            lambda out_dir: run_adf_for_price_series(prices, out_dir, backend=args.adf_backend),
+            data=prices,
+            params={"alpha": 0.05, "backend": args.adf_backend, "statsmodels": version("statsmodels")},
+            modules=("adf_analysis", "adf_batch", "utils.run_store"),
+        )
 
     # === Оценка GARCH(1,1) и сбор статистик ===
-    volatility_results, cond_vol_series, std_resid_series = fit_garch_and_collect_stats(
-        log_returns, run_dir
-    )
+    def garch(log_returns):
+        if args.incremental:
+            # Состояние моделей само по себе кэш между запусками — этап не кэшируется
+            fits, errors, actions = update_garch_models(
+                log_returns,
+                refit_every=args.refit_every,
+                drift_alpha=args.drift_alpha,
+                n_jobs=n_jobs,
+                chunksize=args.chunksize,
+                backend=args.garch_backend,
+                source=price_source_id(
+                    args.prices,
+                    start=args.start,
+                    float32=args.float32,
+                    ticker_column=args.ticker_column,
+                    value_column=args.value_column if args.ticker_column else None,
+                    resample=args.resample,
+                ),
+            )
+            save_update_actions(actions, run_dir)
+            vol_store = collect_garch_stats(fits, errors, run_dir)
+            diagnostics = garch_fit_diagnostics(fits, errors)
+        else:
+
+            def fit_garch(out_dir):
+                fits, errors = fit_garch_models(
+                    log_returns, n_jobs=n_jobs, chunksize=args.chunksize, backend=args.garch_backend
+                )
+                return collect_garch_stats(fits, errors, out_dir), garch_fit_diagnostics(fits, errors)
+
+            vol_store, diagnostics = cache.run(
+                "garch",
+                run_dir,
+                fit_garch,
+                data=log_returns,
+                params={"model": "GARCH(1,1)", "backend": args.garch_backend, "arch": version("arch")},
+                modules=("garch_analysis", "garch_batch", "vol_store", "utils.run_store"),
+            )
+        # Для этапа из кэша — показатели исходной оценки
+        profiler.add_tickers("garch", diagnostics)
+        return vol_store
 
     # === Проверка белошумности остатков GARCH(1,1) ===
-    run_white_noise_tests_for_garch_residuals(std_resid_series, run_dir, lag=20)
-    plot_white_noise_diagnostics(std_resid_series, run_dir, max_lag=20)
+    def white_noise(vol_store):
+        return cache.run(
+            "white_noise",
+            run_dir,
+            lambda out_dir: run_white_noise_tests_for_garch_residuals(
+                vol_store, out_dir, lag=20, squared=args.squared_resid_tests
+            ),
+            data=(vol_store.index, vol_store.tickers, vol_store.std_resid),
+            params={"lag": 20, "squared": args.squared_resid_tests},
+            modules=("white_noise_analysis", "acf_kernel", "utils.run_store"),
+        )
+
+    # === DCC-GARCH: динамические корреляции по остаткам GARCH(1,1) ===
+    def dcc(vol_store):
+        return cache.run(
+            "dcc",
+            run_dir,
+            lambda out_dir: run_dcc_garch(vol_store, out_dir),
+            data=(vol_store.index, vol_store.tickers, vol_store.std_resid),
+            params={"model": "DCC(1,1)"},
+            modules=("dcc_garch", "utils.run_store"),
+        )
+
+    # === Бэктест: переоценка на окнах и прогнозы на день вперёд ===
+    def backtest(log_returns):
+        return cache.run(
+            "backtest",
+            run_dir,
+            lambda out_dir: run_garch_backtest(
+                log_returns,
+                out_dir,
+                scheme=args.backtest,
+                window=args.backtest_window,
+                step=args.backtest_step,
+                n_jobs=n_jobs,
+            ),
+            data=log_returns,
+            params={
+                "scheme": args.backtest,
+                "window": args.backtest_window,
+                "step": args.backtest_step,
+                "arch": version("arch"),
+            },
+            modules=("garch_backtest", "garch_analysis", "garch_state", "utils.run_store"),
+        )
+
+    # === Выбор спецификации GARCH по BIC ===
+    def model_selection(log_returns):
+        return cache.run(
+            "model_selection",
+            run_dir,
+            lambda out_dir: run_garch_model_selection(
+                log_returns,
+                out_dir,
+                n_jobs=n_jobs,
+                max_order=args.select_max_order,
+                prune_margin=args.select_prune_margin,
+                time_budget=args.select_time_budget,
+            ),
+            data=log_returns,
+            params={
+                "max_order": args.select_max_order,
+                "prune_margin": args.select_prune_margin,
+                "time_budget": args.select_time_budget,
+                "arch": version("arch"),
+            },
+            modules=("garch_selection", "acf_kernel", "utils.run_store"),
+        )
 
     # === Сравнение и ранжировка ===
-    vol_df = build_volatility_ranking(volatility_results)
-    save_and_print_ranking(vol_df, run_dir)
+    def ranking(vol_store):
+        vol_df = build_volatility_ranking(vol_store.mean_volatility())
+        save_and_print_ranking(vol_df, run_dir)
+        return vol_df
+
+    # === Устойчивость ранжировки: бутстрэп траекторий GARCH ===
+    def ranking_bootstrap(vol_store):
+        return cache.run(
+            "ranking_bootstrap",
+            run_dir,
+            lambda out_dir: run_ranking_bootstrap(
+                vol_store,
+                out_dir,
+                n_sims=args.bootstrap,
+                method=args.bootstrap_method,
+                mode=args.bootstrap_mode,
+                seed=args.bootstrap_seed,
+                n_jobs=n_jobs,
+                chunk_mb=args.bootstrap_chunk_mb,
+            ),
+            data=(vol_store.index, vol_store.tickers, vol_store.cond_vol, vol_store.std_resid, vol_store.params),
+            params={
+                "n_sims": args.bootstrap,
+                "method": args.bootstrap_method,
+                "mode": args.bootstrap_mode,
+                "seed": args.bootstrap_seed,
+            },
+            modules=("ranking_bootstrap", "garch_batch", "volatility_report", "utils.run_store"),
+        )
+
+    # === Графики: отдельный этап после всех расчётов ===
+    def plots(prices, adf_df, vol_store, resid_acf):
+        plot_jobs = (
+            adf_plot_jobs(prices, adf_df)
+            + garch_plot_jobs(vol_store)
+            + white_noise_plot_jobs(vol_store, max_lag=20, resid_acf=resid_acf)
+            + [volatility_comparison_plot_job(vol_store)]
+        )
+        n_plots = cache.run(
+            "plots",
+            run_dir,
+            lambda out_dir: len(render_plots(plot_jobs, out_dir, n_jobs=n_jobs)),
+            data=plot_jobs,
+            params={"matplotlib": version("matplotlib")},
+            modules=("render",),
+        )
+        print(f"  — графики: {n_plots} файлов PNG (в т.ч. сравнение_волатильности_GARCH.png)")
+
+    stages = [
+        Stage("load", load, outputs=("prices",)),
+        Stage("adf", adf, inputs=("prices",), outputs=("adf_df",)),
+        Stage(
+            "log_returns", lambda prices: compute_log_returns(prices),
+            inputs=("prices",), outputs=("log_returns",),
+        ),
+        Stage(
+            "garch", garch, inputs=("log_returns",), outputs=("vol_store",),
+            exclusive=with_processes,
+        ),
+        Stage("white_noise", white_noise, inputs=("vol_store",), outputs=("resid_acf",)),
+    ]
+    if args.dcc:
+        stages.append(Stage("dcc", dcc, inputs=("vol_store",)))
+    if args.backtest:
+        stages.append(
+            Stage("backtest", backtest, inputs=("log_returns",), exclusive=with_processes)
+        )
+    if args.select_models:
+        stages.append(
+            Stage(
+                "model_selection", model_selection, inputs=("log_returns",),
+                exclusive=with_processes,
+            )
+        )
+    stages += [
+        Stage("ranking", ranking, inputs=("vol_store",), outputs=("vol_df",)),
+    ]
+    if args.bootstrap:
+        stages.append(
+            Stage(
+                "ranking_bootstrap", ranking_bootstrap, inputs=("vol_store",),
+                exclusive=with_processes,
+            )
+        )
+    stages += [
+        # === Комментарий с точки зрения предметной области ===
+        Stage("report", lambda vol_df: write_domain_report(vol_df, run_dir), inputs=("vol_df",)),
+    ]
+    if not args.no_plots:
+        stages.append(
+            Stage(
+                "plots",
+                plots,
+                inputs=("prices", "adf_df", "vol_store", "resid_acf"),
+                exclusive=with_processes,
+            )
+        )
+    return Pipeline(stages)
+
+
+def run(args: argparse.Namespace) -> None:
+    """
+    Выполняет анализ с параметрами args (этапы --stages или все).
+    """
+    # Каждый запуск — новая папка result_N в output/
+    run_dir = get_next_result_dir()
+    # Этапы с неизменными данными, параметрами и кодом берутся из кэша
+    cache = StageCache(max_mb=args.cache_max_mb, enabled=not args.no_cache)
+    # Замеры этапов (--profile) и профилировщик одного этапа (--profile-stage)
+    profiler = StageProfiler(run_dir, enabled=args.profile)
+    if args.profile_stage:
+        profiler.add_hook(args.profile_stage, load_hook(args.profile_hook))
+
+    # Независимые этапы (например, ADF и GARCH) выполняются одновременно
+    pipeline = build_pipeline(args, run_dir, cache, profiler)
+    targets = args.stages.split(",") if args.stages else None
+    try:
+        pipeline.select(targets)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    # Без графиков arch и другие библиотеки не подтягивают matplotlib
+    with plotting_disabled() if args.no_plots else contextlib.nullcontext():
+        pipeline.run(targets, max_workers=args.stage_workers, wrap=profiler.stage)
+
+    if cache.hits:
+        print(f"  — из кэша этапов: {', '.join(cache.hits)}")
+    profile_path = profiler.write(cached_stages=cache.hits)
+    if profile_path is not None:
+        print(f"  — профиль запуска: {profile_path.name}")
+
+    if args.run_store:
+        # Таблицы, ряды и графики — в один архив; папка запуска больше не нужна
+        store_path = pack_run_dir(run_dir, run_store_path(run_dir))
+        shutil.rmtree(run_dir)
+        print(f"  — результаты запуска одним файлом: {store_path.name}")
 
-    # === Сопоставление волатильностей: общий график ===
-    plot_volatility_comparison(cond_vol_series, run_dir)
 
-    # === Комментарий с точки зрения предметной области ===
-    write_domain_report(vol_df, run_dir)
+def main(argv=None):
+    run(parse_args(argv))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+"""
+Перенаправление консольного вывода, безопасное для потоков.
+
+contextlib.redirect_stdout подменяет sys.stdout для всего процесса, поэтому
+этапы, выполняемые параллельно в потоках (pipeline.py), перехватывали бы
+вывод друг друга. На время такого выполнения sys.stdout заменяется на
+ThreadLocalStdout: запись идёт в поток вывода, назначенный текущему
+потоку, а если он не назначен — в исходный stdout. redirect_stdout из
+этого модуля работает и так, и с обычным sys.stdout.
+"""
+
+import contextlib
+import io
+import sys
+import threading
+from typing import Iterator, TextIO
+
+
+class ThreadLocalStdout(io.TextIOBase):
+    """
+    stdout, который направляет запись в поток вывода текущего потока.
+    """
+
+    def __init__(self, default: TextIO):
+        self.default = default
+        self._local = threading.local()
+
+    def target(self) -> TextIO:
+        return getattr(self._local, "stream", None) or self.default
+
+    def write(self, text: str) -> int:
+        return self.target().write(text)
+
+    def flush(self) -> None:
+        self.target().flush()
+
+
+def current_stdout() -> TextIO:
+    """
+    Поток, в который сейчас фактически пишет print в текущем потоке.
+    """
+    stream = sys.stdout
+    if isinstance(stream, ThreadLocalStdout):
+        return stream.target()
+    return stream
+
+
+@contextlib.contextmanager
+def redirect_stdout(stream: TextIO) -> Iterator[TextIO]:
+    """
+    Направляет вывод текущего потока в stream (при ThreadLocalStdout —
+    только этого потока, иначе — как contextlib.redirect_stdout).
+    """
+    current = sys.stdout
+    if not isinstance(current, ThreadLocalStdout):
+        with contextlib.redirect_stdout(stream):
+            yield stream
+        return
+
+    previous = getattr(current._local, "stream", None)
+    current._local.stream = stream
+    try:
+        yield stream
+    finally:
+        current._local.stream = previous
+
+
+@contextlib.contextmanager
+def thread_local_stdout() -> Iterator[ThreadLocalStdout]:
+    """
+    На время блока заменяет sys.stdout на ThreadLocalStdout (если ещё не заменён).
+    """
+    if isinstance(sys.stdout, ThreadLocalStdout):
+        yield sys.stdout
+        return
+    original = sys.stdout
+    sys.stdout = ThreadLocalStdout(original)
+    try:
+        yield sys.stdout
+    finally:
+        sys.stdout = original
@@ -0,0 +1,158 @@
+"""
+Кэш ценовых рядов в колоночном бинарном формате (NumPy .npy).
+
+Разбор Excel через openpyxl — самая медленная часть загрузки. Кэш хранит
+уже разобранную таблицу в виде двух массивов (значения T×N и индекс дат)
+и JSON-описания с ключом источника: полный путь, размер файла, время
+изменения и SHA-256 содержимого. Повторная загрузка идёт через np.load(mmap_mode="r"),
+то есть без чтения файла целиком и без копирования данных.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+# Версия формата кэша: при изменении раскладки файлов старый кэш игнорируется
+CACHE_FORMAT_VERSION = 1
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_sha256(path: Path) -> str:
+    """
+    Считает SHA-256 содержимого файла, читая его блоками.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(cache_dir: Path, source: Path, variant: str) -> dict[str, Path]:
+    # В имени файлов — короткий хэш полного пути источника и варианта (лист,
+    # дата начала и т.п.), чтобы одноимённые файлы из разных папок и разные
+    # срезы одного источника не перетирали друг друга.
+    variant_key = hashlib.sha256(
+        f"{source.resolve()}|{variant}|{CACHE_FORMAT_VERSION}".encode("utf-8")
+    ).hexdigest()[:16]
+    stem = f"{source.stem}.{variant_key}"
+    return {
+        "meta": cache_dir / f"{stem}.meta.json",
+        "values": cache_dir / f"{stem}.values.npy",
+        "index": cache_dir / f"{stem}.index.npy",
+    }
+
+
+def _read_meta(meta_path: Path) -> dict | None:
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path: Path, meta: dict) -> None:
+    tmp_path = meta_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    # Пишем во временный файл и атомарно подменяем, чтобы прерванная запись
+    # не оставила «битый» кэш.
+    tmp_path = path.with_suffix(".tmp.npy")
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _source_matches(meta: dict, source: Path, stat: os.stat_result) -> bool:
+    """
+    Проверяет, что кэш построен по тому же содержимому источника.
+
+    Если совпадают размер и mtime, считаем файл неизменным (без чтения).
+    Иначе сверяем SHA-256: при совпадении (файл, например, скопировали
+    заново) обновляем размер и mtime в описании и используем кэш.
+    """
+    if meta.get("format_version") != CACHE_FORMAT_VERSION:
+        return False
+    if meta.get("size") == stat.st_size and meta.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    if meta.get("size") != stat.st_size:
+        return False
+    return meta.get("sha256") == file_sha256(source)
+
+
+def _frame_from_cache(paths: dict[str, Path], meta: dict) -> pd.DataFrame:
+    values = np.load(paths["values"], mmap_mode="r")
+    index = np.load(paths["index"], mmap_mode="r")
+    return pd.DataFrame(
+        values,
+        index=pd.DatetimeIndex(index, name=meta["index_name"]),
+        columns=pd.Index(meta["columns"]),
+        copy=False,
+    )
+
+
+def load_cached_frame(
+    source: Path,
+    build: Callable[[], pd.DataFrame],
+    cache_dir: Path,
+    variant: str = "",
+) -> pd.DataFrame:
+    """
+    Возвращает таблицу из кэша или строит её функцией build и кэширует.
+
+    Ожидается таблица с индексом дат и числовыми столбцами одного типа
+    (как лист с ценами). Кэш инвалидируется при изменении источника;
+    variant отделяет разные срезы одного файла (лист, фильтр по дате).
+    Если таблица не приводится к одному числовому массиву, она
+    возвращается без кэширования.
+    """
+    paths = _cache_paths(cache_dir, source, variant)
+    stat = source.stat()
+
+    meta = _read_meta(paths["meta"])
+    if (
+        meta is not None
+        and paths["values"].exists()
+        and paths["index"].exists()
+        and _source_matches(meta, source, stat)
+    ):
+        if meta["mtime_ns"] != stat.st_mtime_ns:
+            meta["mtime_ns"] = stat.st_mtime_ns
+            _write_meta(paths["meta"], meta)
+        return _frame_from_cache(paths, meta)
+
+    df = build()
+    if not isinstance(df.index, pd.DatetimeIndex) or not all(
+        pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes
+    ):
+        return df
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Тип значений сохраняется (float32 остаётся float32)
+    values = np.ascontiguousarray(df.to_numpy(dtype=np.result_type(np.float32, *df.dtypes)))
+    index = df.index.to_numpy()
+    _save_array(paths["values"], values)
+    _save_array(paths["index"], index)
+    _write_meta(
+        paths["meta"],
+        {
+            "format_version": CACHE_FORMAT_VERSION,
+            "source": str(source.resolve()),
+            "variant": variant,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_sha256(source),
+            "columns": [str(col) for col in df.columns],
+            "index_name": df.index.name,
+        },
+    )
+    return _frame_from_cache(paths, _read_meta(paths["meta"]))
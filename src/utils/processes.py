@@ -0,0 +1,29 @@
+"""
+Контекст запуска рабочих процессов для пулов ProcessPoolExecutor.
+
+Пулы процессов создаются из потоков планировщика (pipeline.py), пока
+в соседних потоках идут расчёты и ленивые импорты scipy/statsmodels.
+fork копирует процесс вместе с захваченными в этот момент блокировками
+(импорта, malloc, OpenBLAS), и дочерний процесс может зависнуть навсегда.
+Поэтому процессы запускаются через forkserver: их порождает отдельный
+однопоточный сервер, а не текущий многопоточный процесс. Где forkserver
+недоступен (Windows, macOS по умолчанию) — spawn.
+"""
+
+import multiprocessing
+from multiprocessing.context import BaseContext
+
+# Модули, которые сервер импортирует один раз: рабочие процессы получают
+# их готовыми вместо импорта заново в каждом процессе
+_PRELOAD = ["numpy", "pandas"]
+
+
+def process_context() -> BaseContext:
+    """
+    Контекст multiprocessing для mp_context= пулов процессов (forkserver или spawn).
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(_PRELOAD)
+        return context
+    return multiprocessing.get_context("spawn")
@@ -0,0 +1,193 @@
+"""
+Замеры этапов запуска (--profile) и точки подключения профилировщиков.
+
+StageProfiler.stage(имя) — контекст вокруг этапа: время (wall),
+процессорное время потока, в котором шёл этап (time.thread_time: этапы
+выполняются в потоках одновременно, и время всего процесса включало бы
+чужие этапы), и процессорное время завершённых дочерних процессов (пулы
+--jobs). Последнее общее на процесс, поэтому записывается, только если
+этап ни с кем не пересекался по времени (иначе null, overlapped=true).
+Память учитывается тоже только на уровне процесса: у этапа —
+пиковый RSS процесса к его концу (process_peak_rss_mb), в итоге — пиковый
+RSS процесса и его дочерних процессов. Показатели по тикерам (время
+оценки, итерации оптимизатора и т.п.) добавляются через add_tickers.
+write() сохраняет всё в profile.json в папке запуска.
+
+К одному этапу можно подключить профилировщик: хук — фабрика
+hook(stage, run_dir), возвращающая контекстный менеджер, внутри которого
+выполняется этап. Встроенный хук cprofile_hook пишет profile_<этап>.prof
+(для pstats / snakeviz) и текстовую сводку; сторонний (например,
+семплирующий) задаётся как "модуль:функция" (load_hook).
+
+Пиковый RSS берётся из resource.getrusage (Linux, macOS); там, где модуля
+resource нет (Windows), поля памяти равны null.
+"""
+
+import contextlib
+import cProfile
+import importlib
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_FILENAME = "profile.json"
+
+# Хук профилировщика: (этап, папка запуска) -> контекстный менеджер
+ProfileHook = Callable[[str, Path], ContextManager]
+
+
+def _maxrss_mb(who: int) -> Optional[float]:
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(who).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    scale = 1024**2 if sys.platform == "darwin" else 1024
+    return maxrss / scale
+
+
+def _children_cpu() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+@contextlib.contextmanager
+def cprofile_hook(stage: str, run_dir: Path):
+    """
+    Профилирует этап через cProfile: profile_<этап>.prof и profile_<этап>.txt
+    (30 функций с наибольшим накопленным временем).
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        prof_path = run_dir / f"profile_{stage}.prof"
+        profiler.dump_stats(prof_path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(30)
+        (run_dir / f"profile_{stage}.txt").write_text(text.getvalue(), encoding="utf-8")
+        print(f"  — профиль этапа {stage}: {prof_path.name}")
+
+
+def load_hook(spec: str) -> ProfileHook:
+    """
+    Загружает хук по строке "модуль:функция" (или "cprofile" — встроенный).
+    """
+    if spec == "cprofile":
+        return cprofile_hook
+    module_name, sep, func_name = spec.partition(":")
+    if not sep or not module_name or not func_name:
+        raise ValueError(f"Хук задаётся как модуль:функция, получено: {spec!r}")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+class StageProfiler:
+    """
+    Сборщик замеров по этапам и тикерам.
+
+    enabled=False — замеры не ведутся (stage() ничего не делает), но хуки
+    профилировщиков, добавленные через add_hook, всё равно срабатывают.
+    """
+
+    def __init__(self, run_dir: Path, enabled: bool = False):
+        self.run_dir = run_dir
+        self.enabled = enabled
+        self.stages: List[dict] = []
+        self.tickers: Dict[str, List[dict]] = {}
+        self._hooks: Dict[str, List[ProfileHook]] = {}
+        self._started = time.perf_counter()
+        # Выполняющиеся сейчас этапы и признак пересечения с другими этапами
+        self._lock = threading.Lock()
+        self._active: Dict[str, bool] = {}
+
+    def add_hook(self, stage: str, hook: ProfileHook) -> None:
+        """
+        Подключает профилировщик к этапу stage.
+        """
+        self._hooks.setdefault(stage, []).append(hook)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Выполняет тело как этап name: замеры (если включены) и хуки.
+        """
+        hooks = self._hooks.get(name, [])
+        if not self.enabled and not hooks:
+            yield
+            return
+
+        with self._lock:
+            overlapped = bool(self._active)
+            for other in self._active:
+                self._active[other] = True
+            self._active[name] = overlapped
+        cpu_start, children_start = time.thread_time(), _children_cpu()
+        wall_start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for hook in hooks:
+                    stack.enter_context(hook(name, self.run_dir))
+                yield
+        finally:
+            with self._lock:
+                overlapped = self._active.pop(name)
+        wall = time.perf_counter() - wall_start
+        if not self.enabled:
+            return
+
+        self.stages.append(
+            {
+                "stage": name,
+                "wall_s": wall,
+                "cpu_s": time.thread_time() - cpu_start,
+                # Дочерние процессы общие на процесс: при пересечении этапов не разделить
+                "children_cpu_s": None if overlapped else _children_cpu() - children_start,
+                "overlapped": overlapped,
+                "process_peak_rss_mb": (
+                    _maxrss_mb(resource.RUSAGE_SELF) if resource is not None else None
+                ),
+            }
+        )
+
+    def add_tickers(self, stage: str, rows: Iterable[dict]) -> None:
+        """
+        Добавляет показатели по тикерам для этапа stage (по строке на тикер).
+        """
+        if self.enabled:
+            self.tickers.setdefault(stage, []).extend(rows)
+
+    def write(self, cached_stages: Iterable[str] = ()) -> Optional[Path]:
+        """
+        Сохраняет profile.json в папку запуска (если замеры включены).
+        Этапы из cached_stages помечаются как взятые из кэша этапов.
+        """
+        if not self.enabled:
+            return None
+        cached = set(cached_stages)
+        for entry in self.stages:
+            entry["cached"] = entry["stage"] in cached
+        profile = {
+            "total_wall_s": time.perf_counter() - self._started,
+            "peak_rss_mb": _maxrss_mb(resource.RUSAGE_SELF) if resource is not None else None,
+            "children_peak_rss_mb": (
+                _maxrss_mb(resource.RUSAGE_CHILDREN) if resource is not None else None
+            ),
+            "stages": self.stages,
+            "tickers": self.tickers,
+        }
+        path = self.run_dir / PROFILE_FILENAME
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+        return path
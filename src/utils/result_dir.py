@@ -1,7 +1,15 @@
 """
 Утилита для создания папок с результатами вида output/result_N.
+
+Номер следующего запуска хранится в output/.last_result_id, поэтому
+папку output/ не нужно просматривать при каждом запуске (с тысячами
+запусков это заметно). Номер занимается атомарным созданием папки
+result_N: если она (или архив result_N.zip) уже есть — например,
+параллельный запуск или счётчик удалён вместе с частью папок, — берётся
+следующий. Просмотр output/ выполняется один раз, когда счётчика нет.
 """
 
+import os
 from pathlib import Path
 
 # Корень проекта: на одну папку выше src/
@@ -9,27 +17,62 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 
 OUTPUT_BASE = PROJECT_ROOT / "output"
 RESULT_PREFIX = "result_"
+RUN_STORE_SUFFIX = ".zip"
+COUNTER_FILE = OUTPUT_BASE / ".last_result_id"
 
 
-def get_next_result_dir() -> Path:
+def _scan_last_result_id() -> int:
     """
-    Создаёт в output/ новую папку result_N (N = предыдущий максимум + 1)
-    и возвращает путь к ней.
+    Наибольший номер среди папок result_N и архивов result_N.zip в output/.
     """
-    OUTPUT_BASE.mkdir(parents=True, exist_ok=True)
-    existing = [
-        d.name
-        for d in OUTPUT_BASE.iterdir()
-        if d.is_dir() and d.name.startswith(RESULT_PREFIX)
-    ]
-
-    numbers: list[int] = []
-    for name in existing:
+    numbers: list[int] = [0]
+    for entry in os.scandir(OUTPUT_BASE):
+        name = entry.name
+        if name.endswith(RUN_STORE_SUFFIX):
+            name = name[: -len(RUN_STORE_SUFFIX)]
         suffix = name[len(RESULT_PREFIX) :]
-        if suffix.isdigit():
+        if name.startswith(RESULT_PREFIX) and suffix.isdigit():
             numbers.append(int(suffix))
+    return max(numbers)
+
+
+def _read_last_result_id() -> int:
+    try:
+        return int(COUNTER_FILE.read_text(encoding="utf-8").strip())
+    except (FileNotFoundError, ValueError):
+        return _scan_last_result_id()
+
+
+def _write_last_result_id(number: int) -> None:
+    # Запись во временный файл и атомарная подмена, как в кэше цен
+    tmp_path = COUNTER_FILE.with_name(f"{COUNTER_FILE.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(str(number), encoding="utf-8")
+    os.replace(tmp_path, COUNTER_FILE)
+
 
-    next_num = max(numbers, default=0) + 1
-    run_dir = OUTPUT_BASE / f"{RESULT_PREFIX}{next_num}"
-    run_dir.mkdir(parents=True, exist_ok=True)
+def get_next_result_dir() -> Path:
+    """
+    Создаёт в output/ новую папку result_N (N = последний номер + 1)
+    и возвращает путь к ней.
+    """
+    OUTPUT_BASE.mkdir(parents=True, exist_ok=True)
+    number = _read_last_result_id()
+    while True:
+        number += 1
+        run_dir = OUTPUT_BASE / f"{RESULT_PREFIX}{number}"
+        if run_store_path(run_dir).exists():
+            continue
+        try:
+            run_dir.mkdir()
+        except FileExistsError:
+            continue
+        break
+    _write_last_result_id(number)
     return run_dir
+
+
+def run_store_path(run_dir: Path) -> Path:
+    """
+    Путь архива запуска для папки result_N: output/result_N.zip.
+    """
+    return run_dir.with_name(run_dir.name + RUN_STORE_SUFFIX)
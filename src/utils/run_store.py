@@ -0,0 +1,375 @@
+"""
+Результаты запуска одним файлом: output/result_N.zip вместо папки из
+десятков CSV, PNG и .npy.
+
+Архив — обычный ZIP (только стандартная библиотека), в котором:
+    manifest.json          — оглавление: таблицы, массивы, прочие файлы;
+    tables/<k>/<i>.npy     — таблица по столбцам (и уровням индекса), один .npy на столбец;
+    arrays/<имя>.npy       — массивы без сжатия (ряды GARCH, корреляции DCC);
+    files/<имя>            — прочее: отчёт .txt, meta.json, PNG, .npz.
+
+Чтение ленивое: RunStore.open читает только оглавление ZIP и manifest.json,
+таблица собирается из нужных столбцов, а массив отображается в память
+прямо из архива (данные .npy хранятся без сжатия и выровнены по 64 байта),
+поэтому ряды тысяч тикеров не читаются целиком. Архив пишется во
+временный файл и атомарно переименовывается.
+
+Этапы сохраняют таблицы через save_csv: рядом с CSV кладётся скрытая
+схема (.<имя>.csv.json) — индекс, типы и категории столбцов. По ней
+pack_run_dir восстанавливает таблицу такой, какой её записал этап, а не
+угадывает типы по тексту CSV (безымянный индекс стал бы столбцом
+«Unnamed: 0», даты — строками, float32 — float64). CSV без схемы
+сохраняются в архиве как файлы, байт в байт.
+"""
+
+import fnmatch
+import io
+import json
+import os
+import struct
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# Версия раскладки архива: при изменении старые архивы не читаются
+RUN_STORE_FORMAT_VERSION = 1
+
+MANIFEST_NAME = "manifest.json"
+
+# Выравнивание данных несжатых членов архива (как у заголовка .npy)
+_ALIGN = 64
+# Идентификатор поля extra для выравнивания (как у zipalign)
+_PADDING_EXTRA_ID = 0xD935
+# Размер локального заголовка ZIP без имени и поля extra
+_LOCAL_HEADER_SIZE = 30
+# Форматы, которые уже сжаты: хранятся в архиве как есть
+_STORED_SUFFIXES = {".png", ".npz", ".npy"}
+
+
+def _read_npy_header(f) -> tuple:
+    """
+    Форма, порядок и dtype массива из заголовка .npy (файл — на его начале).
+    """
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(f)
+    return np.lib.format.read_array_header_2_0(f)
+
+
+class RunStoreWriter:
+    """
+    Пишет архив запуска: add_table / add_array / add_file, затем close().
+    """
+
+    def __init__(self, path: Path, run_id: Optional[str] = None):
+        self.path = Path(path)
+        self._tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self._zip = zipfile.ZipFile(self._tmp_path, "w", allowZip64=True)
+        self._manifest: dict = {
+            "format_version": RUN_STORE_FORMAT_VERSION,
+            "run_id": run_id or self.path.stem,
+            "tables": {},
+            "arrays": {},
+            "files": {},
+        }
+
+    def __enter__(self) -> "RunStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+            self._tmp_path.unlink(missing_ok=True)
+
+    def _write_aligned(self, member: str, data: bytes) -> None:
+        """
+        Несжатый член архива, данные которого начинаются с кратного 64 смещения.
+        """
+        info = zipfile.ZipInfo(member, date_time=(1980, 1, 1, 0, 0, 0))
+        info.compress_type = zipfile.ZIP_STORED
+        header_end = self._zip.fp.tell() + _LOCAL_HEADER_SIZE + len(member.encode("utf-8")) + 4
+        pad = -header_end % _ALIGN
+        info.extra = struct.pack("<HH", _PADDING_EXTRA_ID, pad) + b"\0" * pad
+        self._zip.writestr(info, data)
+
+    def _write_npy(self, member: str, array: np.ndarray) -> dict:
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(array), allow_pickle=False)
+        self._write_aligned(member, buffer.getvalue())
+        return {"member": member, "shape": list(array.shape), "dtype": str(array.dtype)}
+
+    def add_table(self, name: str, df: pd.DataFrame) -> None:
+        """
+        Таблица по столбцам вместе с индексом (если это не RangeIndex);
+        строковые и категориальные столбцы — как Unicode-массивы
+        с отдельной маской пропусков.
+        """
+        key = len(self._manifest["tables"])
+        series = []
+        if not isinstance(df.index, pd.RangeIndex):
+            series += [(df.index.get_level_values(i), True) for i in range(df.index.nlevels)]
+        series += [(df.iloc[:, i], False) for i in range(df.shape[1])]
+        columns = []
+        for i, (values, is_index) in enumerate(series):
+            entry: dict = {"name": None if values.name is None else str(values.name)}
+            if is_index:
+                entry["index"] = True
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                entry["categories"] = [str(c) for c in values.dtype.categories]
+                entry["ordered"] = bool(values.dtype.ordered)
+            if values.dtype.kind in "biufcmM":
+                array = values.to_numpy()
+            else:
+                missing = np.asarray(values.isna())
+                array = values.astype(str).to_numpy(dtype=str)
+                if missing.any():
+                    entry["mask"] = self._write_npy(f"tables/{key}/{i}.mask.npy", missing)["member"]
+            entry.update(self._write_npy(f"tables/{key}/{i}.npy", array))
+            columns.append(entry)
+        self._manifest["tables"][name] = {"rows": len(df), "columns": columns}
+
+    def add_array(self, name: str, array: np.ndarray) -> None:
+        self._manifest["arrays"][name] = self._write_npy(f"arrays/{name}.npy", array)
+
+    def add_npy_file(self, name: str, path: Path) -> None:
+        """
+        Готовый файл .npy копируется в архив как есть (без разбора в память).
+        """
+        with open(path, "rb") as f:
+            shape, _, dtype = _read_npy_header(f)
+        member = f"arrays/{name}.npy"
+        self._write_aligned(member, Path(path).read_bytes())
+        self._manifest["arrays"][name] = {"member": member, "shape": list(shape), "dtype": str(dtype)}
+
+    def add_file(self, name: str, data: Union[bytes, Path]) -> None:
+        if isinstance(data, Path):
+            data = data.read_bytes()
+        member = f"files/{name}"
+        stored = Path(name).suffix.lower() in _STORED_SUFFIXES
+        self._zip.writestr(
+            zipfile.ZipInfo(member, date_time=(1980, 1, 1, 0, 0, 0)),
+            data,
+            compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED,
+        )
+        self._manifest["files"][name] = {"member": member, "size": len(data)}
+
+    def close(self) -> Path:
+        if self._zip.fp is None:
+            return self.path
+        manifest = json.dumps(self._manifest, ensure_ascii=False, indent=2)
+        self._zip.writestr(MANIFEST_NAME, manifest.encode("utf-8"), compress_type=zipfile.ZIP_DEFLATED)
+        self._zip.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+
+class RunStore:
+    """
+    Ленивое чтение архива запуска: оглавление при открытии, данные — по запросу.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._zip = zipfile.ZipFile(self.path, "r")
+        self.manifest = json.loads(self._zip.read(MANIFEST_NAME))
+        if self.manifest.get("format_version") != RUN_STORE_FORMAT_VERSION:
+            self._zip.close()
+            raise ValueError(f"Неподдерживаемый формат архива запуска: {self.path}")
+
+    @classmethod
+    def open(cls, path: Path) -> "RunStore":
+        return cls(path)
+
+    def __enter__(self) -> "RunStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._zip.close()
+
+    @property
+    def tables(self) -> List[str]:
+        return list(self.manifest["tables"])
+
+    @property
+    def arrays(self) -> List[str]:
+        return list(self.manifest["arrays"])
+
+    @property
+    def files(self) -> List[str]:
+        return list(self.manifest["files"])
+
+    def _member_array(self, member: str, mmap: bool) -> np.ndarray:
+        info = self._zip.getinfo(member)
+        if not mmap or info.compress_type != zipfile.ZIP_STORED:
+            return np.load(io.BytesIO(self._zip.read(info)), allow_pickle=False)
+        # Смещение данных члена: локальный заголовок + имя + поле extra
+        with open(self.path, "rb") as f:
+            f.seek(info.header_offset)
+            header = f.read(_LOCAL_HEADER_SIZE)
+            name_len, extra_len = struct.unpack("<HH", header[26:30])
+            f.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_len + extra_len)
+            shape, fortran, dtype = _read_npy_header(f)
+            offset = f.tell()
+        if dtype.hasobject:
+            return np.load(io.BytesIO(self._zip.read(info)), allow_pickle=False)
+        if int(np.prod(shape)) == 0:
+            return np.empty(shape, dtype=dtype, order="F" if fortran else "C")
+        return np.memmap(
+            self.path, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortran else "C"
+        )
+
+    def array(self, name: str, mmap: bool = True) -> np.ndarray:
+        """
+        Массив name; при mmap=True — отображение в память без чтения целиком.
+        """
+        if name not in self.manifest["arrays"]:
+            raise KeyError(f"Нет массива {name} в {self.path.name}")
+        return self._member_array(self.manifest["arrays"][name]["member"], mmap)
+
+    def _column(self, entry: dict):
+        values = np.array(self._member_array(entry["member"], mmap=False))
+        if values.dtype.kind == "U":
+            values = values.astype(object)
+            if "mask" in entry:
+                values[self._member_array(entry["mask"], mmap=False)] = np.nan
+        if "categories" in entry:
+            return pd.Categorical(values, categories=entry["categories"], ordered=entry["ordered"])
+        return values
+
+    def table(self, name: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Таблица name с индексом; columns — читать только эти столбцы.
+        """
+        if name not in self.manifest["tables"]:
+            raise KeyError(f"Нет таблицы {name} в {self.path.name}")
+        entries = self.manifest["tables"][name]["columns"]
+        index_entries = [entry for entry in entries if entry.get("index")]
+        entries = [entry for entry in entries if not entry.get("index")]
+        if columns is not None:
+            wanted = set(columns)
+            entries = [entry for entry in entries if entry["name"] in wanted]
+        index = _make_index(
+            [self._column(entry) for entry in index_entries],
+            [entry["name"] for entry in index_entries],
+        )
+        return _make_frame([self._column(entry) for entry in entries], [e["name"] for e in entries], index)
+
+    def read_file(self, name: str) -> bytes:
+        if name not in self.manifest["files"]:
+            raise KeyError(f"Нет файла {name} в {self.path.name}")
+        return self._zip.read(self.manifest["files"][name]["member"])
+
+    def export_files(self, out_dir: Path, pattern: str = "*.png") -> List[Path]:
+        """
+        Извлекает файлы по шаблону имени (например, графики PNG) в out_dir.
+        """
+        written = []
+        for name in self.files:
+            if not fnmatch.fnmatch(name, pattern):
+                continue
+            path = out_dir / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(self.read_file(name))
+            written.append(path)
+        return written
+
+
+def _make_index(levels: List[object], names: List[Optional[str]]) -> Optional[pd.Index]:
+    if not levels:
+        return None
+    if len(levels) == 1:
+        return pd.Index(levels[0], name=names[0])
+    return pd.MultiIndex.from_arrays(levels, names=names)
+
+
+def _make_frame(values: List[object], names: List[str], index: Optional[pd.Index]) -> pd.DataFrame:
+    # Столбцы по номерам: одинаковые имена не схлопываются
+    df = pd.DataFrame(dict(enumerate(values)), index=index)
+    df.columns = names
+    return df
+
+
+def _schema_path(csv_path: Path) -> Path:
+    return csv_path.with_name(f".{csv_path.name}.json")
+
+
+def _field(values: Union[pd.Series, pd.Index]) -> dict:
+    field = {"name": None if values.name is None else str(values.name), "dtype": str(values.dtype)}
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        field["categories"] = [str(c) for c in values.dtype.categories]
+        field["ordered"] = bool(values.dtype.ordered)
+    return field
+
+
+def _restore(values: pd.Series, field: dict):
+    """
+    Столбец CSV (прочитанный как строки) в тип из схемы.
+    """
+    if "categories" in field:
+        return pd.Categorical(values, categories=field["categories"], ordered=field["ordered"])
+    if field["dtype"] == "bool":
+        # astype(bool) сочло бы строку "False" истиной
+        return values.map({"True": True, "False": False}).astype(bool).to_numpy()
+    return values.astype(field["dtype"]).array
+
+
+def save_csv(df: pd.DataFrame, path: Path, index: bool = True) -> Path:
+    """
+    Сохраняет таблицу этапа в CSV (utf-8-sig) и рядом — её схему
+    (индекс, типы, категории), чтобы pack_run_dir собрал таблицу без потерь.
+    """
+    df.to_csv(path, encoding="utf-8-sig", index=index)
+    levels = [df.index.get_level_values(i) for i in range(df.index.nlevels)] if index else []
+    schema = {
+        "index": [_field(level) for level in levels],
+        "columns": [_field(df.iloc[:, i]) for i in range(df.shape[1])],
+    }
+    _schema_path(path).write_text(json.dumps(schema, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def read_csv_table(path: Path) -> pd.DataFrame:
+    """
+    Таблица, сохранённая save_csv: индекс и типы столбцов — по схеме,
+    без угадывания по тексту CSV.
+    """
+    schema = json.loads(_schema_path(path).read_text(encoding="utf-8"))
+    fields = schema["index"] + schema["columns"]
+    n_index = len(schema["index"])
+    values: List[object] = []
+    if fields:
+        raw = pd.read_csv(path, encoding="utf-8-sig", dtype=str, keep_default_na=False, na_values=[""])
+        values = [_restore(raw.iloc[:, i], field) for i, field in enumerate(fields)]
+    index = _make_index(values[:n_index], [field["name"] for field in schema["index"]])
+    return _make_frame(values[n_index:], [field["name"] for field in schema["columns"]], index)
+
+
+def pack_run_dir(run_dir: Path, path: Path) -> Path:
+    """
+    Собирает папку запуска в архив path: CSV со схемой (save_csv) -> таблицы,
+    .npy -> массивы, остальное (и CSV без схемы) -> файлы. Имена — пути
+    относительно run_dir без расширения (для файлов — с расширением).
+    """
+    files = sorted(p for p in run_dir.rglob("*") if p.is_file())
+    schemas = {_schema_path(p) for p in files if p.suffix.lower() == ".csv"}
+    with RunStoreWriter(path, run_id=run_dir.name) as writer:
+        for file_path in files:
+            if file_path in schemas:
+                continue
+            relative = file_path.relative_to(run_dir).as_posix()
+            suffix = file_path.suffix.lower()
+            if suffix == ".csv" and _schema_path(file_path).is_file():
+                writer.add_table(relative[: -len(suffix)], read_csv_table(file_path))
+            elif suffix == ".npy":
+                writer.add_npy_file(relative[: -len(suffix)], file_path)
+            else:
+                writer.add_file(relative, file_path)
+    return path
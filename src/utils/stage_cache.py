@@ -0,0 +1,275 @@
+"""
+Кэш результатов этапов анализа между запусками (output/stage_cache).
+
+Ключ этапа — SHA-256 от входных данных (значения, индекс, имена столбцов),
+параметров этапа (alpha, лаги, способ оценки и т.п.) и исходного кода
+модулей, которые этап выполняет. Если ключ уже есть в кэше, этап не
+пересчитывается: его файлы (CSV, PNG) копируются в новую папку result_N
+(не ссылками: правка файла результата не должна менять кэш и другие
+запуски), возвращаемое значение читается из pickle, а консольный вывод
+этапа повторяется. Код модулей записи таблиц (utils.run_store) этапы
+включают в свои modules, так как от него зависит формат файлов.
+
+Промах: этап пишет файлы во временную папку внутри кэша, после чего она
+атомарно переименовывается в запись кэша. Суммарный размер кэша
+ограничен; при превышении удаляются давно не использованные записи (LRU).
+"""
+
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import fields, is_dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.console import current_stdout, redirect_stdout
+from utils.result_dir import OUTPUT_BASE
+
+CACHE_DIR = OUTPUT_BASE / "stage_cache"
+DEFAULT_MAX_MB = 512
+
+# Версия формата записей: при изменении раскладки старые записи не используются
+CACHE_FORMAT_VERSION = 1
+
+_ARTIFACTS = "artifacts"
+_RESULT = "result.pkl"
+_STDOUT = "stdout.txt"
+_META = "meta.json"
+
+
+def _update_digest(digest, obj: Any) -> None:
+    """
+    Добавляет объект в хэш: таблицы и массивы — по сырым байтам значений,
+    словари и списки — поэлементно (с учётом порядка), остальное — по repr.
+    """
+    if isinstance(obj, pd.DataFrame):
+        digest.update(b"frame")
+        _update_digest(digest, [str(col) for col in obj.columns])
+        _update_digest(digest, obj.index)
+        for col in obj.columns:
+            _update_digest(digest, obj[col].to_numpy())
+    elif isinstance(obj, pd.Series):
+        digest.update(b"series")
+        _update_digest(digest, str(obj.name))
+        _update_digest(digest, obj.index)
+        _update_digest(digest, obj.to_numpy())
+    elif isinstance(obj, pd.Index):
+        _update_digest(digest, obj.to_numpy())
+    elif isinstance(obj, np.ndarray):
+        digest.update(f"array|{obj.dtype}|{obj.shape}".encode("utf-8"))
+        if obj.dtype == object:
+            digest.update(pd.util.hash_array(obj).tobytes())
+        else:
+            digest.update(np.ascontiguousarray(obj).view(np.uint8))
+    elif is_dataclass(obj) and not isinstance(obj, type):
+        _update_digest(
+            digest,
+            [type(obj).__name__] + [(f.name, getattr(obj, f.name)) for f in fields(obj)],
+        )
+    elif isinstance(obj, dict):
+        digest.update(f"dict|{len(obj)}".encode("utf-8"))
+        for key, value in obj.items():
+            _update_digest(digest, key)
+            _update_digest(digest, value)
+    elif isinstance(obj, (list, tuple)):
+        digest.update(f"seq|{len(obj)}".encode("utf-8"))
+        for item in obj:
+            _update_digest(digest, item)
+    else:
+        digest.update(repr(obj).encode("utf-8"))
+
+
+def stage_key(
+    stage: str, data: Any = None, params: Any = None, modules: Iterable[str] = ()
+) -> str:
+    """
+    Ключ этапа: хэш имени этапа, входных данных, параметров и исходного
+    кода модулей modules (по именам; изменение кода делает старые
+    результаты недействительными).
+    """
+    digest = hashlib.sha256(f"{CACHE_FORMAT_VERSION}|{stage}".encode("utf-8"))
+    _update_digest(digest, data)
+    _update_digest(digest, params)
+    for name in modules:
+        digest.update(name.encode("utf-8"))
+        # Файл модуля ищется без импорта: ключ этапа из кэша не тянет его зависимости
+        digest.update(Path(importlib.util.find_spec(name).origin).read_bytes())
+    return digest.hexdigest()
+
+
+class _Tee(io.TextIOBase):
+    """
+    Поток, который пишет одновременно в исходный stdout и в буфер.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.buffer_text = io.StringIO()
+
+    def write(self, text: str) -> int:
+        self._stream.write(text)
+        return self.buffer_text.write(text)
+
+    def flush(self) -> None:
+        self._stream.flush()
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _copy_artifact(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    shutil.copy2(src, dst)
+
+
+class StageCache:
+    """
+    Хранилище результатов этапов с вытеснением по размеру (LRU).
+
+    enabled=False — кэш не читается и не пополняется (этапы всегда
+    выполняются). Имена этапов, взятых из кэша и посчитанных заново,
+    копятся в hits и misses.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_DIR,
+        max_mb: float = DEFAULT_MAX_MB,
+        enabled: bool = True,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024**2)
+        self.enabled = enabled
+        self.hits: list[str] = []
+        self.misses: list[str] = []
+
+    def run(
+        self,
+        stage: str,
+        run_dir: Path,
+        compute: Callable[[Path], Any],
+        data: Any = None,
+        params: Any = None,
+        modules: Iterable[str] = (),
+    ) -> Any:
+        """
+        Выполняет этап compute(папка) или берёт его результат из кэша.
+
+        compute должен писать файлы только в переданную папку и возвращать
+        сериализуемое pickle значение. Файлы этапа в любом случае
+        оказываются в run_dir.
+        """
+        if not self.enabled:
+            return compute(run_dir)
+
+        key = stage_key(stage, data, params, modules)
+        entry = self.cache_dir / key
+        if (entry / _META).exists():
+            try:
+                result = self._restore(entry, run_dir)
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                self.hits.append(stage)
+                self.evict(keep=key)
+                return result
+
+        self.misses.append(stage)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{key[:12]}.", dir=self.cache_dir))
+        try:
+            artifacts = staging / _ARTIFACTS
+            artifacts.mkdir()
+            # Вывод этапа (и только его, даже если этапы идут в потоках) копируется
+            tee = _Tee(current_stdout())
+            with redirect_stdout(tee):
+                result = compute(artifacts)
+            with open(staging / _RESULT, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            (staging / _STDOUT).write_text(tee.buffer_text.getvalue(), encoding="utf-8")
+            _write_json(
+                staging / _META,
+                {
+                    "stage": stage,
+                    "created": time.time(),
+                    "last_used": time.time(),
+                    "size": _dir_size(staging),
+                },
+            )
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # Запись с тем же ключом уже создана параллельным запуском
+                shutil.rmtree(staging, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self._copy_artifacts(entry, run_dir)
+        self.evict(keep=key)
+        return result
+
+    def _copy_artifacts(self, entry: Path, run_dir: Path) -> None:
+        artifacts = entry / _ARTIFACTS
+        for src in artifacts.rglob("*"):
+            if src.is_file():
+                _copy_artifact(src, run_dir / src.relative_to(artifacts))
+
+    def _restore(self, entry: Path, run_dir: Path) -> Any:
+        with open(entry / _RESULT, "rb") as f:
+            result = pickle.load(f)
+        self._copy_artifacts(entry, run_dir)
+        sys.stdout.write((entry / _STDOUT).read_text(encoding="utf-8"))
+
+        meta_path = entry / _META
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["last_used"] = time.time()
+        _write_json(meta_path, meta)
+        return result
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        Удаляет давно не использованные записи, пока кэш больше max_bytes.
+        Запись keep (только что использованная) не удаляется.
+        """
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            meta_path = entry / _META
+            if not meta_path.exists():
+                continue
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            entries.append((meta.get("last_used", 0.0), meta.get("size", 0), entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            if entry.name == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
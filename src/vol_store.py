@@ -0,0 +1,244 @@
+"""
+Компактное хранилище результатов GARCH по всем тикерам.
+
+Вместо словарей pd.Series (у каждого ряда — своя копия индекса) хранится
+один общий индекс дат и непрерывные матрицы T×N: условная волатильность
+и стандартизированные остатки. Матрицы лежат по столбцам (порядок F),
+поэтому ряд одного тикера — непрерывный срез без копирования, а
+последующие этапы работают сразу со всей матрицей. Ряды, начинающиеся
+позже других, дополняются NaN, а маска valid отмечает наблюдения, по
+которым оценена модель. Параметры моделей — структурный массив NumPy
+(по записи на тикер).
+
+Хранилище сохраняется в папку из файлов .npy и читается через
+np.load(mmap_mode="r"), то есть без чтения матриц целиком; так же
+(from_run_store) оно читается из архива запуска result_N.zip.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from garch_batch import PARAM_NAMES
+
+if TYPE_CHECKING:
+    from garch_analysis import GarchFit
+    from utils.run_store import RunStore
+
+# Версия формата папки: при изменении раскладки старые папки не читаются
+STORE_FORMAT_VERSION = 1
+
+STORE_FIELDS = ("cond_vol", "std_resid")
+
+# Запись параметров одной модели
+PARAM_DTYPE = np.dtype(
+    [(name, np.float64) for name in PARAM_NAMES]
+    + [("loglikelihood", np.float64), ("convergence_flag", np.int32)]
+)
+
+_ARRAYS = STORE_FIELDS + ("valid", "params", "index")
+_META = "meta.json"
+
+
+@dataclass
+class VolatilityStore:
+    """
+    Условная волатильность и стандартизированные остатки GARCH (T×N)
+    с общим индексом дат, маской наблюдений и параметрами моделей.
+    """
+
+    index: pd.DatetimeIndex
+    tickers: List[str]
+    cond_vol: np.ndarray
+    std_resid: np.ndarray
+    valid: np.ndarray
+    params: np.ndarray
+    # Границы наблюдений каждого тикера: строки [starts[j], stops[j])
+    starts: np.ndarray = field(init=False, repr=False)
+    stops: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        n_obs = self.valid.shape[0]
+        has_any = self.valid.any(axis=0)
+        self.starts = np.where(has_any, self.valid.argmax(axis=0), 0)
+        self.stops = np.where(has_any, n_obs - self.valid[::-1].argmax(axis=0), 0)
+        self._columns = {ticker: j for j, ticker in enumerate(self.tickers)}
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._columns
+
+    def __getstate__(self) -> dict:
+        # Матрицы, прочитанные через mmap, попадают в pickle как обычные массивы
+        state = {"index": self.index, "tickers": self.tickers}
+        for name in STORE_FIELDS + ("valid", "params"):
+            state[name] = np.asarray(getattr(self, name))
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.__post_init__()
+
+    @classmethod
+    def empty(cls) -> "VolatilityStore":
+        return cls(
+            index=pd.DatetimeIndex([]),
+            tickers=[],
+            cond_vol=np.empty((0, 0)),
+            std_resid=np.empty((0, 0)),
+            valid=np.empty((0, 0), dtype=bool),
+            params=np.empty(0, dtype=PARAM_DTYPE),
+        )
+
+    @classmethod
+    def from_fits(cls, fits: Dict[str, "GarchFit"]) -> "VolatilityStore":
+        """
+        Собирает хранилище из оценок по тикерам. Общий индекс — объединение
+        дат всех рядов (обычно ряды и так на одном индексе).
+        """
+        if not fits:
+            return cls.empty()
+        indexes = [fit.cond_vol.index for fit in fits.values()]
+        index = indexes[0]
+        if not all(idx.equals(index) for idx in indexes[1:]):
+            index = np.unique(np.concatenate([idx.to_numpy() for idx in indexes]))
+        index = pd.DatetimeIndex(index)
+
+        shape = (len(index), len(fits))
+        cond_vol = np.full(shape, np.nan, order="F")
+        std_resid = np.full(shape, np.nan, order="F")
+        valid = np.zeros(shape, dtype=bool, order="F")
+        params = np.zeros(len(fits), dtype=PARAM_DTYPE)
+        for j, fit in enumerate(fits.values()):
+            for target, series in ((cond_vol, fit.cond_vol), (std_resid, fit.std_resid)):
+                rows = (
+                    slice(None)
+                    if series.index.equals(index)
+                    else index.get_indexer(series.index)
+                )
+                target[rows, j] = series.to_numpy(dtype=np.float64)
+            valid[:, j] = ~np.isnan(cond_vol[:, j])
+            for name in PARAM_NAMES:
+                params[name][j] = fit.params[name]
+            params["loglikelihood"][j] = fit.loglikelihood
+            params["convergence_flag"][j] = fit.convergence_flag
+
+        return cls(
+            index=index,
+            tickers=list(fits),
+            cond_vol=cond_vol,
+            std_resid=std_resid,
+            valid=valid,
+            params=params,
+        )
+
+    def column(self, ticker: str) -> int:
+        """
+        Номер столбца тикера.
+        """
+        return self._columns[ticker]
+
+    def values(self, ticker: str, name: str = "cond_vol") -> np.ndarray:
+        """
+        Ряд name ("cond_vol" или "std_resid") тикера от первого до последнего
+        наблюдения — срез матрицы без копирования.
+        """
+        if name not in STORE_FIELDS:
+            raise ValueError(f"Неизвестный ряд: {name!r}")
+        j = self.column(ticker)
+        return getattr(self, name)[self.starts[j] : self.stops[j], j]
+
+    def series(self, ticker: str, name: str = "cond_vol") -> pd.Series:
+        """
+        Ряд тикера как pd.Series над тем же срезом (без копирования значений).
+        """
+        j = self.column(ticker)
+        return pd.Series(
+            self.values(ticker, name),
+            index=self.index[self.starts[j] : self.stops[j]],
+            name=ticker,
+            copy=False,
+        )
+
+    def frame(self, name: str = "cond_vol") -> pd.DataFrame:
+        """
+        Вся матрица name как DataFrame (даты × тикеры).
+        """
+        if name not in STORE_FIELDS:
+            raise ValueError(f"Неизвестный ряд: {name!r}")
+        return pd.DataFrame(
+            getattr(self, name), index=self.index, columns=self.tickers, copy=False
+        )
+
+    def mean_volatility(self) -> pd.Series:
+        """
+        Средняя условная волатильность по каждому тикеру (по наблюдениям маски).
+        """
+        counts = self.valid.sum(axis=0)
+        totals = np.where(self.valid, self.cond_vol, 0.0).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return pd.Series(totals / counts, index=self.tickers, dtype=np.float64)
+
+    def params_frame(self) -> pd.DataFrame:
+        """
+        Параметры моделей как DataFrame (тикеры × поля).
+        """
+        return pd.DataFrame(self.params, index=pd.Index(self.tickers, name="Тикер"))
+
+    def save(self, path: Path) -> Path:
+        """
+        Сохраняет хранилище в папку path (массивы .npy и meta.json).
+        """
+        path.mkdir(parents=True, exist_ok=True)
+        for name in _ARRAYS:
+            array = self.index.to_numpy() if name == "index" else getattr(self, name)
+            # Запись во временный файл и атомарная подмена, как в кэше цен
+            tmp_path = path / f"{name}.tmp.npy"
+            np.save(tmp_path, np.asarray(array))
+            os.replace(tmp_path, path / f"{name}.npy")
+        meta = {"format_version": STORE_FORMAT_VERSION, "tickers": list(self.tickers)}
+        with open(path / _META, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "VolatilityStore":
+        """
+        Читает хранилище из папки path; при mmap=True матрицы
+        отображаются в память, а не читаются целиком.
+        """
+        with open(path / _META, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемый формат хранилища в {path}")
+        mmap_mode = "r" if mmap else None
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in _ARRAYS}
+        return cls._from_arrays(meta, arrays)
+
+    @classmethod
+    def from_run_store(cls, run: "RunStore", prefix: str, mmap: bool = True) -> "VolatilityStore":
+        """
+        Читает хранилище, упакованное в архив запуска (utils/run_store.py)
+        из папки prefix; матрицы отображаются в память прямо из архива.
+        """
+        meta = json.loads(run.read_file(f"{prefix}/{_META}"))
+        if meta.get("format_version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемый формат хранилища в {run.path}")
+        arrays = {name: run.array(f"{prefix}/{name}", mmap=mmap) for name in _ARRAYS}
+        return cls._from_arrays(meta, arrays)
+
+    @classmethod
+    def _from_arrays(cls, meta: dict, arrays: Dict[str, np.ndarray]) -> "VolatilityStore":
+        return cls(
+            index=pd.DatetimeIndex(np.asarray(arrays.pop("index"))),
+            tickers=meta["tickers"],
+            **arrays,
+        )
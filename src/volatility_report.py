@@ -3,19 +3,25 @@
 """
 
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Union
 
 import pandas as pd
 
 from data_loader import START_DATE
+from utils.run_store import save_csv
 
 
-def build_volatility_ranking(volatility_results: Dict[str, float]) -> pd.DataFrame:
+def build_volatility_ranking(
+    volatility_results: Union[Dict[str, float], pd.Series],
+) -> pd.DataFrame:
     """
     Формирует DataFrame с ранжировкой по средней волатильности и категориями.
+
+    volatility_results — средние волатильности по тикерам (словарь или
+    pd.Series, например VolatilityStore.mean_volatility()).
     """
-    vol_df = pd.DataFrame.from_dict(
-        volatility_results, orient="index", columns=["Средняя волатильность (%)"]
+    vol_df = pd.Series(volatility_results, dtype="float64").to_frame(
+        "Средняя волатильность (%)"
     )
     vol_df.sort_values("Средняя волатильность (%)", ascending=False, inplace=True)
 
@@ -37,9 +43,8 @@ def save_and_print_ranking(vol_df: pd.DataFrame, run_dir: Path) -> None:
     print(vol_df)
 
     csv_path = run_dir / "ранжирование_по_волатильности_GARCH.csv"
-    vol_df.to_csv(csv_path, encoding="utf-8-sig")
+    save_csv(vol_df, csv_path)
     print(f"\nРезультаты сохранены в папке: {run_dir}")
-    print("  — графики: волатильность_GARCH_<тикер>.png")
     print(f"  — ранжировка: {csv_path.name}")
 
 
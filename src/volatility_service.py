@@ -0,0 +1,618 @@
+"""
+Постоянно работающий сервис прогнозов волатильности.
+
+Вместо запуска пакетного скрипта и чтения CSV из output/result_N сервис
+один раз загружает цены и держит оценённые модели GARCH(1,1) по тикерам
+в памяти — в LRU-кэше с ограничением по числу моделей и по объёму.
+Для тикера из кэша прогноз на h шагов считается по явной формуле из
+параметров и последних дисперсии и остатка, без обращения к диску.
+
+Модели берутся из состояния garch_state (output/garch_state): при промахе
+кэша тикеры, недостающие в запросе, загружаются или оцениваются одним
+вызовом update_garch_models, так что сервис и запуск с --incremental
+пользуются одним и тем же сохранённым состоянием.
+
+Фоновый поток следит за временем изменения файла цен; при изменении
+данные перечитываются, а модели в кэше дообновляются новыми строками
+(или переоцениваются — по тем же правилам, что и в --incremental).
+
+API (JSON, локальный HTTP или Unix-сокет):
+- GET  /forecast?tickers=SBER,VTBR&h=5 — прогноз волатильности на 1..h дней;
+- GET  /ranking — ранжировка и категории (build_volatility_ranking);
+- POST /batch — несколько запросов за раз: {"requests": [{"op": "forecast",
+  "tickers": [...], "h": 5}, {"op": "ranking"}]};
+- POST /refresh — перечитать данные, не дожидаясь фоновой проверки;
+- GET  /health — состояние сервиса и кэша.
+
+Запуск: python src/volatility_service.py --port 8765
+(или --unix-socket /tmp/volatility.sock).
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATA_DIR, EXCEL_FILENAME, START_DATE, load_price_source, price_source_id
+from garch_analysis import GARCH_BACKENDS, GarchFit, compute_log_returns
+from garch_batch import PARAM_NAMES
+from garch_state import STATE_DIR, update_garch_models
+from volatility_report import build_volatility_ranking
+
+warnings.filterwarnings("ignore")
+
+DEFAULT_PORT = 8765
+# Наибольший горизонт прогноза, дней
+MAX_HORIZON = 250
+
+
+@dataclass
+class ModelEntry:
+    """
+    Модель GARCH(1,1) одного тикера в кэше сервиса.
+    """
+
+    ticker: str
+    # mu, omega, alpha[1], beta[1] — в порядке PARAM_NAMES
+    params: np.ndarray
+    last_sigma2: float
+    last_resid: float
+    # Условная волатильность (%) по всей истории — для средней и последнего значения
+    cond_vol: np.ndarray
+    mean_vol: float
+    watermark: str
+
+    @classmethod
+    def from_fit(cls, fit: GarchFit, last_return: float) -> "ModelEntry":
+        cond_vol = np.array(fit.cond_vol, dtype=np.float64)
+        return cls(
+            ticker=fit.ticker,
+            params=np.array([fit.params[name] for name in PARAM_NAMES]),
+            last_sigma2=float(cond_vol[-1] ** 2),
+            last_resid=float(last_return - fit.params["mu"]),
+            cond_vol=cond_vol,
+            mean_vol=float(np.nanmean(cond_vol)),
+            watermark=fit.cond_vol.index[-1].isoformat(),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.cond_vol.nbytes + self.params.nbytes
+
+    def forecast(self, horizon: int) -> np.ndarray:
+        """
+        Прогноз условной волатильности (%) на 1..horizon шагов вперёд:
+        σ²(1) = ω + α·ε²(T) + β·σ²(T), далее σ²(k) = ω + (α+β)·σ²(k−1).
+        """
+        _, omega, alpha, beta = self.params
+        first = omega + alpha * self.last_resid**2 + beta * self.last_sigma2
+        # σ²(k) = ω·(1 + p + … + p^(k−2)) + p^(k−1)·σ²(1), p = α+β
+        powers = (alpha + beta) ** np.arange(horizon)
+        geometric = np.concatenate(([0.0], np.cumsum(powers[:-1])))
+        return np.sqrt(omega * geometric + powers * first)
+
+
+class ModelCache:
+    """
+    LRU-кэш моделей по тикерам с ограничением по числу записей и объёму.
+
+    Самая давно не использованная модель вытесняется, когда превышен
+    любой из пределов (последняя добавленная модель остаётся всегда).
+    """
+
+    def __init__(self, max_entries: int = 1000, max_mb: float = 256.0):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024**2)
+        self._entries: "OrderedDict[str, ModelEntry]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def tickers(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, ticker: str) -> Optional[ModelEntry]:
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(ticker)
+            self.hits += 1
+            return entry
+
+    def put(self, entry: ModelEntry) -> None:
+        with self._lock:
+            old = self._entries.pop(entry.ticker, None)
+            if old is not None:
+                self._nbytes -= old.nbytes
+            self._entries[entry.ticker] = entry
+            self._nbytes += entry.nbytes
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self._nbytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+                self.evictions += 1
+
+
+class ServiceError(Exception):
+    """
+    Ошибка запроса к сервису (возвращается клиенту с HTTP-статусом).
+    """
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class VolatilityService:
+    """
+    Данные, кэш моделей и обработка запросов (без сетевой части).
+    """
+
+    def __init__(
+        self,
+        prices_path: Optional[Path] = None,
+        tickers: Optional[Sequence[str]] = None,
+        start: Optional[str] = START_DATE,
+        end: Optional[str] = None,
+        state_dir: Path = STATE_DIR,
+        cache: Optional[ModelCache] = None,
+        refit_every: int = 20,
+        drift_alpha: float = 0.01,
+        backend: str = "arch",
+    ):
+        self.prices_path = prices_path
+        self.source_path = DATA_DIR / EXCEL_FILENAME if prices_path is None else Path(prices_path)
+        self.tickers_filter = list(tickers) if tickers else None
+        self.start = start
+        self.end = end
+        self.state_dir = state_dir
+        self.cache = cache if cache is not None else ModelCache()
+        self.refit_every = refit_every
+        self.drift_alpha = drift_alpha
+        self.backend = backend
+
+        # Модели оцениваются под этой блокировкой: параллельные промахи по
+        # одному тикеру не запускают оценку дважды
+        self._fit_lock = threading.Lock()
+        # Ранжировка пересчитывается только после обновления данных
+        self._ranking: Optional[Tuple[int, dict]] = None
+        self.generation = 0
+        self.refreshed_at = 0.0
+        self.log_returns = pd.DataFrame()
+        self._source_mtime = 0.0
+        self.reload()
+
+    # === Данные и модели ===
+
+    def _read_returns(self) -> pd.DataFrame:
+        prices = load_price_source(
+            self.prices_path, tickers=self.tickers_filter, start=self.start, end=self.end
+        )
+        return compute_log_returns(prices)
+
+    def _update_models(
+        self, tickers: Iterable[str]
+    ) -> Tuple[Dict[str, ModelEntry], Dict[str, str]]:
+        """
+        Загружает или оценивает модели тикеров (одним вызовом
+        update_garch_models) и кладёт их в кэш. Возвращает модели и ошибки
+        по тикерам.
+        """
+        tickers = [t for t in tickers if t in self.log_returns.columns]
+        if not tickers:
+            return {}, {}
+        log_returns = self.log_returns[tickers]
+        fits, errors, _ = update_garch_models(
+            log_returns,
+            state_dir=self.state_dir,
+            refit_every=self.refit_every,
+            drift_alpha=self.drift_alpha,
+            backend=self.backend,
+            source=price_source_id(self.prices_path, start=self.start),
+        )
+        entries: Dict[str, ModelEntry] = {}
+        for ticker, fit in fits.items():
+            last_return = float(log_returns[ticker].dropna().iloc[-1]) * 100  # в процентах
+            entries[ticker] = ModelEntry.from_fit(fit, last_return)
+            self.cache.put(entries[ticker])
+        return entries, {ticker: f"{e.error_type}: {e.message}" for ticker, e in errors.items()}
+
+    def reload(self) -> bool:
+        """
+        Перечитывает данные, если файл цен изменился, и дообновляет модели
+        тикеров, находящихся в кэше. Возвращает True, если данные обновлены.
+        """
+        mtime = os.stat(self.source_path).st_mtime
+        if mtime == self._source_mtime:
+            return False
+        log_returns = self._read_returns()
+        with self._fit_lock:
+            self.log_returns = log_returns
+            self._update_models(self.cache.tickers())
+            self._source_mtime = mtime
+            self.generation += 1
+            self.refreshed_at = time.time()
+        return True
+
+    def models(self, tickers: Sequence[str]) -> Tuple[Dict[str, ModelEntry], Dict[str, str]]:
+        """
+        Модели тикеров: из кэша, а недостающие — одним пакетом через
+        update_garch_models.
+        """
+        unknown = [t for t in tickers if t not in self.log_returns.columns]
+        if unknown:
+            raise ServiceError(f"Нет данных по тикерам: {', '.join(unknown)}", status=404)
+        entries: Dict[str, ModelEntry] = {}
+        missing: List[str] = []
+        for ticker in tickers:
+            entry = self.cache.get(ticker)
+            if entry is None:
+                missing.append(ticker)
+            else:
+                entries[ticker] = entry
+
+        errors: Dict[str, str] = {}
+        if missing:
+            with self._fit_lock:
+                # Пока ждали блокировку, модели могли загрузить другие запросы
+                still_missing = []
+                for ticker in missing:
+                    entry = self.cache.get(ticker)
+                    if entry is None:
+                        still_missing.append(ticker)
+                    else:
+                        entries[ticker] = entry
+                # Модели берутся из результата, а не из кэша: при малом кэше
+                # часть из них уже могла быть вытеснена
+                loaded, errors = self._update_models(still_missing)
+            entries.update(loaded)
+        return {t: entries[t] for t in tickers if t in entries}, errors
+
+    # === Запросы ===
+
+    def forecast(self, tickers: Sequence[str], horizon: int = 1) -> dict:
+        """
+        Прогноз условной волатильности (% в день) на 1..horizon дней.
+        """
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise ServiceError(f"Горизонт должен быть от 1 до {MAX_HORIZON}")
+        if not tickers:
+            raise ServiceError("Не заданы тикеры")
+        entries, errors = self.models(tickers)
+        results = {
+            ticker: {
+                "last_volatility": float(entry.cond_vol[-1]),
+                "forecast": entry.forecast(horizon).tolist(),
+                "watermark": entry.watermark,
+            }
+            for ticker, entry in entries.items()
+        }
+        return {"horizon": horizon, "results": results, "errors": errors}
+
+    def ranking(self) -> dict:
+        """
+        Ранжировка всех тикеров по средней условной волатильности с категориями.
+        """
+        generation = self.generation
+        if self._ranking is not None and self._ranking[0] == generation:
+            return self._ranking[1]
+        entries, errors = self.models(list(self.log_returns.columns))
+        vol_df = build_volatility_ranking(
+            pd.Series({ticker: entry.mean_vol for ticker, entry in entries.items()})
+        )
+        result = {
+            "ranking": [
+                {"ticker": ticker, "mean_volatility": float(row.iloc[0]), "category": str(row.iloc[1])}
+                for ticker, row in vol_df.iterrows()
+            ],
+            "errors": errors,
+        }
+        self._ranking = (generation, result)
+        return result
+
+    def batch(self, requests: Sequence[dict]) -> dict:
+        """
+        Несколько запросов за раз; недостающие модели всех запросов
+        загружаются одним пакетом.
+        """
+        if not isinstance(requests, list):
+            raise ServiceError("Ожидается {\"requests\": [...]}")
+        forecasts = [r for r in requests if isinstance(r, dict) and r.get("op") == "forecast"]
+        for request in forecasts:
+            # Строка "SBER" вместо ["SBER"] разобралась бы по символам
+            tickers = request.get("tickers", [])
+            if not isinstance(tickers, list) or not all(isinstance(t, str) for t in tickers):
+                raise ServiceError("Ожидается \"tickers\": [\"тикер\", ...] — список строк")
+        wanted = {ticker for request in forecasts for ticker in request.get("tickers", [])}
+        known = [t for t in wanted if t in self.log_returns.columns]
+        if known:
+            self.models(known)
+
+        responses = []
+        for request in requests:
+            try:
+                if not isinstance(request, dict):
+                    raise ServiceError("Запрос должен быть объектом")
+                op = request.get("op")
+                if op == "forecast":
+                    responses.append(
+                        self.forecast(list(request.get("tickers", [])), int(request.get("h", 1)))
+                    )
+                elif op == "ranking":
+                    responses.append(self.ranking())
+                else:
+                    raise ServiceError(f"Неизвестная операция: {op!r}")
+            except (ServiceError, ValueError, TypeError) as exc:
+                responses.append({"error": str(exc)})
+        return {"responses": responses}
+
+    def health(self) -> dict:
+        return {
+            "tickers": len(self.log_returns.columns),
+            "observations": len(self.log_returns),
+            "last_date": (
+                self.log_returns.index[-1].isoformat() if len(self.log_returns) else None
+            ),
+            "generation": self.generation,
+            "refreshed_at": self.refreshed_at,
+            "cache": {
+                "models": len(self.cache),
+                "mb": self.cache.nbytes / 1024**2,
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+                "evictions": self.cache.evictions,
+            },
+        }
+
+
+def _refresh_loop(service: VolatilityService, interval: float, stop: threading.Event) -> None:
+    """
+    Фоновая проверка файла цен: при изменении данные и модели обновляются.
+    """
+    while not stop.wait(interval):
+        try:
+            if service.reload():
+                print(f"  — данные обновлены ({service.health()['last_date']})", flush=True)
+        except Exception as exc:  # noqa: BLE001 — сервис продолжает работать на прежних данных
+            print(f"  — ошибка обновления данных: {exc}", file=sys.stderr, flush=True)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    HTTP-обработчик запросов к VolatilityService (server.service).
+    """
+
+    # Соединение не закрывается после ответа — без повторного рукопожатия
+    protocol_version = "HTTP/1.1"
+    # Без алгоритма Нейгла заголовки и тело ответа уходят сразу (TCP_NODELAY)
+    disable_nagle_algorithm = True
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method: str) -> None:
+        service: VolatilityService = self.server.service
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if method == "GET" and url.path == "/forecast":
+                tickers = [t for t in query.get("tickers", "").split(",") if t]
+                payload = service.forecast(tickers, int(query.get("h", 1)))
+            elif method == "GET" and url.path == "/ranking":
+                payload = service.ranking()
+            elif method == "GET" and url.path == "/health":
+                payload = service.health()
+            elif method == "POST" and url.path == "/batch":
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                payload = service.batch(body.get("requests"))
+            elif method == "POST" and url.path == "/refresh":
+                length = int(self.headers.get("Content-Length", 0))
+                self.rfile.read(length)
+                payload = {"updated": service.reload(), **service.health()}
+            else:
+                raise ServiceError(f"Нет такого метода: {method} {url.path}", status=404)
+        except ServiceError as exc:
+            self._send(exc.status, {"error": str(exc)})
+            return
+        except (ValueError, TypeError, AttributeError) as exc:
+            self._send(400, {"error": str(exc)})
+            return
+        self._send(200, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def address_string(self) -> str:
+        # У Unix-сокета адрес клиента — пустая строка
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        # Журнал каждого запроса замедлил бы ответы; ошибки видны клиенту
+        pass
+
+
+class UnixServiceHandler(ServiceHandler):
+    # TCP_NODELAY к Unix-сокету неприменим
+    disable_nagle_algorithm = False
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP-сервер на Unix-сокете (каждое соединение — в своём потоке).
+    """
+
+    daemon_threads = True
+
+
+def serve(
+    service: VolatilityService,
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    unix_socket: Optional[Path] = None,
+    poll_interval: float = 60.0,
+) -> None:
+    """
+    Запускает сервер и фоновую проверку данных; работает до Ctrl+C.
+    """
+    if unix_socket is not None:
+        if unix_socket.exists():
+            unix_socket.unlink()
+        server = UnixHTTPServer(str(unix_socket), UnixServiceHandler)
+        address = f"unix:{unix_socket}"
+    else:
+        server = ThreadingHTTPServer((host, port), ServiceHandler)
+        address = f"http://{host}:{server.server_address[1]}"
+    server.service = service
+
+    stop = threading.Event()
+    refresher = threading.Thread(
+        target=_refresh_loop, args=(service, poll_interval, stop), daemon=True
+    )
+    refresher.start()
+    print(f"Сервис прогнозов волатильности: {address}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        if unix_socket is not None and unix_socket.exists():
+            unix_socket.unlink()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Сервис прогнозов волатильности (GARCH)")
+    parser.add_argument(
+        "--prices",
+        type=Path,
+        default=None,
+        help="файл цен CSV, Parquet или Excel (по умолчанию — лист ALL из data/)",
+    )
+    parser.add_argument(
+        "--tickers",
+        default=None,
+        help="тикеры через запятую (по умолчанию — все столбцы источника)",
+    )
+    parser.add_argument(
+        "--start",
+        default=START_DATE,
+        help=f"начальная дата периода (по умолчанию {START_DATE})",
+    )
+    parser.add_argument("--end", default=None, help="конечная дата периода включительно")
+    parser.add_argument("--host", default="127.0.0.1", help="адрес (по умолчанию 127.0.0.1)")
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help=f"порт (по умолчанию {DEFAULT_PORT})"
+    )
+    parser.add_argument(
+        "--unix-socket",
+        type=Path,
+        default=None,
+        help="слушать Unix-сокет по этому пути вместо TCP-порта",
+    )
+    parser.add_argument(
+        "--cache-models",
+        type=int,
+        default=1000,
+        help="наибольшее число моделей в кэше (по умолчанию 1000)",
+    )
+    parser.add_argument(
+        "--cache-mb",
+        type=float,
+        default=256.0,
+        help="предельный объём кэша моделей в МБ (по умолчанию 256)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=60.0,
+        help="как часто проверять изменение файла цен, с (по умолчанию 60)",
+    )
+    parser.add_argument(
+        "--garch-backend",
+        choices=GARCH_BACKENDS,
+        default="arch",
+        help="способ оценки GARCH при промахе кэша: arch или batch",
+    )
+    parser.add_argument(
+        "--refit-every",
+        type=int,
+        default=20,
+        help="полная переоценка модели каждые N новых строк (по умолчанию 20)",
+    )
+    parser.add_argument(
+        "--drift-alpha",
+        type=float,
+        default=0.01,
+        help="уровень проверки дрейфа для переоценки (по умолчанию 0.01)",
+    )
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="оценить модели всех тикеров до начала приёма запросов",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = VolatilityService(
+        prices_path=args.prices,
+        tickers=args.tickers.split(",") if args.tickers else None,
+        start=args.start,
+        end=args.end,
+        cache=ModelCache(max_entries=args.cache_models, max_mb=args.cache_mb),
+        refit_every=args.refit_every,
+        drift_alpha=args.drift_alpha,
+        backend=args.garch_backend,
+    )
+    if args.preload:
+        _, errors = service.models(list(service.log_returns.columns))
+        for ticker, message in errors.items():
+            print(f"  — {ticker}: {message}")
+    serve(
+        service,
+        host=args.host,
+        port=args.port,
+        unix_socket=args.unix_socket,
+        poll_interval=args.poll_interval,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,108 @@
 """
-Функции для проверки белошумности остатков GARCH и их графического анализа.
+Функции для проверки белошумности остатков GARCH и описания их графиков.
+
+Остатки берутся из хранилища VolatilityStore (столбцы матрицы T×N без
+копирования). Автокорреляции остатков всех тикеров считаются один раз
+(acf_kernel.py, через БПФ по матрице остатков) и используются и в
+портманто-тестах, и для графиков ACF с доверительной полосой.
 """
 
+from dataclasses import dataclass
 from pathlib import Path
+from typing import List, Optional, Sequence, Union
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-from statsmodels.graphics.tsaplots import plot_acf
-from statsmodels.stats.diagnostic import acorr_ljungbox
+
+from acf_kernel import acf_fft, bartlett_band, portmanteau_tests
+from render import PlotJob, PlotLine, series_line
+from utils.run_store import save_csv
+from vol_store import VolatilityStore
+
+
+@dataclass
+class ResidualAcf:
+    """
+    Автокорреляции стандартизированных остатков по тикерам (лаги 0..max_lag).
+
+    acf и acf_squared — матрицы (max_lag + 1)×N; acf_squared (для квадратов
+    остатков) считается только по запросу.
+    """
+
+    tickers: List[str]
+    nobs: np.ndarray
+    acf: np.ndarray
+    acf_squared: Optional[np.ndarray] = None
+
+    @property
+    def max_lag(self) -> int:
+        return self.acf.shape[0] - 1
+
+
+def _residuals(store: VolatilityStore, ticker: str) -> np.ndarray:
+    # Срез матрицы без копирования; пропуски внутри ряда (если есть) убираются
+    values = store.values(ticker, "std_resid")
+    nan_mask = np.isnan(values)
+    return values[~nan_mask] if nan_mask.any() else values
+
+
+def compute_residual_acf(
+    store: VolatilityStore, max_lag: int = 20, squared: bool = False
+) -> ResidualAcf:
+    """
+    Считает ACF стандартизированных остатков всех тикеров одним БПФ.
+    При squared=True в тот же расчёт добавляются квадраты остатков.
+    """
+    series = {ticker: _residuals(store, ticker) for ticker in store.tickers}
+    series = {ticker: values for ticker, values in series.items() if values.size}
+    columns = list(series.values())
+    if squared:
+        columns += [values**2 for values in series.values()]
+    if not columns:
+        return ResidualAcf(
+            tickers=[], nobs=np.empty(0, dtype=np.int64), acf=np.empty((max_lag + 1, 0))
+        )
+
+    acf, nobs = acf_fft(columns, max_lag)
+    n = len(series)
+    return ResidualAcf(
+        tickers=list(series),
+        nobs=nobs[:n],
+        acf=acf[:, :n],
+        acf_squared=acf[:, n:] if squared else None,
+    )
+
+
+def _ensure_acf(
+    store: VolatilityStore,
+    resid_acf: Optional[ResidualAcf],
+    max_lag: int,
+    squared: bool = False,
+) -> ResidualAcf:
+    # Пересчитываем, только если готовых автокорреляций не хватает
+    if (
+        resid_acf is None
+        or resid_acf.max_lag < max_lag
+        or (squared and resid_acf.acf_squared is None)
+    ):
+        return compute_residual_acf(store, max_lag=max_lag, squared=squared)
+    return resid_acf
+
+
+def _conclusion(p_value: float, rejected: str, accepted: str) -> str:
+    # NaN — ряд короче лага: тест не выполнен
+    if np.isnan(p_value):
+        return "Недостаточно наблюдений"
+    return rejected if p_value < 0.05 else accepted
 
 
 def run_white_noise_tests_for_garch_residuals(
-    std_resid_dict: dict[str, pd.Series], run_dir: Path, lag: int = 20
-) -> None:
+    store: VolatilityStore,
+    run_dir: Path,
+    lag: Union[int, Sequence[int]] = 20,
+    resid_acf: Optional[ResidualAcf] = None,
+    squared: bool = False,
+) -> Optional[ResidualAcf]:
     """
     Проверяет белошумность СТАНДАРТИЗИРОВАННЫХ остатков GARCH-моделей
     с помощью портманто-тестов Бокса–Пирса и Бокса–Льюнга.
@@ -22,51 +112,55 @@ def run_white_noise_tests_for_garch_residuals(
     - H1: остатки не белый шум (есть автокорреляция).
 
     Если p-значение < 0.05, отвергаем H0 и считаем, что остатки НЕ белый шум.
-    """
-    results: list[dict[str, float | str | int]] = []
 
-    for ticker, std_resid in std_resid_dict.items():
-        series = pd.Series(std_resid).dropna()
-        if series.empty:
-            continue
-
-        # Тесты Бокса–Пирса и Бокса–Льюнга на один лаг (например, 20)
-        ljung_res = acorr_ljungbox(series, lags=[lag], return_df=True, boxpierce=True)
-        row = ljung_res.iloc[0]
-
-        results.append(
-            {
-                "Тикер": ticker,
-                "Лаг": lag,
-                "Box-Pierce статистика": row["bp_stat"],
-                "Box-Pierce p-значение": row["bp_pvalue"],
-                "Box-Ljung статистика": row["lb_stat"],
-                "Box-Ljung p-значение": row["lb_pvalue"],
-                "Вывод (Box-Pierce)": (
-                    "Не белый шум (отвергаем H0)"
-                    if row["bp_pvalue"] < 0.05
-                    else "Белый шум (не отвергаем H0)"
-                ),
-                "Вывод (Box-Ljung)": (
-                    "Не белый шум (отвергаем H0)"
-                    if row["lb_pvalue"] < 0.05
-                    else "Белый шум (не отвергаем H0)"
-                ),
-            }
-        )
+    lag — один лаг или набор лагов не меньше 1 (строка результата на каждую
+    пару тикер–лаг); ряды короче лага получают вывод «Недостаточно наблюдений».
+    Тесты считаются по готовым автокорреляциям resid_acf (если их не хватает —
+    по новому расчёту), которые возвращаются для графиков ACF. При
+    squared=True те же тесты проводятся для квадратов остатков (тест
+    Маклеода–Ли на оставшийся ARCH-эффект) и сохраняются в отдельный CSV.
+    """
+    # Скаляр любого целого типа (в т.ч. np.int64 из массива) — один лаг
+    lags = [int(lag)] if np.ndim(lag) == 0 else sorted({int(h) for h in lag})
+    if not lags or lags[0] < 1:
+        raise ValueError(f"Лаги тестов должны быть не меньше 1: {lags}")
+    resid_acf = _ensure_acf(store, resid_acf, max(lags), squared)
 
-    if not results:
+    if not resid_acf.tickers:
         print(
             "Не удалось выполнить тесты Бокса–Пирса и Бокса–Льюнга: нет остатков GARCH."
         )
-        return
+        return None
+
+    tests = portmanteau_tests(resid_acf.acf, resid_acf.nobs, lags)
+    results: list[dict[str, float | str | int]] = []
+    for j, ticker in enumerate(resid_acf.tickers):
+        for i, h in enumerate(lags):
+            bp_pvalue = tests["bp_pvalue"][i, j]
+            lb_pvalue = tests["lb_pvalue"][i, j]
+            results.append(
+                {
+                    "Тикер": ticker,
+                    "Лаг": h,
+                    "Box-Pierce статистика": tests["bp_stat"][i, j],
+                    "Box-Pierce p-значение": bp_pvalue,
+                    "Box-Ljung статистика": tests["lb_stat"][i, j],
+                    "Box-Ljung p-значение": lb_pvalue,
+                    "Вывод (Box-Pierce)": _conclusion(
+                        bp_pvalue, "Не белый шум (отвергаем H0)", "Белый шум (не отвергаем H0)"
+                    ),
+                    "Вывод (Box-Ljung)": _conclusion(
+                        lb_pvalue, "Не белый шум (отвергаем H0)", "Белый шум (не отвергаем H0)"
+                    ),
+                }
+            )
 
     wn_df = pd.DataFrame(results)
     wn_csv_path = (
         run_dir
         / "результаты_тестов_Бокса-Пирса_и_Бокса-Льюнга_для_белого_шума_GARCH_остатков.csv"
     )
-    wn_df.to_csv(wn_csv_path, encoding="utf-8-sig", index=False)
+    save_csv(wn_df, wn_csv_path, index=False)
 
     print(
         "\nТесты Бокса–Пирса и Бокса–Льюнга для СТАНДАРТИЗИРОВАННЫХ остатков GARCH(1,1):"
@@ -76,44 +170,92 @@ def run_white_noise_tests_for_garch_residuals(
         f"\nПолные результаты тестов белошумности сохранены в файле: {wn_csv_path.name}"
     )
 
+    if squared:
+        _run_squared_residual_tests(resid_acf, lags, run_dir)
+    return resid_acf
+
 
-def plot_white_noise_diagnostics(
-    std_resid_dict: dict[str, pd.Series], run_dir: Path, max_lag: int = 20
+def _run_squared_residual_tests(
+    resid_acf: ResidualAcf, lags: List[int], run_dir: Path
 ) -> None:
     """
-    Строит графики для визуальной проверки белошумности стандартизированных остатков GARCH.
+    Тест Маклеода–Ли: Бокс–Льюнг для КВАДРАТОВ стандартизированных остатков.
 
-    Для каждого тикера сохраняются:
+    - H0: в квадратах остатков нет автокорреляции (модель учла ARCH-эффект).
+    - H1: остался ARCH-эффект.
+    """
+    tests = portmanteau_tests(resid_acf.acf_squared, resid_acf.nobs, lags)
+    results: list[dict[str, float | str | int]] = []
+    for j, ticker in enumerate(resid_acf.tickers):
+        for i, h in enumerate(lags):
+            lb_pvalue = tests["lb_pvalue"][i, j]
+            results.append(
+                {
+                    "Тикер": ticker,
+                    "Лаг": h,
+                    "McLeod-Li статистика": tests["lb_stat"][i, j],
+                    "McLeod-Li p-значение": lb_pvalue,
+                    "Вывод": _conclusion(
+                        lb_pvalue,
+                        "Остался ARCH-эффект (отвергаем H0)",
+                        "Нет ARCH-эффекта (не отвергаем H0)",
+                    ),
+                }
+            )
+
+    sq_df = pd.DataFrame(results)
+    sq_csv_path = run_dir / "результаты_теста_Маклеода-Ли_для_квадратов_GARCH_остатков.csv"
+    save_csv(sq_df, sq_csv_path, index=False)
+    print("\nТест Маклеода–Ли для КВАДРАТОВ стандартизированных остатков GARCH(1,1):")
+    print(sq_df[["Тикер", "Лаг", "McLeod-Li p-значение"]])
+    print(f"  — тест Маклеода–Ли: {sq_csv_path.name}")
+
+
+def white_noise_plot_jobs(
+    store: VolatilityStore,
+    max_lag: int = 20,
+    resid_acf: Optional[ResidualAcf] = None,
+) -> List[PlotJob]:
+    """
+    Описывает графики для визуальной проверки белошумности стандартизированных остатков GARCH.
+
+    Для каждого тикера:
     - график ряда стандартизированных остатков;
     - график ACF (автокорреляционная функция) до max_lag с доверительными интервалами.
+
+    ACF и полоса Бартлетта берутся из resid_acf (результат тестов), без пересчёта.
     """
-    for ticker, std_resid in std_resid_dict.items():
-        series = pd.Series(std_resid).dropna()
-        if series.empty:
-            continue
+    resid_acf = _ensure_acf(store, resid_acf, max_lag)
+    band = bartlett_band(resid_acf.acf[: max_lag + 1], resid_acf.nobs)
+    lags = np.arange(max_lag + 1)
+
+    jobs: List[PlotJob] = []
+    for j, ticker in enumerate(resid_acf.tickers):
+        series = store.series(ticker, "std_resid").dropna()
 
         # График временного хода стандартизированных остатков (кандидатов на белый шум)
-        plt.figure(figsize=(10, 3))
-        plt.plot(series.index, series.values, linewidth=0.8)
-        plt.axhline(0, color="black", linewidth=1)
-        plt.title(f"Стандартизированные остатки GARCH(1,1): {ticker}")
-        plt.ylabel("Стандартизированные остатки")
-        plt.xlabel("Дата")
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        # График стандартизированных остатков GARCH для конкретного тикера (белый шум)
-        resid_path = (
-            run_dir / f"стандартизированные_остатки_белого_шума_GARCH_{ticker}.png"
+        jobs.append(
+            PlotJob(
+                filename=f"стандартизированные_остатки_белого_шума_GARCH_{ticker}.png",
+                title=f"Стандартизированные остатки GARCH(1,1): {ticker}",
+                figsize=(10, 3),
+                lines=[series_line(series, linewidth=0.8)],
+                xlabel="Дата",
+                ylabel="Стандартизированные остатки",
+                hline=0.0,
+            )
         )
-        plt.savefig(resid_path)
-        plt.close()
 
         # График автокорреляционной функции (ACF)
-        plt.figure(figsize=(8, 3))
-        plot_acf(series, lags=max_lag, alpha=0.05)
-        plt.title(f"ACF стандартизированных остатков GARCH(1,1): {ticker}")
-        plt.tight_layout()
-        # График ACF стандартизированных остатков (белого шума)
-        acf_path = run_dir / f"ACF_белого_шума_GARCH_{ticker}.png"
-        plt.savefig(acf_path)
-        plt.close()
+        jobs.append(
+            PlotJob(
+                filename=f"ACF_белого_шума_GARCH_{ticker}.png",
+                title=f"ACF стандартизированных остатков GARCH(1,1): {ticker}",
+                figsize=(8, 3),
+                lines=[PlotLine(x=lags, y=resid_acf.acf[: max_lag + 1, j])],
+                kind="acf",
+                grid=False,
+                acf_band=band[:, j],
+            )
+        )
+    return jobs
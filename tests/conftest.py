@@ -0,0 +1,27 @@
+"""
+Общие данные тестов: синтетические цены и доходности GARCH(1,1) (benchmarks/synthetic.py).
+"""
+
+import warnings
+
+import pandas as pd
+import pytest
+
+from garch_analysis import compute_log_returns
+from synthetic import simulate_garch_prices
+
+
+@pytest.fixture(autouse=True)
+def _quiet_warnings():
+    # arch и statsmodels предупреждают о масштабе данных и сходимости
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+
+@pytest.fixture
+def log_returns() -> pd.DataFrame:
+    """
+    Лог-доходности 4 тикеров × 1500 дней (доли, не проценты).
+    """
+    return compute_log_returns(simulate_garch_prices(4, 1500, seed=1))
@@ -0,0 +1,71 @@
+"""
+Автокорреляции через БПФ и портманто-тесты (acf_kernel) против statsmodels.
+"""
+
+import numpy as np
+import pytest
+
+from acf_kernel import acf_fft, bartlett_band, portmanteau_tests
+
+
+@pytest.fixture
+def columns():
+    rng = np.random.default_rng(3)
+    ar = np.zeros(800)
+    for t in range(1, ar.size):
+        ar[t] = 0.4 * ar[t - 1] + rng.standard_normal()
+    # Ряды разной длины: выравниваются по началу и дополняются нулями
+    return [rng.standard_normal(1000), ar, rng.standard_normal(120)]
+
+
+def test_acf_matches_statsmodels(columns):
+    from statsmodels.tsa.stattools import acf
+
+    result, nobs = acf_fft(columns, max_lag=30)
+    assert nobs.tolist() == [len(col) for col in columns]
+    for j, col in enumerate(columns):
+        np.testing.assert_allclose(result[:, j], acf(col, nlags=30, fft=False), atol=1e-12)
+
+
+def test_portmanteau_matches_acorr_ljungbox(columns):
+    from statsmodels.stats.diagnostic import acorr_ljungbox
+
+    lags = [1, 5, 10, 20]
+    acf, nobs = acf_fft(columns, max_lag=max(lags))
+    for model_df in (0, 2):
+        tests = portmanteau_tests(acf, nobs, lags, model_df=model_df)
+        for j, col in enumerate(columns):
+            reference = acorr_ljungbox(col, lags=lags, boxpierce=True, model_df=model_df)
+            np.testing.assert_allclose(tests["lb_stat"][:, j], reference["lb_stat"], rtol=1e-10)
+            np.testing.assert_allclose(tests["bp_stat"][:, j], reference["bp_stat"], rtol=1e-10)
+            np.testing.assert_allclose(
+                tests["lb_pvalue"][:, j], reference["lb_pvalue"], rtol=1e-8, equal_nan=True
+            )
+            np.testing.assert_allclose(
+                tests["bp_pvalue"][:, j], reference["bp_pvalue"], rtol=1e-8, equal_nan=True
+            )
+
+
+def test_short_series_get_nan(columns):
+    acf, nobs = acf_fft([columns[0], columns[0][:5]], max_lag=10)
+    assert np.isnan(acf[5:, 1]).all()
+    assert np.isfinite(acf[:5, 1]).all()
+    assert np.isnan(portmanteau_tests(acf, nobs, [10])["lb_pvalue"][0, 1])
+
+
+@pytest.mark.parametrize("lags", [[0], [-1], [5, 11], []])
+def test_portmanteau_rejects_lags_out_of_range(columns, lags):
+    acf, nobs = acf_fft(columns, max_lag=10)
+    with pytest.raises(ValueError, match="от 1 до 10"):
+        portmanteau_tests(acf, nobs, lags)
+
+
+def test_bartlett_band_matches_plot_acf(columns):
+    from scipy.stats import norm
+    from statsmodels.tsa.stattools import acf as sm_acf
+
+    acf, nobs = acf_fft(columns[:1], max_lag=15)
+    _, confint = sm_acf(columns[0], nlags=15, fft=False, alpha=0.05)
+    reference = confint[:, 1] - sm_acf(columns[0], nlags=15, fft=False)
+    np.testing.assert_allclose(bartlett_band(acf, nobs)[:, 0], reference, atol=1e-12)
+    assert norm.ppf(0.975) * np.sqrt(1 / nobs[0]) == pytest.approx(bartlett_band(acf, nobs)[1, 0])
@@ -0,0 +1,40 @@
+"""
+Пакетный ADF-тест (adf_batch) против adfuller из statsmodels.
+"""
+
+import numpy as np
+import pytest
+
+from adf_batch import adfuller_batch
+from synthetic import simulate_garch_prices
+
+
+def test_matches_adfuller():
+    from statsmodels.tsa.stattools import adfuller
+
+    prices = simulate_garch_prices(4, 700, seed=2)
+    # Ряды разной длины и стационарный ряд (AR(1)) — разные выбранные лаги
+    prices.iloc[:50, 1] = np.nan
+    prices.iloc[:, 2] = 100 + np.random.default_rng(0).standard_normal(len(prices)).cumsum() * 0.1
+    prices.iloc[:, 3] = np.log(prices.iloc[:, 3]).diff().fillna(0.0)
+
+    result = adfuller_batch(prices)
+    assert list(result.index) == list(prices.columns)
+    for col in prices.columns:
+        stat, pvalue, used_lag, n_obs, crit, ic_best = adfuller(prices[col].dropna(), autolag="AIC")
+        row = result.loc[col]
+        assert row["adf_stat"] == pytest.approx(stat, rel=1e-9, abs=1e-9)
+        assert row["pvalue"] == pytest.approx(pvalue, rel=1e-9, abs=1e-12)
+        assert row["used_lag"] == used_lag
+        assert row["n_obs"] == n_obs
+        assert row["ic_best"] == pytest.approx(ic_best, rel=1e-9)
+        assert row["crit_5%"] == pytest.approx(crit["5%"])
+
+
+def test_skips_constant_and_empty_series():
+    prices = simulate_garch_prices(3, 300, seed=0)
+    prices.iloc[:, 1] = 5.0
+    prices.iloc[:, 2] = np.nan
+
+    result = adfuller_batch(prices)
+    assert list(result.index) == [prices.columns[0]]
@@ -0,0 +1,53 @@
+"""
+Подкоманды cli.py: rank и report по рядам GARCH прошлого запуска (--from-run).
+"""
+
+import re
+import subprocess
+import sys
+
+import pytest
+
+from cli import main
+from synthetic import simulate_garch_prices, write_prices_csv
+from utils.result_dir import OUTPUT_BASE, PROJECT_ROOT
+from utils.run_store import RunStore
+
+
+def _cli(*argv) -> str:
+    """
+    Запуск cli.py отдельным процессом с --run-store; возвращает имя архива запуска.
+    """
+    completed = subprocess.run(
+        [sys.executable, str(PROJECT_ROOT / "src" / "cli.py"), *argv, "--run-store"],
+        capture_output=True,
+        text=True,
+        cwd=PROJECT_ROOT,
+    )
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    match = re.search(r"result_\d+\.zip", completed.stdout)
+    assert match, completed.stdout[-2000:]
+    return match.group(0)
+
+
+def test_from_run_with_bootstrap(tmp_path):
+    prices_path = write_prices_csv(simulate_garch_prices(3, 600, seed=0), tmp_path / "prices.csv")
+    store_paths = []
+    try:
+        store_paths.append(OUTPUT_BASE / _cli("garch", "--prices", str(prices_path), "--no-cache"))
+        store_paths.append(
+            OUTPUT_BASE
+            / _cli("report", "--from-run", str(store_paths[0]), "--bootstrap", "10")
+        )
+        with RunStore.open(store_paths[1]) as run:
+            assert len(run.table("ранжирование_по_волатильности_GARCH")) == 3
+            assert len(run.table("ранжирование_бутстрэп_GARCH")) == 3
+    finally:
+        for path in store_paths:
+            path.unlink(missing_ok=True)
+
+
+def test_from_run_rejects_run_options(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        main(["rank", "--from-run", str(tmp_path), "--profile", "--start", "2022-01-01"])
+    assert "--start, --profile" in capsys.readouterr().err
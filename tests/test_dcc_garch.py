@@ -0,0 +1,51 @@
+"""
+Рекурсия DCC(1,1) по блокам дат (dcc_garch) против прямого цикла по датам.
+"""
+
+import numpy as np
+import pytest
+
+from dcc_garch import _correlation_blocks, _unpack_blocks, dcc_loglikelihood
+
+
+def _naive_dcc(z: np.ndarray, a: float, b: float):
+    """
+    Q[t] и R[t] по формулам из описания модуля, дата за датой.
+    """
+    qbar = z.T @ z / z.shape[0]
+    q = qbar.copy()
+    correlations, llf = [], 0.0
+    for t in range(z.shape[0]):
+        if t > 0:
+            q = (1 - a - b) * qbar + a * np.outer(z[t - 1], z[t - 1]) + b * q
+        scale = 1.0 / np.sqrt(np.diag(q))
+        r = q * np.outer(scale, scale)
+        correlations.append(r)
+        _, logdet = np.linalg.slogdet(r)
+        llf -= 0.5 * (logdet + z[t] @ np.linalg.solve(r, z[t]) - z[t] @ z[t])
+    return qbar, np.array(correlations), llf
+
+
+@pytest.fixture
+def z():
+    rng = np.random.default_rng(5)
+    chol = np.linalg.cholesky(np.array([[1.0, 0.5, 0.2], [0.5, 1.0, 0.3], [0.2, 0.3, 1.0]]))
+    return rng.standard_normal((300, 3)) @ chol.T
+
+
+@pytest.mark.parametrize("block_rows", [1, 7, 64, 1000])
+def test_blocks_match_naive_recursion(z, block_rows):
+    a, b = 0.05, 0.9
+    qbar, expected, llf = _naive_dcc(z, a, b)
+
+    packed = np.vstack([block for _, _, block in _correlation_blocks(z, qbar, a, b, block_rows)])
+    np.testing.assert_allclose(_unpack_blocks(packed, z.shape[1]), expected, atol=1e-12)
+    assert dcc_loglikelihood(z, qbar, a, b, block_rows) == pytest.approx(llf, rel=1e-10)
+
+
+def test_constant_correlation_when_a_is_zero(z):
+    qbar, _, _ = _naive_dcc(z, 0.0, 0.0)
+    packed = np.vstack([block for _, _, block in _correlation_blocks(z, qbar, 0.0, 0.9, 50)])
+    full = _unpack_blocks(packed, z.shape[1])
+    scale = 1.0 / np.sqrt(np.diag(qbar))
+    np.testing.assert_allclose(full, np.broadcast_to(qbar * np.outer(scale, scale), full.shape))
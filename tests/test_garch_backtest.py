@@ -0,0 +1,24 @@
+"""
+Бэктест GARCH (garch_backtest): тикеры короче окна оценки.
+"""
+
+import numpy as np
+
+from garch_backtest import run_backtest, run_garch_backtest
+
+
+def test_short_ticker_is_skipped(log_returns):
+    # Недавно размещённый тикер: данных меньше окна
+    short = log_returns.columns[-1]
+    log_returns.iloc[:-100, -1] = np.nan
+
+    result = run_backtest(log_returns.iloc[-700:], window=300, step=50)
+    assert result.skipped == [short]
+    assert np.isnan(result.sigma2[:, -1]).all()
+    assert np.isfinite(result.sigma2[300:, 0]).all()
+
+
+def test_all_tickers_shorter_than_window(log_returns, tmp_path, capsys):
+    metrics = run_garch_backtest(log_returns.iloc[:500], tmp_path, window=1000, step=50)
+    assert (metrics["Прогнозов"] == 0).all()
+    assert "без прогнозов" in capsys.readouterr().out
@@ -0,0 +1,69 @@
+"""
+Пакетная оценка GARCH(1,1) (garch_batch) против arch_model по каждому тикеру.
+"""
+
+import numpy as np
+import pytest
+
+from garch_analysis import compute_log_returns
+from garch_batch import PARAM_NAMES, fit_garch_batch
+from synthetic import simulate_garch_prices
+
+
+def _fit_arch(returns):
+    from arch import arch_model
+
+    return arch_model(returns, mean="Constant", vol="Garch", p=1, q=1, dist="normal").fit(
+        disp="off"
+    )
+
+
+def test_matches_arch(log_returns):
+    returns = log_returns * 100
+    result = fit_garch_batch(returns)
+
+    for ticker in returns.columns:
+        reference = _fit_arch(returns[ticker])
+        assert result.converged[ticker]
+        assert result.loglikelihood[ticker] == pytest.approx(reference.loglikelihood, abs=1e-5)
+        np.testing.assert_allclose(
+            result.params.loc[ticker, PARAM_NAMES].to_numpy(),
+            reference.params[["mu", "omega", "alpha[1]", "beta[1]"]].to_numpy(),
+            atol=1e-3,
+        )
+        np.testing.assert_allclose(
+            result.cond_vol[ticker].to_numpy(), reference.conditional_volatility, rtol=1e-3
+        )
+
+
+def test_missing_values_like_dropna(log_returns):
+    returns = log_returns * 100
+    returns.iloc[:300, 1] = np.nan
+    returns.iloc[700:710, 1] = np.nan
+
+    result = fit_garch_batch(returns)
+    alone = fit_garch_batch(returns.iloc[:, [1]].dropna())
+
+    ticker = returns.columns[1]
+    assert result.loglikelihood[ticker] == pytest.approx(alone.loglikelihood[ticker], abs=1e-6)
+    np.testing.assert_allclose(
+        result.params.loc[ticker], alone.params.loc[ticker], rtol=1e-4, atol=1e-6
+    )
+    assert result.cond_vol[ticker].iloc[:300].isna().all()
+
+
+def test_too_short_series_rejected(log_returns):
+    returns = log_returns * 100
+    returns.iloc[1:, 0] = np.nan
+    with pytest.raises(ValueError, match="Недостаточно наблюдений"):
+        fit_garch_batch(returns)
+
+
+def test_stalled_line_search_not_converged():
+    # На коротких рядах поиск шага у этих тикеров останавливается вдали от оптимума
+    returns = compute_log_returns(simulate_garch_prices(30, 300, seed=1))[["T0011", "T0022"]] * 100
+    result = fit_garch_batch(returns)
+
+    for ticker in returns.columns:
+        assert not result.converged[ticker]
+        assert result.loglikelihood[ticker] < _fit_arch(returns[ticker]).loglikelihood - 0.1
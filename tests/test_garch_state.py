@@ -0,0 +1,53 @@
+"""
+Сохранённое состояние GARCH (garch_state): дообновление только по тем же данным.
+"""
+
+import pytest
+
+from garch_state import (
+    ACTION_FULL_FIT,
+    ACTION_INCREMENTAL,
+    ACTION_UNCHANGED,
+    update_garch_models,
+)
+
+SOURCE = "prices.csv|start=2014-09-01"
+
+
+def _update(log_returns, state_dir, source=SOURCE):
+    _, _, actions = update_garch_models(
+        log_returns, state_dir=state_dir, backend="batch", refit_every=1000, source=source
+    )
+    return set(actions.values())
+
+
+@pytest.fixture
+def state_dir(log_returns, tmp_path):
+    state_dir = tmp_path / "garch_state"
+    assert _update(log_returns.iloc[:1000], state_dir) == {ACTION_FULL_FIT}
+    return state_dir
+
+
+def test_same_data_unchanged_then_incremental(log_returns, state_dir):
+    assert _update(log_returns.iloc[:1000], state_dir) == {ACTION_UNCHANGED}
+    assert _update(log_returns.iloc[:1005], state_dir) == {ACTION_INCREMENTAL}
+
+
+def test_later_start_forces_full_fit(log_returns, state_dir):
+    # Тот же последний день, но период начинается позже (--start)
+    fits, _, actions = update_garch_models(
+        log_returns.iloc[500:1000], state_dir=state_dir, backend="batch", source=SOURCE
+    )
+    assert set(actions.values()) == {ACTION_FULL_FIT}
+    fit = next(iter(fits.values()))
+    assert fit.cond_vol.index[0] == log_returns.index[500]
+
+
+def test_other_source_forces_full_fit(log_returns, state_dir):
+    assert _update(log_returns.iloc[:1000], state_dir, source="other.csv") == {ACTION_FULL_FIT}
+
+
+def test_changed_row_count_forces_full_fit(log_returns, state_dir):
+    # Та же первая и последняя дата, но строкой меньше в середине
+    shorter = log_returns.iloc[:1000].drop(log_returns.index[400])
+    assert _update(shorter, state_dir) == {ACTION_FULL_FIT}
@@ -0,0 +1,93 @@
+"""
+Чтение цен порциями (ingest.read_prices): результат не зависит от того,
+где проходят границы порций.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ingest import read_prices
+
+CHUNK_SIZES = [1, 3, 7, 50, 10_000]
+
+
+@pytest.fixture
+def long_csv(tmp_path):
+    """
+    Длинная таблица минутных баров (время, тикер, цена) с повторами
+    (время, тикер), которые попадают на границы порций.
+    """
+    rng = np.random.default_rng(4)
+    times = pd.date_range("2024-01-01 10:00", periods=40, freq="37min")
+    rows = [
+        (time, ticker, float(rng.uniform(10, 20)))
+        for time in times
+        for ticker in ("AAA", "BBB", "CCC")
+        if rng.uniform() > 0.2
+    ]
+    # Повтор последнего бара каждого десятого момента времени
+    rows += [rows[i][:2] + (float(rng.uniform(10, 20)),) for i in range(0, len(rows), 10)]
+    rows.sort(key=lambda row: row[0])
+    df = pd.DataFrame(rows, columns=["time", "ticker", "close"])
+    path = tmp_path / "bars.csv"
+    df.to_csv(path, index=False)
+    return path, df
+
+
+def _expected_long(df: pd.DataFrame, resample=None) -> pd.DataFrame:
+    wide = (
+        df.drop_duplicates(["time", "ticker"], keep="last")
+        .pivot(index="time", columns="ticker", values="close")
+        .sort_index()
+    )
+    wide.columns.name = None
+    wide.index = pd.DatetimeIndex(wide.index, name="time")
+    if resample is not None:
+        wide = wide.resample(resample).last().dropna(how="all")
+    return wide
+
+
+@pytest.mark.parametrize("chunksize", CHUNK_SIZES)
+def test_long_table_chunk_boundaries(long_csv, chunksize):
+    path, df = long_csv
+    result = read_prices(path, ticker_column="ticker", chunksize=chunksize)
+    pd.testing.assert_frame_equal(result, _expected_long(df), check_freq=False)
+
+
+@pytest.mark.parametrize("chunksize", CHUNK_SIZES)
+def test_resample_chunk_boundaries(long_csv, chunksize):
+    path, df = long_csv
+    result = read_prices(path, ticker_column="ticker", resample="2h", chunksize=chunksize)
+    pd.testing.assert_frame_equal(result, _expected_long(df, "2h"), check_freq=False)
+
+
+@pytest.mark.parametrize("chunksize", CHUNK_SIZES)
+def test_wide_table_filters_per_chunk(tmp_path, chunksize):
+    rng = np.random.default_rng(6)
+    index = pd.bdate_range("2020-01-01", periods=60, name="time")
+    prices = pd.DataFrame(rng.uniform(10, 20, (60, 3)), index=index, columns=["A", "B", "C"])
+    path = tmp_path / "wide.csv"
+    prices.to_csv(path)
+
+    result = read_prices(
+        path,
+        tickers=["A", "C"],
+        start="2020-01-15",
+        end="2020-02-20",
+        dtype="float32",
+        chunksize=chunksize,
+    )
+    expected = pd.read_csv(path, index_col="time", parse_dates=True)
+    expected = expected.loc["2020-01-15":"2020-02-20", ["A", "C"]].astype("float32")
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+
+def test_unsorted_chunks_are_sorted(long_csv):
+    path, df = long_csv
+    # Без повторов (время, тикер): при перемешивании «последний» бар не определён
+    shuffled = df.drop_duplicates(["time", "ticker"], keep="last").sample(frac=1.0, random_state=0)
+    shuffled.to_csv(path, index=False)
+
+    result = read_prices(path, ticker_column="ticker", chunksize=5)
+    pd.testing.assert_frame_equal(result, _expected_long(shuffled), check_freq=False)
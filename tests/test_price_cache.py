@@ -0,0 +1,35 @@
+"""
+Кэш разобранных ценовых таблиц (utils.price_cache): ключ источника.
+"""
+
+import os
+
+import pandas as pd
+
+from utils.price_cache import load_cached_frame
+
+
+def _write(path, value: float):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"date,A\n2024-01-02,{value}\n2024-01-03,{value}\n", encoding="utf-8")
+    # Одинаковые размер и время изменения: отличить файлы можно только по пути
+    os.utime(path, ns=(1_700_000_000_000_000_000, 1_700_000_000_000_000_000))
+    return path
+
+
+def _load(path, cache_dir):
+    return load_cached_frame(
+        path, lambda: pd.read_csv(path, index_col=0, parse_dates=True), cache_dir
+    )
+
+
+def test_same_name_in_different_folders(tmp_path):
+    first = _write(tmp_path / "a" / "prices.csv", 1.0)
+    second = _write(tmp_path / "b" / "prices.csv", 2.0)
+    cache_dir = tmp_path / "cache"
+
+    assert _load(first, cache_dir)["A"].tolist() == [1.0, 1.0]
+    assert _load(second, cache_dir)["A"].tolist() == [2.0, 2.0]
+    # Повторная загрузка — из кэша, у каждого файла свой
+    assert _load(first, cache_dir)["A"].tolist() == [1.0, 1.0]
+    assert len(list(cache_dir.glob("*.meta.json"))) == 2
@@ -0,0 +1,34 @@
+"""
+Режим без графиков (render.plotting_disabled): запрет matplotlib только на время блока.
+"""
+
+import subprocess
+import sys
+
+from utils.result_dir import PROJECT_ROOT
+
+SCRIPT = """
+import sys
+from render import plotting_disabled
+
+with plotting_disabled():
+    try:
+        import matplotlib
+    except ImportError:
+        print("blocked")
+assert "matplotlib" not in sys.modules
+import matplotlib
+print("restored", matplotlib.__name__)
+"""
+
+
+def test_plotting_disabled_is_scoped():
+    # Отдельный процесс: в процессе тестов matplotlib может быть уже загружен
+    completed = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        capture_output=True,
+        text=True,
+        cwd=PROJECT_ROOT / "src",
+    )
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    assert completed.stdout.split() == ["blocked", "restored", "matplotlib"]
@@ -0,0 +1,94 @@
+"""
+Архив запуска (utils/run_store): таблицы этапов проходят через CSV со схемой
+и архив без потерь.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dcc_garch import DCC_DIRNAME, DccCorrelations, run_dcc_garch
+from garch_analysis import fit_garch_and_collect_stats
+from utils.run_store import RunStore, pack_run_dir, read_csv_table, save_csv
+from volatility_report import build_volatility_ranking, save_and_print_ranking
+
+FRAMES = {
+    "unnamed_index": (
+        pd.DataFrame(np.eye(3, dtype=np.float32), index=["A", "B", "C"], columns=["A", "B", "C"]),
+        True,
+    ),
+    "mixed": (
+        pd.DataFrame(
+            {
+                "x": [1.5, np.nan, 0.1 + 0.2],
+                "category": pd.Categorical(["Низкая", None, "Высокая"], ["Низкая", "Высокая"]),
+                "flag": [True, False, True],
+                "n": [1, 2, 3],
+                "text": ["a,b", None, "0012"],
+                "date": pd.to_datetime(["2020-01-01", "2021-05-06", None]),
+            },
+            index=pd.Index(["SBER", "VTBR", "X"], name="Тикер"),
+        ),
+        True,
+    ),
+    "no_index": (pd.DataFrame({"a": [np.inf, 1e-300], "b": ["1–2", 'q"z']}), False),
+    "dates": (
+        pd.DataFrame(
+            {"v": [1, 2]}, index=pd.DatetimeIndex(["2020-01-01", "2020-01-02"], name="time")
+        ),
+        True,
+    ),
+    "multi": (
+        pd.DataFrame(
+            {"v": [1.0, 2.0]},
+            index=pd.MultiIndex.from_tuples([("a", 1), ("b", 2)], names=["t", "h"]),
+        ),
+        True,
+    ),
+    "empty": (pd.DataFrame(columns=["a", "b"]), False),
+}
+
+
+@pytest.mark.parametrize("name", FRAMES)
+def test_save_csv_round_trip(tmp_path, name):
+    df, index = FRAMES[name]
+    save_csv(df, tmp_path / f"{name}.csv", index=index)
+    expected = df if index else df.reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(read_csv_table(tmp_path / f"{name}.csv"), expected)
+    run_dir = tmp_path / "result_1"
+    run_dir.mkdir()
+    save_csv(df, run_dir / f"{name}.csv", index=index)
+    with RunStore.open(pack_run_dir(run_dir, tmp_path / "result_1.zip")) as run:
+        pd.testing.assert_frame_equal(run.table(name), expected)
+
+
+def test_csv_without_schema_kept_as_file(tmp_path):
+    run_dir = tmp_path / "result_1"
+    run_dir.mkdir()
+    (run_dir / "чужая.csv").write_bytes("﻿,a\nx,1\n".encode("utf-8"))
+    with RunStore.open(pack_run_dir(run_dir, tmp_path / "result_1.zip")) as run:
+        assert run.tables == []
+        assert run.read_file("чужая.csv") == (run_dir / "чужая.csv").read_bytes()
+
+
+def test_stage_tables_round_trip(log_returns, tmp_path, capsys):
+    """
+    Таблицы этапов GARCH, DCC и ранжировки в архиве — те же, что в памяти:
+    тикеры корреляций DCC — индекс, а не столбец «Unnamed: 0».
+    """
+    run_dir = tmp_path / "result_1"
+    run_dir.mkdir()
+    store = fit_garch_and_collect_stats(log_returns.iloc[:500, :3], run_dir, backend="batch")
+    expected = {"DCC_GARCH_параметры": run_dcc_garch(store, run_dir)}
+    correlations = DccCorrelations.load(run_dir / DCC_DIRNAME)
+    expected["DCC_GARCH_средние_корреляции"] = correlations.mean_matrix()
+    expected["DCC_GARCH_корреляции_на_последнюю_дату"] = correlations.matrix(-1)
+    vol_df = build_volatility_ranking(store.mean_volatility())
+    save_and_print_ranking(vol_df, run_dir)
+    expected["ранжирование_по_волатильности_GARCH"] = vol_df
+
+    with RunStore.open(pack_run_dir(run_dir, tmp_path / "result_1.zip")) as run:
+        assert not [name for name in run.files if name.endswith(".csv")]
+        for name, df in expected.items():
+            pd.testing.assert_frame_equal(run.table(name), df, check_exact=True)
@@ -0,0 +1,61 @@
+"""
+Полный запуск анализа (run_volatility_analysis.py) отдельным процессом.
+"""
+
+import re
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from synthetic import simulate_garch_prices, write_prices_csv
+from utils.result_dir import OUTPUT_BASE, PROJECT_ROOT
+from utils.run_store import RunStore
+
+# Предел времени запуска: дольше — считаем, что он завис
+RUN_TIMEOUT_S = 600
+
+
+def _run_analysis(prices_path, jobs: int):
+    """
+    Запуск с --run-store; возвращает путь к архиву запуска.
+    """
+    command = [
+        sys.executable,
+        str(PROJECT_ROOT / "src" / "run_volatility_analysis.py"),
+        *("--prices", str(prices_path), "--jobs", str(jobs)),
+        *("--no-cache", "--run-store", "--dcc", "--bootstrap", "20"),
+        *("--backtest", "rolling", "--backtest-window", "300", "--backtest-step", "50"),
+        *("--select-models", "--select-max-order", "1"),
+    ]
+    try:
+        completed = subprocess.run(
+            command, capture_output=True, text=True, timeout=RUN_TIMEOUT_S, cwd=PROJECT_ROOT
+        )
+    except subprocess.TimeoutExpired:
+        pytest.fail(f"Запуск с --jobs {jobs} не завершился за {RUN_TIMEOUT_S} с")
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    match = re.search(r"result_\d+\.zip", completed.stdout)
+    assert match, completed.stdout[-2000:]
+    return OUTPUT_BASE / match.group(0)
+
+
+def test_jobs2_matches_serial_run(tmp_path):
+    """
+    С --jobs 2 пулы процессов GARCH, бэктеста, выбора моделей, бутстрэпа
+    и графиков работают рядом с этапами в потоках: запуск завершается,
+    а не зависает, и даёт те же таблицы, что и --jobs 1.
+    """
+    prices_path = write_prices_csv(simulate_garch_prices(4, 800, seed=0), tmp_path / "prices.csv")
+    store_paths = []
+    try:
+        for jobs in (1, 2):
+            store_paths.append(_run_analysis(prices_path, jobs))
+        with RunStore.open(store_paths[0]) as serial, RunStore.open(store_paths[1]) as parallel:
+            assert any(name.endswith(".png") for name in parallel.files)
+            for name in ("ранжирование_по_волатильности_GARCH", "ранжирование_бутстрэп_GARCH"):
+                pd.testing.assert_frame_equal(parallel.table(name), serial.table(name))
+    finally:
+        for path in store_paths:
+            path.unlink(missing_ok=True)
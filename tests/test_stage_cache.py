@@ -0,0 +1,36 @@
+"""
+Кэш результатов этапов (utils.stage_cache): повторный запуск и изоляция файлов.
+"""
+
+from utils.stage_cache import StageCache, stage_key
+
+
+def _stage(out_dir):
+    (out_dir / "таблица.csv").write_text("a,b\n1,2\n", encoding="utf-8")
+    print("этап выполнен")
+    return 42
+
+
+def test_hit_copies_artifacts(tmp_path, capsys):
+    cache = StageCache(cache_dir=tmp_path / "cache")
+    first, second = tmp_path / "result_1", tmp_path / "result_2"
+    assert cache.run("stage", first, _stage, data=[1, 2]) == 42
+    assert cache.run("stage", second, _stage, data=[1, 2]) == 42
+    assert cache.misses == ["stage"] and cache.hits == ["stage"]
+    assert capsys.readouterr().out.count("этап выполнен") == 2
+
+    # Правка файла одного запуска не затрагивает кэш и другой запуск
+    (first / "таблица.csv").write_text("изменено", encoding="utf-8")
+    third = tmp_path / "result_3"
+    cache.run("stage", third, _stage, data=[1, 2])
+    assert (second / "таблица.csv").read_text(encoding="utf-8") == "a,b\n1,2\n"
+    assert (third / "таблица.csv").read_text(encoding="utf-8") == "a,b\n1,2\n"
+
+
+def test_key_depends_on_data_params_and_modules():
+    key = stage_key("stage", data=[1, 2], params={"alpha": 0.05}, modules=("acf_kernel",))
+    assert key != stage_key("stage", data=[1, 3], params={"alpha": 0.05}, modules=("acf_kernel",))
+    assert key != stage_key("stage", data=[1, 2], params={"alpha": 0.01}, modules=("acf_kernel",))
+    assert key != stage_key(
+        "stage", data=[1, 2], params={"alpha": 0.05}, modules=("acf_kernel", "utils.run_store")
+    )
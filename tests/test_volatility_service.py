@@ -0,0 +1,30 @@
+"""
+Сервис прогнозов (volatility_service): разбор запросов /batch.
+"""
+
+import pytest
+
+from synthetic import simulate_garch_prices, write_prices_csv
+from volatility_service import ServiceError, VolatilityService
+
+
+@pytest.fixture
+def service(tmp_path):
+    prices_path = write_prices_csv(simulate_garch_prices(2, 400, seed=0), tmp_path / "prices.csv")
+    return VolatilityService(prices_path, state_dir=tmp_path / "garch_state")
+
+
+@pytest.mark.parametrize("tickers", ["T0000", ["T0000", 1], {"T0000": 1}])
+def test_batch_rejects_non_list_tickers(service, tickers):
+    # Строка "T0000" разобралась бы по символам
+    with pytest.raises(ServiceError) as exc_info:
+        service.batch([{"op": "forecast", "tickers": tickers, "h": 2}])
+    assert exc_info.value.status == 400
+
+
+def test_batch_forecast(service):
+    result = service.batch([{"op": "forecast", "tickers": ["T0000"], "h": 2}, {"op": "ranking"}])
+    forecast, ranking = result["responses"]
+    assert list(forecast["results"]) == ["T0000"]
+    assert len(forecast["results"]["T0000"]["forecast"]) == 2
+    assert {row["ticker"] for row in ranking["ranking"]} == {"T0000", "T0001"}
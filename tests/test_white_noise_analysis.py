@@ -0,0 +1,47 @@
+"""
+Портманто-тесты остатков GARCH (white_noise_analysis): выводы по тикерам и лагам.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from vol_store import VolatilityStore
+from white_noise_analysis import run_white_noise_tests_for_garch_residuals
+
+
+@pytest.fixture
+def store():
+    n_obs = 300
+    rng = np.random.default_rng(7)
+    std_resid = rng.standard_normal((n_obs, 2))
+    # Второй тикер — всего 10 наблюдений в конце периода
+    std_resid[:-10, 1] = np.nan
+    valid = ~np.isnan(std_resid)
+    return VolatilityStore(
+        index=pd.date_range("2020-01-01", periods=n_obs, freq="D"),
+        tickers=["LONG", "SHORT"],
+        cond_vol=np.where(valid, 1.0, np.nan),
+        std_resid=std_resid,
+        valid=valid,
+        params=np.zeros((2, 4)),
+    )
+
+
+def test_short_series_not_reported_as_white_noise(store, tmp_path):
+    run_white_noise_tests_for_garch_residuals(store, tmp_path, lag=[5, 20])
+    (path,) = tmp_path.glob("*.csv")
+    result = pd.read_csv(path).set_index(["Тикер", "Лаг"])
+
+    short = result.loc[("SHORT", 20)]
+    assert np.isnan(short["Box-Ljung p-значение"])
+    assert short["Вывод (Box-Ljung)"] == "Недостаточно наблюдений"
+    assert short["Вывод (Box-Pierce)"] == "Недостаточно наблюдений"
+    assert result.loc[("SHORT", 5), "Вывод (Box-Ljung)"] != "Недостаточно наблюдений"
+    assert result.loc[("LONG", 20), "Вывод (Box-Ljung)"] != "Недостаточно наблюдений"
+
+
+@pytest.mark.parametrize("lag", [0, -1, [5, 0], []])
+def test_rejects_invalid_lags(store, tmp_path, lag):
+    with pytest.raises(ValueError, match="Лаги тестов"):
+        run_white_noise_tests_for_garch_residuals(store, tmp_path, lag=lag)